@@ -4,8 +4,13 @@ dedicated to micrOS framework.
 - get / set
 - cache handling
 - read / write to file
+    - write-back mode: batch puts, flush on idle or cfgflush()
+    - atomic write (temp file + rename), skip unchanged content
 - secure type handling
-- default parameter injection (update)
+    - config schema: default value (type) and int range per key
+- default parameter injection (update) - defaults from the schema
+- fast path: frozen snapshot of the hot keys (cfgfast) - rebuilt on change
+- change notification: callbacks per key (cfgwatch)
 
 Designed by Marcell Ban aka BxNxM
 """
@@ -13,7 +18,16 @@ Designed by Marcell Ban aka BxNxM
 #                           IMPORTS                             #
 #################################################################
 from time import sleep
-from json import load, dump
+from json import load, dumps
+from os import rename
+try:
+    from ucollections import namedtuple
+except ImportError:
+    from collections import namedtuple
+try:
+    from time import ticks_ms, ticks_diff
+except ImportError:
+    from simtime import ticks_ms, ticks_diff    # simulator mode
 
 from machine import Pin
 from LogicalPins import get_pin_on_platform_by_key
@@ -24,42 +38,71 @@ __DEBUG_PRINT = True
 __CONFIG_CACHE = {}
 # - MicrOS config
 __CONFIG_PATH = "node_config.json"
+# - Write-back: dirty keys, [write-back mode, last put time ms]
+__CONFIG_DIRTY = set()
+__CONFIG_WB = [False, 0]
+# - Fast path: hot keys, [snapshot type, frozen snapshot (None: rebuild)]
+__CONFIG_HOT = ('devfid', 'devip', 'nwmd', 'socport', 'dbg', 'timirq', 'timirqseq', 'timirqcbf', 'cron', 'crontasks',
+                'extirq', 'extirqcbf', 'irqmembuf', 'nwwd', 'nwwdsec', 'ntpsec')
+__CONFIG_FAST = [None, None]
+# - Change notification: {key: [callback(key, value), ...]}
+__CONFIG_WATCH = {}
 
 #################################################################
 #                       MODULE CONFIG
 #################################################################
 
 
+def config_schema():
+    """
+    micrOS config schema: {key: (default, min, max)}
+        type: type of the default value
+        min, max: int range (None: no limit) - optional
+    """
+    return {"version": ("n/a",),
+            "staessid": ("your_wifi_name",),
+            "stapwd": ("your_wifi_passwd",),
+            "devfid": ("node01",),
+            "appwd": ("ADmin123",),
+            "pled": (True,),
+            "dbg": (True,),
+            "nwmd": ("n/a",),
+            "hwuid": ("n/a",),
+            "soctout": (100, 1, None),
+            "socport": (9008, 1, 65535),
+            "aioserv": (False,),
+            "socmaxc": (3, 1, 10),
+            "devip": ("n/a",),
+            "timirq": (False,),
+            "cron": (False,),
+            "crontasks": ('n/a',),
+            "timirqcbf": ("n/a",),
+            "timirqseq": (3000, 100, None),
+            "irqmembuf": (1000, 0, None),
+            "extirq": (False,),
+            "extirqcbf": ("n/a",),
+            "boothook": ("n/a",),
+            "gmttime": (+1, -12, 14),
+            "boostmd": (True,),
+            "irqmreq": (6000, 0, None),
+            "lmfreewm": (10000, 0, None),
+            "sampler": ("n/a",),
+            "samplerms": (10000, 100, None),
+            "samplerbuf": (32, 1, 1024),
+            "samplerrtc": (False,),
+            "nwfast": (True,),
+            "nwcache": ("n/a",),
+            "nwwd": (True,),
+            "nwwdsec": (30, 1, None),
+            "ntpsec": (21600, 600, None)}
+
+
 def default_config():
     """
-    micrOS "code" config.
+    micrOS "code" config - defaults of the config schema
     n/a default empty value (str)
     """
-    default_configuration_template = {"version": "n/a",
-                                      "staessid": "your_wifi_name",
-                                      "stapwd": "your_wifi_passwd",
-                                      "devfid": "node01",
-                                      "appwd": "ADmin123",
-                                      "pled": True,
-                                      "dbg": True,
-                                      "nwmd": "n/a",
-                                      "hwuid": "n/a",
-                                      "soctout": 100,
-                                      "socport": 9008,
-                                      "devip": "n/a",
-                                      "timirq": False,
-                                      "cron": False,
-                                      "crontasks": 'n/a',
-                                      "timirqcbf": "n/a",
-                                      "timirqseq": 3000,
-                                      "irqmembuf": 1000,
-                                      "extirq": False,
-                                      "extirqcbf": "n/a",
-                                      "boothook": "n/a",
-                                      "gmttime": +1,
-                                      "boostmd": True,
-                                      "irqmreq": 6000}
-    return default_configuration_template
+    return {key: spec[0] for key, spec in config_schema().items()}
 
 #################################################################
 #                     CONSOLE WRITE FUNCTIONS                   #
@@ -87,6 +130,9 @@ def console_write(msg):
 
 
 def cfgget(key):
+    if len(__CONFIG_CACHE) > 0:
+        # Loaded config - no file read
+        return __CONFIG_CACHE.get(key, None)
     try:
         return read_cfg_file().get(key, None)
     except Exception as e:
@@ -94,22 +140,78 @@ def cfgget(key):
     return None
 
 
+def cfgfast():
+    """
+    Frozen snapshot of the hot config keys (namedtuple) - attribute access, e.g. cfgfast().devfid
+    - take it once per function in hot paths, rebuilt after a hot key change
+    """
+    if __CONFIG_FAST[1] is None:
+        if __CONFIG_FAST[0] is None:
+            __CONFIG_FAST[0] = namedtuple('HotConfig', __CONFIG_HOT)
+        config = read_cfg_file()
+        __CONFIG_FAST[1] = __CONFIG_FAST[0](*[config.get(key, None) for key in __CONFIG_HOT])
+    return __CONFIG_FAST[1]
+
+
+def cfgwatch(key, callback):
+    """
+    Register change callback: callback(key, value) - called by cfgput on value change
+    """
+    if key not in __CONFIG_WATCH:
+        __CONFIG_WATCH[key] = []
+    if callback not in __CONFIG_WATCH[key]:
+        __CONFIG_WATCH[key].append(callback)
+
+
 def cfgput(key, value, type_check=False):
-    if cfgget(key) == value:
-        return True
     try:
         if type_check:
             value = __value_type_handler(key, value)
-        if value is not None:
-            cfg_dict_buffer = read_cfg_file()
-            cfg_dict_buffer[key] = value
-            __write_cfg_file(cfg_dict_buffer)
-            del cfg_dict_buffer, value
+        if value is None:
+            return False
+        config = read_cfg_file()
+        if config.get(key, None) == value:
             return True
+        config[key] = value
+        __CONFIG_DIRTY.add(key)
+        __CONFIG_WB[1] = ticks_ms()
+        if key in __CONFIG_HOT:
+            __CONFIG_FAST[1] = None
+        __notify(key, value)
+        del value
+        if not __CONFIG_WB[0]:
+            return cfgflush()
+        return True
     except Exception:
         pass
     return False
 
+
+def cfgflush(idle_ms=0):
+    """
+    Write dirty config cache to file
+        idle_ms: flush only if there was no put since idle_ms
+    """
+    if len(__CONFIG_DIRTY) == 0:
+        return True
+    if idle_ms > 0 and ticks_diff(ticks_ms(), __CONFIG_WB[1]) < idle_ms:
+        return False
+    console_write("[CONFIGHANDLER] flush: {}".format(__CONFIG_DIRTY))
+    __write_cfg_file(__CONFIG_CACHE)
+    __CONFIG_DIRTY.clear()
+    return True
+
+
+def cfgwriteback(state=True):
+    """
+    Write-back mode: cfgput only updates the cache, cfgflush writes the file
+    - disable: flush pending changes
+    """
+    __CONFIG_WB[0] = state
+    if not state:
+        cfgflush()
+    return __CONFIG_WB[0]
+
 #################################################################
 #             CONFIGHANDLER  INTERNAL FUNCTIONS                 #
 #################################################################
@@ -135,11 +237,20 @@ def read_cfg_file(nosafe=False):
 def __write_cfg_file(dictionary):
     # WRITE CACHE
     __CONFIG_CACHE.update(dictionary)
+    data = dumps(__CONFIG_CACHE)
+    try:
+        # SKIP WRITE - NO CHANGE
+        with open(__CONFIG_PATH, 'r') as f:
+            if f.read() == data:
+                return True
+    except Exception:
+        pass
     while True:
         try:
-            # WRITE JSON CONFIG
-            with open(__CONFIG_PATH, 'w') as f:
-                dump(dictionary, f)
+            # WRITE JSON CONFIG - ATOMIC: TEMP FILE + RENAME
+            with open(__CONFIG_PATH + '.tmp', 'w') as f:
+                f.write(data)
+            rename(__CONFIG_PATH + '.tmp', __CONFIG_PATH)
             break
         except Exception as e:
             console_write("[CONFIGHANDLER] __write_cfg_file error {} (json): {}".format(__CONFIG_PATH, e))
@@ -163,25 +274,39 @@ def __inject_default_conf():
         del default_config_dict
 
 
+def __notify(key, value):
+    for callback in __CONFIG_WATCH.get(key, ()):
+        try:
+            callback(key, value)
+        except Exception as e:
+            console_write("[CONFIGHANDLER] change callback error {}: {}".format(key, e))
+
+
 def __value_type_handler(key, value):
-    value_in_cfg = cfgget(key)
+    """
+    Convert (str) input to the schema type of the key + range check
+        key without schema: type of the actual value
+    return None in case of invalid value
+    """
+    spec = config_schema().get(key, None)
+    if spec is None:
+        spec = (read_cfg_file().get(key, None),)
     try:
-        if isinstance(value_in_cfg, bool):
-            del value_in_cfg
-            if str(value).lower() == 'true':
-                return True
-            if str(value).lower() == 'false':
-                return False
+        if isinstance(spec[0], bool):
+            if str(value).lower() in ('true', 'false'):
+                return str(value).lower() == 'true'
             raise Exception("__value_type_handler type handling error")
-        if isinstance(value_in_cfg, str):
-            del value_in_cfg
+        if isinstance(spec[0], str):
             return str(value)
-        if isinstance(value_in_cfg, int):
-            del value_in_cfg
-            return int(value)
-        if isinstance(value_in_cfg, float):
-            del value_in_cfg
-            return float(value)
+        if isinstance(spec[0], int):
+            value = int(value)
+        elif isinstance(spec[0], float):
+            value = float(value)
+        else:
+            return None
+        if len(spec) == 3 and ((spec[1] is not None and value < spec[1]) or (spec[2] is not None and value > spec[2])):
+            raise Exception("{} out of range: {} - {}".format(value, spec[1], spec[2]))
+        return value
     except Exception as e:
         console_write("Input value type error! {}".format(e))
     return None
@@ -0,0 +1,139 @@
+"""
+Module is responsible for SSD1306 OLED display handling
+dedicated to micrOS framework.
+- Shared display object for the OLED LMs (128x64 I2C)
+- Dirty region tracking: column range per page (8 pixel rows)
+    - flush transmits only the changed part of the dirty pages
+- Drawing primitives mark their bounding box dirty
+- Batch draw: several primitives with one flush
+
+Designed by Marcell Ban aka BxNxM
+"""
+#################################################################
+#                           IMPORTS                             #
+#################################################################
+from array import array
+
+#################################################################
+#                      DISPLAY PARAMETERS                       #
+#################################################################
+WIDTH = 128
+HEIGHT = 64
+PAGES = HEIGHT // 8
+__OLED = [None]
+# Dirty column range per page: x min (0..PAGES-1), x max (PAGES..2*PAGES-1) - clean page: x min > x max
+__DIRTY = array('h', [WIDTH] * PAGES + [-1] * PAGES)
+# [flush counter, sent pages, sent bytes]
+__STAT = [0, 0, 0]
+# Full screen fill counter - screen content owners (widgets) detect overdraw
+FILLS = [0]
+
+#################################################################
+#                        DISPLAY OBJECT                         #
+#################################################################
+
+
+def display():
+    """
+    Init (once) and return the SSD1306 display object
+    """
+    if __OLED[0] is None:
+        from machine import Pin, I2C
+        from ssd1306 import SSD1306_I2C
+        from LogicalPins import get_pin_on_platform_by_key
+        i2c = I2C(-1, Pin(get_pin_on_platform_by_key('i2c_scl')), Pin(get_pin_on_platform_by_key('i2c_sda')))
+        __OLED[0] = SSD1306_I2C(WIDTH, HEIGHT, i2c)
+        mark(0, 0, WIDTH, HEIGHT)
+    return __OLED[0]
+
+
+def mark(x, y, w, h):
+    """
+    Mark rectangle dirty (clipped to the screen)
+    """
+    x_min, x_max = max(0, x), min(WIDTH - 1, x + w - 1)
+    y_min, y_max = max(0, y), min(HEIGHT - 1, y + h - 1)
+    if x_min > x_max or y_min > y_max:
+        return
+    for page in range(y_min // 8, y_max // 8 + 1):
+        if x_min < __DIRTY[page]:
+            __DIRTY[page] = x_min
+        if x_max > __DIRTY[PAGES + page]:
+            __DIRTY[PAGES + page] = x_max
+
+
+def flush():
+    """
+    Transmit the dirty page regions only
+    return sent bytes
+    """
+    oled = display()
+    sent = 0
+    buffer = memoryview(oled.buffer)
+    for page in range(0, PAGES):
+        x_min, x_max = __DIRTY[page], __DIRTY[PAGES + page]
+        if x_min > x_max:
+            continue
+        # SET_COL_ADDR, SET_PAGE_ADDR window, then the page slice
+        for cmd in (0x21, x_min, x_max, 0x22, page, page):
+            oled.write_cmd(cmd)
+        oled.write_data(buffer[page * WIDTH + x_min:page * WIDTH + x_max + 1])
+        __DIRTY[page], __DIRTY[PAGES + page] = WIDTH, -1
+        sent += x_max - x_min + 1
+        __STAT[1] += 1
+    __STAT[0] += 1
+    __STAT[2] += sent
+    return sent
+
+
+def display_stat():
+    return {'flush': __STAT[0], 'pages': __STAT[1], 'bytes': __STAT[2],
+            'dirty': [page for page in range(0, PAGES) if __DIRTY[page] <= __DIRTY[PAGES + page]]}
+
+#################################################################
+#                      DRAWING PRIMITIVES                       #
+#################################################################
+
+
+def text(intext, x, y, c=1):
+    display().text(intext, x, y, c)
+    mark(x, y, len(intext) * 8, 8)
+
+
+def line(sx, sy, ex, ey, c=1):
+    display().line(sx, sy, ex, ey, c)
+    mark(min(sx, ex), min(sy, ey), abs(ex - sx) + 1, abs(ey - sy) + 1)
+
+
+def rect(x, y, w, h, c=1):
+    display().rect(x, y, w, h, c)
+    mark(x, y, w, h)
+
+
+def fill_rect(x, y, w, h, c=1):
+    display().fill_rect(x, y, w, h, c)
+    mark(x, y, w, h)
+
+
+def pixel(x, y, c=1):
+    display().pixel(x, y, c)
+    mark(x, y, 1, 1)
+
+
+def fill(c=0):
+    display().fill(c)
+    mark(0, 0, WIDTH, HEIGHT)
+    FILLS[0] += 1
+
+
+__PRIMITIVES = {'text': text, 'line': line, 'rect': rect, 'fill_rect': fill_rect, 'pixel': pixel, 'fill': fill}
+
+
+def batch(operations):
+    """
+    Draw several primitives with one flush
+        operations: [('text', 'hello', 0, 0), ('line', 0, 10, 127, 10), ...]
+    """
+    for operation in operations:
+        __PRIMITIVES[operation[0]](*operation[1:])
+    return flush()
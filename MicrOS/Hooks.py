@@ -36,7 +36,7 @@ def bootup_hook():
         for shell_cmd in (cmd.strip() for cmd in tuple(cfgget('boothook').split(';')) if len(cmd.split()) > 1):
             console_write("|-[BOOT HOOKS] SHELL EXEC: {}".format(shell_cmd))
             try:
-                state = execute_LM_function_Core(shell_cmd.split())
+                state = execute_LM_function_Core(shell_cmd.split(), origin=4)
                 console_write("|-[BOOT HOOKS] state: {}".format(state))
             except Exception as e:
                 console_write("|--[BOOT HOOKS] error: {}".format(e))
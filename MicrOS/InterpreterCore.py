@@ -2,6 +2,14 @@
 Module is responsible for user executables invocation
 dedicated to micrOS framework.
 - Core element for socket based command (LM) handling
+- LM function handle cache - no exec/eval (compile) per call
+- LM residency manager - memory aware LRU unload
+    - last use time + import footprint (mem_free delta) per LM
+    - evict LRU LMs before import under free memory watermark (lmfreewm)
+    - pinned LMs (cron, IRQ callbacks) are never evicted
+- LM function profiling - fixed size table
+    - call/error count, min/avg/max execution time (us), max heap delta
+    - call count by origin: shell, timirq, cron, extirq, hook, sub
 Used in:
 - InterpreterShell
 - InterruptHandler
@@ -13,18 +21,50 @@ Designed by Marcell Ban aka BxNxM
 #                           IMPORTS                             #
 #################################################################
 from sys import modules
+from array import array
+from ConfigHandler import cfgget
+try:
+    from gc import collect, mem_free
+except:
+    from simgc import collect, mem_free     # simulator mode
+try:
+    from time import ticks_ms, ticks_us, ticks_diff
+except ImportError:
+    from simtime import ticks_ms, ticks_us, ticks_diff    # simulator mode
+
+# LM function handle cache: {'LM_name.function': callable}
+__LM_FUNC_CACHE = {}
+__LM_FUNC_CACHE_SIZE = 10
+# LM residency: {'LM_name': [last use ms, footprint byte]}
+__LM_RESIDENCY = {}
+# Never evicted LMs (cron, IRQ callbacks)
+__LM_PINNED = set()
+# [evicted counter, last evicted LM]
+__LM_EVICT_STAT = [0, None]
+# LM PROFILING TABLE (preallocated) - row per LM function:
+#   calls, errors, min us, max us, sum us, max heap delta byte
+PROF_ORIGINS = ('shell', 'timirq', 'cron', 'extirq', 'hook', 'sub')
+__PROF_SIZE = 16
+__PROF_FIELDS = 6
+__PROF_TABLE = array('l', [0] * (__PROF_SIZE * __PROF_FIELDS))
+# {'lm.function': row}, row names, [dropped calls (table full)]
+__PROF_INDEX = {}
+__PROF_NAMES = []
+__PROF_STAT = [0]
+__PROF_ORIGIN_CALLS = array('l', [0] * len(PROF_ORIGINS))
 
 #################################################################
 #               Interpreter shell CORE executor                 #
 #################################################################
 
 
-def execute_LM_function_Core(argument_list, SocketServerObj=None):
+def execute_LM_function_Core(argument_list, SocketServerObj=None, origin=0):
     """
     [1] module name (LM)
     [2] function
     [3...] parameters (separator: space)
     NOTE: SocketServerObj is None from Interrupts and Hooks - shared functionality
+    origin: caller for profiling - PROF_ORIGINS index
     """
     json_mode = False
     # Check json mode for LM execution
@@ -33,14 +73,21 @@ def execute_LM_function_Core(argument_list, SocketServerObj=None):
         json_mode = True
 
     if len(argument_list) >= 2:
-        LM_name, LM_function, LM_function_params = "LM_{}".format(argument_list[0]), argument_list[1], ', '.join(argument_list[2:])
+        LM_name, LM_function = "LM_{}".format(argument_list[0]), argument_list[1]
         try:
             # --- LM LOAD & EXECUTE --- #
-            # [1] LOAD MODULE
-            if LM_name not in modules.keys():
-                exec("import {}".format(LM_name))
+            # [1] LOAD MODULE & RESOLVE FUNCTION (cached)
+            lm_func = __get_LM_function(LM_name, LM_function)
             # [2] EXECUTE FUNCTION FROM MODULE - over SocketServerObj or /dev/null
-            lm_output = eval("{}.{}({})".format(LM_name, LM_function, LM_function_params))
+            args, kwargs = __parse_LM_params(argument_list[2:])
+            __PROF_ORIGIN_CALLS[origin] += 1
+            heap_before, start_us = mem_free(), ticks_us()
+            try:
+                lm_output = lm_func(*args, **kwargs)
+            except Exception:
+                __profile(LM_name, LM_function, start_us, heap_before, is_error=True)
+                raise
+            __profile(LM_name, LM_function, start_us, heap_before)
             if SocketServerObj is not None:
                 if not json_mode and isinstance(lm_output, dict):
                     # human readable format (not json mode) but dict
@@ -54,11 +101,12 @@ def execute_LM_function_Core(argument_list, SocketServerObj=None):
             # ERROR MSG: - over SocketServerObj or stdout
             print("execute_LM_function {}->{}: {}".format(LM_name, LM_function, e))
             if SocketServerObj is not None:
+                # Framed mode status: error
+                SocketServerObj.frame[3] = 1
                 SocketServerObj.reply_message("execute_LM_function {}->{}: {}".format(LM_name, LM_function, e))
             if 'memory allocation failed' in str(e) or 'is not defined' in str(e):
                 # UNLOAD MODULE IF MEMORY ERROR HAPPENED
-                if LM_name in modules.keys():
-                    del modules[LM_name]
+                lm_unload(LM_name)
                 return False
         # RETURN WITH HEALTH STATE - TRUE :) -> NO ACTION -or- FALSE :( -> RECOVERY ACTION
         return True
@@ -66,7 +114,239 @@ def execute_LM_function_Core(argument_list, SocketServerObj=None):
     # Syntax error show help msg
     print("SHELL: Missing argument: [1](LM)module [2]function [3...]optional params")
     if SocketServerObj is not None:
+        # Framed mode status: syntax
+        SocketServerObj.frame[3] = 2
         SocketServerObj.reply_message("SHELL: type help for single word commands (built-in)")
         SocketServerObj.reply_message("SHELL: for LM exec: [1](LM)module [2]function [3...]optional params")
     # RETURN WITH HEALTH STATE - TRUE :) -> NO ACTION -or- FALSE :( -> RECOVERY ACTION
     return True
+
+#################################################################
+#              LM function handle cache and parser              #
+#################################################################
+
+
+def __get_LM_function(LM_name, LM_function):
+    """
+    Resolve LM_name.LM_function over sys.modules + getattr
+    - import module if not loaded
+    - cache the callable (bounded)
+    """
+    key = "{}.{}".format(LM_name, LM_function)
+    if LM_name in modules:
+        residency = __LM_RESIDENCY.get(LM_name, None)
+        if residency is not None:
+            residency[0] = ticks_ms()
+        lm_func = __LM_FUNC_CACHE.get(key, None)
+        if lm_func is not None:
+            return lm_func
+    else:
+        # Module (re)load - drop handles from the previous instance
+        lm_cache_invalidate(LM_name)
+        __load_LM(LM_name)
+    lm_func = getattr(modules[LM_name], LM_function)
+    if len(__LM_FUNC_CACHE) >= __LM_FUNC_CACHE_SIZE:
+        del __LM_FUNC_CACHE[next(iter(__LM_FUNC_CACHE))]
+    __LM_FUNC_CACHE[key] = lm_func
+    return lm_func
+
+
+def lm_cache_invalidate(LM_name=None):
+    """
+    Remove cached function handles - all or by LM name
+    - call it on module unload to release the module references
+    """
+    if LM_name is None:
+        __LM_FUNC_CACHE.clear()
+        return
+    prefix = "{}.".format(LM_name)
+    for key in [k for k in __LM_FUNC_CACHE if k.startswith(prefix)]:
+        del __LM_FUNC_CACHE[key]
+
+
+#################################################################
+#                   LM residency manager (LRU)                  #
+#################################################################
+
+
+def __load_LM(LM_name):
+    """
+    Import LM with memory watermark check and footprint measurement
+    """
+    collect()
+    __evict_LRU_LM(int(cfgget('lmfreewm')))
+    mem_before = mem_free()
+    __import__(LM_name)
+    collect()
+    __LM_RESIDENCY[LM_name] = [ticks_ms(), max(0, mem_before - mem_free())]
+
+
+def __evict_LRU_LM(watermark):
+    """
+    Unload least recently used (not pinned) LMs while free memory < watermark
+    """
+    while mem_free() < watermark:
+        now = ticks_ms()
+        lru_name, lru_age = None, -1
+        for name, residency in __LM_RESIDENCY.items():
+            age = ticks_diff(now, residency[0])
+            if name not in __LM_PINNED and age > lru_age:
+                lru_name, lru_age = name, age
+        if lru_name is None:
+            return
+        print("[LM] evict {} (free {} < {} byte)".format(lru_name, mem_free(), watermark))
+        lm_unload(lru_name)
+        __LM_EVICT_STAT[0] += 1
+        __LM_EVICT_STAT[1] = lru_name
+        collect()
+
+
+def lm_unload(LM_name):
+    """
+    Unload LM: function handles, residency data, sys.modules
+    """
+    lm_cache_invalidate(LM_name)
+    if LM_name in __LM_RESIDENCY:
+        del __LM_RESIDENCY[LM_name]
+    if LM_name in modules:
+        del modules[LM_name]
+
+
+def lm_pin(LM_name, pin=True):
+    """
+    Pin (never evict) or unpin LM, LM_name: LM_<name> or <name>
+    """
+    LM_name = LM_name if LM_name.startswith('LM_') else "LM_{}".format(LM_name)
+    if pin:
+        __LM_PINNED.add(LM_name)
+    elif LM_name in __LM_PINNED:
+        __LM_PINNED.remove(LM_name)
+
+
+def lm_residency():
+    """
+    LM residency info: last use (ms ago), import footprint, pinned + eviction stat
+    """
+    now = ticks_ms()
+    lms = {name: {'used_ms_ago': ticks_diff(now, residency[0]), 'footprint': residency[1],
+                  'pinned': name in __LM_PINNED} for name, residency in __LM_RESIDENCY.items()}
+    return {'lm': lms, 'evicted': __LM_EVICT_STAT[0], 'last_evicted': __LM_EVICT_STAT[1],
+            'watermark': cfgget('lmfreewm'), 'mem_free': mem_free()}
+
+
+#################################################################
+#                     LM function profiling                     #
+#################################################################
+
+
+def __profile(LM_name, LM_function, start_us, heap_before, is_error=False):
+    """
+    Update LM function row in the profiling table - no table allocation after the first call
+    Row key: lm.function name - no reference to the callable (LM unload / reload)
+    """
+    delta_us = ticks_diff(ticks_us(), start_us)
+    heap_delta = heap_before - mem_free()
+    name = "{}.{}".format(LM_name[3:], LM_function)
+    row = __PROF_INDEX.get(name, None)
+    if row is None:
+        if len(__PROF_NAMES) >= __PROF_SIZE:
+            __PROF_STAT[0] += 1
+            return
+        row = len(__PROF_NAMES)
+        __PROF_INDEX[name] = row
+        __PROF_NAMES.append(name)
+        __PROF_TABLE[row * __PROF_FIELDS + 2] = 0x7FFFFFFF
+    offset = row * __PROF_FIELDS
+    if __PROF_TABLE[offset + 4] > 0x7FFFFFFF - delta_us:
+        # Sum overflow - halve sum and calls (average is kept)
+        __PROF_TABLE[offset + 4] //= 2
+        __PROF_TABLE[offset] //= 2
+    __PROF_TABLE[offset] += 1
+    if is_error:
+        __PROF_TABLE[offset + 1] += 1
+    if delta_us < __PROF_TABLE[offset + 2]:
+        __PROF_TABLE[offset + 2] = delta_us
+    if delta_us > __PROF_TABLE[offset + 3]:
+        __PROF_TABLE[offset + 3] = delta_us
+    __PROF_TABLE[offset + 4] += delta_us
+    if heap_delta > __PROF_TABLE[offset + 5]:
+        __PROF_TABLE[offset + 5] = heap_delta
+
+
+def lm_profile(reset=False):
+    """
+    LM function profiling data dump (or reset)
+    """
+    if reset:
+        for index in range(0, len(__PROF_TABLE)):
+            __PROF_TABLE[index] = 0
+        for index in range(0, len(__PROF_ORIGIN_CALLS)):
+            __PROF_ORIGIN_CALLS[index] = 0
+        __PROF_INDEX.clear()
+        __PROF_NAMES.clear()
+        __PROF_STAT[0] = 0
+        return {'reset': True}
+    profile = {}
+    for row, name in enumerate(__PROF_NAMES):
+        offset = row * __PROF_FIELDS
+        calls = __PROF_TABLE[offset]
+        profile[name] = {'calls': calls, 'errors': __PROF_TABLE[offset + 1], 'min_us': __PROF_TABLE[offset + 2],
+                         'avg_us': __PROF_TABLE[offset + 4] // calls if calls > 0 else 0,
+                         'max_us': __PROF_TABLE[offset + 3], 'heap_max': __PROF_TABLE[offset + 5]}
+    return {'lm': profile, 'origin': {PROF_ORIGINS[i]: __PROF_ORIGIN_CALLS[i] for i in range(0, len(PROF_ORIGINS))},
+            'dropped': __PROF_STAT[0]}
+
+
+def __parse_LM_params(param_list):
+    """
+    Parse shell parameters to typed positional and keyword arguments
+        - 10 -> int, 1.5 -> float, True/False -> bool, None
+        - 'text' or "text" -> str (quoted text with spaces supported)
+        - key=value -> kwargs
+        - other words -> str
+    """
+    args, kwargs = [], {}
+    buff, qchar = None, None
+    for param in param_list:
+        is_kwarg = '=' in param and param[0] not in ('"', "'")
+        if buff is not None:
+            # Join quoted text fragments (separated by space)
+            buff = "{} {}".format(buff, param)
+            if not param.endswith(qchar):
+                continue
+            param, buff = buff, None
+            is_kwarg = '=' in param and param[0] not in ('"', "'")
+        else:
+            value = param.split('=', 1)[1] if is_kwarg else param
+            if value[:1] in ('"', "'") and (len(value) == 1 or not value.endswith(value[0])):
+                buff, qchar = param, value[0]
+                continue
+        if is_kwarg:
+            key, value = param.split('=', 1)
+            kwargs[key] = __param_type(value)
+        else:
+            args.append(__param_type(param))
+    if buff is not None:
+        # Unclosed quote - use it as it is
+        args.append(buff)
+    return args, kwargs
+
+
+def __param_type(value):
+    if len(value) > 1 and value[0] in ('"', "'") and value[-1] == value[0]:
+        return value[1:-1]
+    if value == 'True':
+        return True
+    if value == 'False':
+        return False
+    if value == 'None':
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    return value
@@ -5,6 +5,8 @@ Built-in-function:
 - Shell wrapper for safe InterpreterCore interface
 - Configuration handling interface - state machine handling
 - Help (runtime) message generation
+    - LM functions from the static index (sfuncman.idx) - read line by line (per LM)
+    - LMs without index entry: function definitions of [py] sources
 
 Designed by Marcell Ban aka BxNxM
 """
@@ -12,7 +14,7 @@ Designed by Marcell Ban aka BxNxM
 #                           IMPORTS                             #
 #################################################################
 from os import listdir
-from ConfigHandler import cfgget, cfgput, read_cfg_file
+from ConfigHandler import cfgget, cfgput, cfgflush, read_cfg_file
 from InterpreterCore import execute_LM_function_Core
 
 try:
@@ -20,6 +22,9 @@ try:
 except:
     from simgc import collect, mem_free  # simulator mode
 
+# Static LM function index (generated by MicrOSDevEnv): line per LM - name<tab>signature<tab>...
+__LM_INDEX = 'sfuncman.idx'
+
 
 #################################################################
 #                  SHELL Interpreter FUNCTIONS                  #
@@ -61,12 +66,20 @@ def __shell(msg, SocketServerObj):
 
     # HELP MSG
     if msg_list[0] == 'help':
+        if len(msg_list) > 1:
+            # LM functions only: help <lm>
+            __show_LMs_functions(SocketServerObj, lm_filter=msg_list[1])
+            return True
         SocketServerObj.reply_message("[MICROS]   - commands (SocketServer built-in)")
         SocketServerObj.reply_message("   hello   - default hello msg - identify device")
         SocketServerObj.reply_message("   version - shows micrOS version")
         SocketServerObj.reply_message("   exit    - exit from shell socket prompt")
         SocketServerObj.reply_message("   reboot  - system safe reboot")
         SocketServerObj.reply_message("   webrepl - start web repl for file transfers - update")
+        SocketServerObj.reply_message("   frame   - framed protocol mode for machine clients (length prefixed)")
+        SocketServerObj.reply_message("   subscribe <lm> <func> <period sec> - push LM result periodically")
+        SocketServerObj.reply_message("   unsubscribe [<lm> <func>]          - stop subscription(s)")
+        SocketServerObj.reply_message("   help <lm> - LM functions with parameters")
         SocketServerObj.reply_message("[CONF] Configure mode (InterpreterShell built-in):")
         SocketServerObj.reply_message("  conf       - Enter conf mode")
         SocketServerObj.reply_message("    dump       - Dump all data")
@@ -125,7 +138,7 @@ def __configure(attributes, SocketServerObj):
                 return True
         # Set new parameter(s)
         try:
-            output = cfgput(key, value, type_check=True)
+            output = cfgput(key, value, type_check=True) and cfgflush()
         except Exception as e:
             SocketServerObj.reply_message("node_config write error: {}".format(e))
             output = False
@@ -150,17 +163,41 @@ def __irq_mem_requirement_check(key):
 #################################################################
 
 
-def __show_LMs_functions(SocketServerObj):
+def __show_LMs_functions(SocketServerObj, lm_filter=None):
     """
-    Dump LM modules with functions - in case of [py] files
+    Dump LM modules with functions - static index (sfuncman.idx), one LM (line) at a time
+    Dump LM modules without index entry - in case of [py] files: function definitions
     Dump LM module with help function call - in case of [mpy] files
+        lm_filter: LM name - dump only one LM
     """
-    for lm_path in (i for i in listdir() if i.startswith('LM_') and (i.endswith('py'))):
+    lm_paths = [i for i in listdir() if i.startswith('LM_') and (i.endswith('py'))
+                and (lm_filter is None or i.split('.')[0] == 'LM_{}'.format(lm_filter))]
+    if len(lm_paths) == 0 and lm_filter is not None:
+        SocketServerObj.reply_message("No LM: {}".format(lm_filter))
+        return
+    try:
+        with open(__LM_INDEX, 'r') as f:
+            line = f.readline()
+            while line and len(lm_paths) > 0:
+                functions = line.rstrip().split('\t')
+                line = f.readline()
+                # Indexed LM is on the device - py or mpy
+                indexed = [lm_path for lm_path in lm_paths if lm_path.split('.')[0] == 'LM_{}'.format(functions[0])]
+                if len(indexed) == 0:
+                    continue
+                lm_paths.remove(indexed[0])
+                SocketServerObj.reply_message("   {}".format(functions[0]))
+                for function in functions[1:]:
+                    SocketServerObj.reply_message("   {}{}".format(" " * len(functions[0]), function))
+    except OSError:
+        # No static index - parse sources
+        pass
+    for lm_path in lm_paths:
         lm_name = lm_path.replace('LM_', '').split('.')[0]
         try:
             SocketServerObj.reply_message("   {}".format(lm_name))
             if lm_path.endswith('.mpy'):
-                SocketServerObj.reply_message("   {}help".format(" " * len(lm_path.replace('LM_', '').split('.')[0])))
+                SocketServerObj.reply_message("   {}help".format(" " * len(lm_name)))
                 continue
             with open(lm_path, 'r') as f:
                 line = "micrOSisTheBest"
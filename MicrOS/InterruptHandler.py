@@ -9,15 +9,21 @@ handling dedicated to micrOS framework.
     - Advanced - time stump ! LM function;
     -            0-6:0-24:0-59:0-59!system heartbeat; etc.
 
+- Deferred execution: IRQ callbacks only enqueue a job id,
+  LMs are executed by the job worker (micropython.schedule / asyncio)
+- crontasks config change: cron table recompile without reboot (cfgwatch)
+
 Designed by Marcell Ban aka BxNxM
 """
 #################################################################
 #                            IMPORTS                            #
 #################################################################
-from ConfigHandler import cfgget, console_write
-from InterpreterCore import execute_LM_function_Core
+from ConfigHandler import cfgfast, cfgwatch, console_write, cfgflush
+from InterpreterCore import execute_LM_function_Core, lm_pin
 from LogicalPins import get_pin_on_platform_by_key
-from Scheduler import scheduler
+from Scheduler import scheduler, compile_crontab
+from micropython import schedule
+from sys import modules
 
 
 # TIMER IRQ AND CRON VALUES PERSISTENT CACHE
@@ -27,14 +33,22 @@ CFG_TIMER_IRQ = ['n/a', 3]
 # EVENT IRQ VALUE PERSISTENT CACHE
 CFG_EVIRQCBF = 'n/a'
 
+# DEFERRED IRQ JOB RING (preallocated) - job ids:
+#   0: timirq simple, 1: timirq cron, 2: extirq event
+#   capacity: len(IRQ_QUEUE)-1 (single producer/consumer ring)
+IRQ_QUEUE = bytearray(9)
+# IRQ_QSTAT: head, tail, dropped jobs, high-water mark, worker scheduled, async worker
+IRQ_QSTAT = [0, 0, 0, 0, False, False]
+
 #################################################################
 #            CONFIGURE INTERRUPT MEMORY BUFFER                  #
 #################################################################
 
 
 def set_emergency_buffer():
-    emergency_buff_kb = cfgget('irqmembuf')
-    if cfgget('extirq') or cfgget("timirq"):
+    cfg = cfgfast()
+    emergency_buff_kb = cfg.irqmembuf
+    if cfg.extirq or cfg.timirq:
         from micropython import alloc_emergency_exception_buf
         console_write("[IRQ] Interrupts was enabled, alloc_emergency_exception_buf={}".format(emergency_buff_kb))
         alloc_emergency_exception_buf(emergency_buff_kb)
@@ -51,19 +65,29 @@ def set_emergency_buffer():
 
 
 def secureInterruptHandlerSimple(timer=None):
+    # Defer execution: simple timirq job
+    __irq_enqueue(0)
+
+
+def secureInterruptHandlerScheduler(timer=None):
+    # Defer execution: cron timirq job
+    __irq_enqueue(1)
+
+
+def __exec_timirq_simple():
     try:
         # Execute CBF from cached config
-        state = execute_LM_function_Core(CFG_TIMER_IRQ[0].split(' '))
+        state = execute_LM_function_Core(CFG_TIMER_IRQ[0].split(' '), origin=1)
         if not state:
             console_write("[IRQ] TIMIRQ execute_LM_function_Core error: {}".format(CFG_TIMER_IRQ[0]))
     except Exception as e:
         console_write("[IRQ] TIMIRQ callback: {} error: {}".format(CFG_TIMER_IRQ[0], e))
 
 
-def secureInterruptHandlerScheduler(timer=None):
+def __exec_timirq_scheduler():
     try:
-        # Execute CBF LIST from local cached config with timirqseq in sec
-        scheduler(CFG_TIMER_IRQ[0], CFG_TIMER_IRQ[1])
+        # Execute CBF LIST from precompiled cron table with timirqseq in sec
+        scheduler(CFG_TIMER_IRQ[1])
     except Exception as e:
         console_write("[IRQ] TIMIRQ (cron) callback: {} error: {}".format(CFG_TIMER_IRQ[0], e))
 
@@ -79,12 +103,13 @@ def enableInterrupt():
     - FIRST PRIORITY: SCHEDULER
     - SECOND PRIORITY: SIMPLE PERIODIC CALLBACK
     """
-    console_write("[IRQ] TIMIRQ SETUP - TIMIRQ: {} SEQ: {}".format(cfgget("timirq"), cfgget("timirqseq")))
-    console_write("|- [IRQ] CRON:{} CBF:{}".format(cfgget('cron'), cfgget('crontasks')))
-    console_write("|- [IRQ] SIMPLE CBF:{}".format(cfgget('timirqcbf')))
-    if cfgget("timirq"):
+    cfg = cfgfast()
+    console_write("[IRQ] TIMIRQ SETUP - TIMIRQ: {} SEQ: {}".format(cfg.timirq, cfg.timirqseq))
+    console_write("|- [IRQ] CRON:{} CBF:{}".format(cfg.cron, cfg.crontasks))
+    console_write("|- [IRQ] SIMPLE CBF:{}".format(cfg.timirqcbf))
+    if cfg.timirq:
         # Configure advanced scheduler OR simple repeater
-        if cfgget('cron') and cfgget('crontasks').lower() != 'n/a':
+        if cfg.cron and cfg.crontasks.lower() != 'n/a':
             console_write("|-- TIMER IRQ MODE: SCHEDULER")
             # ENABLE ADVANCED SCHEDULER (BASED ON SIMPLE TIMIRQ)
             __enableInterruptScheduler()
@@ -99,13 +124,35 @@ def __enableInterruptScheduler():
     SMART TIMER INTERRUPT CONFIGURATION
     # MUST BE CHECK BEFORE CALL: cfgget("timirq") and cfgget('cron') and cfgget('crontasks')
     """
+    cfg = cfgfast()
     # CACHE TASKS FOR CBF
-    CFG_TIMER_IRQ[0] = cfgget('crontasks')
-    CFG_TIMER_IRQ[1] = int(cfgget("timirqseq") / 1000)
+    CFG_TIMER_IRQ[1] = int(cfg.timirqseq / 1000)
+    # COMPILE CRON TABLE ONCE - not in every timer tick + on crontasks change
+    __crontasks_update('crontasks', cfg.crontasks)
+    cfgwatch('crontasks', __crontasks_update)
     from machine import Timer
     # INIT TIMER IRQ with callback function wrapper
     timer = Timer(0)
-    timer.init(period=int(cfgget("timirqseq")), mode=Timer.PERIODIC, callback=secureInterruptHandlerScheduler)
+    timer.init(period=int(cfg.timirqseq), mode=Timer.PERIODIC, callback=secureInterruptHandlerScheduler)
+
+
+def __crontasks_update(key, value):
+    """
+    Compile cron table - config change callback (crontasks)
+    """
+    # UNPIN LMs of the previous cron table - except LMs pinned by IRQ callbacks and the sampler
+    cfg = cfgfast()
+    keep = [cbf.split()[0] for cbf in (cfg.timirqcbf, cfg.extirqcbf) if cbf.lower() != 'n/a' and cbf.strip()]
+    if 'Sampler' in modules:
+        keep += [sensor[0] for sensor in modules['Sampler'].SENSORS]
+    for cmd in modules['Scheduler'].CRON_TABLE[2]:
+        if cmd[0] not in keep:
+            lm_pin(cmd[0], pin=False)
+    CFG_TIMER_IRQ[0] = value
+    console_write("|-- CRON TASKS: {}".format(compile_crontab(CFG_TIMER_IRQ[0])))
+    # PIN CRON LMs - never evicted by the LM residency manager
+    for cmd in modules['Scheduler'].CRON_TABLE[2]:
+        lm_pin(cmd[0])
 
 
 def __enableInterruptSimple():
@@ -113,15 +160,17 @@ def __enableInterruptSimple():
     SIMPLE TIMER INTERRUPT CONFIGURATION
     """
     # LOAD DATA FOR TIMER IRQ: cfgget("timirq")
+    cfg = cfgfast()
     # CACHE TASK FOR CBF
-    CFG_TIMER_IRQ[0] = cfgget('timirqcbf')
+    CFG_TIMER_IRQ[0] = cfg.timirqcbf
     if CFG_TIMER_IRQ[0].lower() != 'n/a':
+        lm_pin(CFG_TIMER_IRQ[0].split()[0])
         from machine import Timer
         # INIT TIMER IRQ with callback function wrapper
         timer = Timer(0)
-        timer.init(period=int(cfgget("timirqseq")), mode=Timer.PERIODIC, callback=secureInterruptHandlerSimple)
+        timer.init(period=int(cfg.timirqseq), mode=Timer.PERIODIC, callback=secureInterruptHandlerSimple)
     else:
-        console_write("[IRQ] TIMIRQ: isenable: {} callback: {}".format(cfgget("timirq"), cfgget('timirqcbf')))
+        console_write("[IRQ] TIMIRQ: isenable: {} callback: {}".format(cfg.timirq, cfg.timirqcbf))
 
 
 #################################################################
@@ -137,8 +186,13 @@ def secureEventInterruptHandler(pin=None):
     """
     EVENT INTERRUPT CALLBACK FUNCTION WRAPPER
     """
+    # Defer execution: extirq event job
+    __irq_enqueue(2)
+
+
+def __exec_event_irq():
     try:
-        state = execute_LM_function_Core(CFG_EVIRQCBF.split(' '))
+        state = execute_LM_function_Core(CFG_EVIRQCBF.split(' '), origin=3)
         if not state:
             console_write("[IRQ] EXTIRQ execute_LM_function_Core error: {}".format(CFG_EVIRQCBF))
     except Exception as e:
@@ -150,8 +204,10 @@ def init_eventPIN():
     EVENT INTERRUPT CONFIGURATION
     """
     global CFG_EVIRQCBF
-    if cfgget('extirq') and cfgget('extirqcbf').lower() != 'n/a':
-        CFG_EVIRQCBF = cfgget('extirqcbf')
+    cfg = cfgfast()
+    if cfg.extirq and cfg.extirqcbf.lower() != 'n/a':
+        CFG_EVIRQCBF = cfg.extirqcbf
+        lm_pin(CFG_EVIRQCBF.split()[0])
         pin = get_pin_on_platform_by_key('pwm_4')
         console_write("[IRQ] EVENTIRQ ENABLED PIN: {} CBF: {}".format(pin, CFG_EVIRQCBF))
         # Init event irq with callback function wrapper
@@ -159,7 +215,76 @@ def init_eventPIN():
         pin_obj = Pin(pin, Pin.IN, Pin.PULL_UP)
         pin_obj.irq(trigger=Pin.IRQ_RISING, handler=secureEventInterruptHandler)
     else:
-        console_write("[IRQ] EVENTIRQ: isenable: {} callback: {}".format(cfgget('extirq'), CFG_EVIRQCBF))
+        console_write("[IRQ] EVENTIRQ: isenable: {} callback: {}".format(cfg.extirq, CFG_EVIRQCBF))
+
+#################################################################
+#                   DEFERRED IRQ JOB QUEUE                      #
+#################################################################
+
+
+def __irq_enqueue(job_id):
+    """
+    IRQ context: store job id in the preallocated ring - no allocation, no LM execution
+    """
+    tail = (IRQ_QSTAT[1] + 1) % len(IRQ_QUEUE)
+    if tail == IRQ_QSTAT[0]:
+        # Queue is full - drop job
+        IRQ_QSTAT[2] += 1
+        return
+    IRQ_QUEUE[IRQ_QSTAT[1]] = job_id
+    IRQ_QSTAT[1] = tail
+    pending = (tail - IRQ_QSTAT[0]) % len(IRQ_QUEUE)
+    if pending > IRQ_QSTAT[3]:
+        IRQ_QSTAT[3] = pending
+    # Async worker polls the queue, else schedule the worker (main context)
+    if not (IRQ_QSTAT[5] or IRQ_QSTAT[4]):
+        IRQ_QSTAT[4] = True
+        try:
+            schedule(irq_job_worker, None)
+        except Exception:
+            # schedule queue full - retry with next job
+            IRQ_QSTAT[4] = False
+
+
+def irq_job_worker(_=None):
+    """
+    Drain the IRQ job ring - execute LMs outside of the IRQ callback
+    """
+    IRQ_QSTAT[4] = False
+    while IRQ_QSTAT[0] != IRQ_QSTAT[1]:
+        job_id = IRQ_QUEUE[IRQ_QSTAT[0]]
+        IRQ_QSTAT[0] = (IRQ_QSTAT[0] + 1) % len(IRQ_QUEUE)
+        if job_id == 0:
+            __exec_timirq_simple()
+        elif job_id == 1:
+            __exec_timirq_scheduler()
+        elif job_id == 2:
+            __exec_event_irq()
+    # Persist config and LM state changes (write-back)
+    cfgflush()
+    if 'StateStore' in modules:
+        modules['StateStore'].pds_flush()
+
+
+async def irq_job_worker_async(period_ms=20):
+    """
+    Asyncio job worker for aioserv mode (instead of micropython.schedule)
+    """
+    try:
+        import uasyncio as asyncio
+    except:
+        import asyncio      # simulator mode
+    IRQ_QSTAT[5] = True
+    period_sec = period_ms / 1000
+    while True:
+        irq_job_worker()
+        await asyncio.sleep(period_sec)
+
+
+def irq_queue_stat():
+    return {'pending': (IRQ_QSTAT[1] - IRQ_QSTAT[0]) % len(IRQ_QUEUE), 'size': len(IRQ_QUEUE) - 1,
+            'dropped': IRQ_QSTAT[2], 'high-water': IRQ_QSTAT[3]}
+
 
 #################################################################
 #                         INIT MODULE                           #
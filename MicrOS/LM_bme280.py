@@ -47,6 +47,7 @@ BME280_REGISTER_VERSION = 0xD1
 BME280_REGISTER_SOFTRESET = 0xE0
 
 BME280_REGISTER_CONTROL_HUM = 0xF2
+BME280_REGISTER_STATUS = 0xF3
 BME280_REGISTER_CONTROL = 0xF4
 BME280_REGISTER_CONFIG = 0xF5
 BME280_REGISTER_PRESSURE_DATA = 0xF7
@@ -54,6 +55,8 @@ BME280_REGISTER_TEMP_DATA = 0xFA
 BME280_REGISTER_HUMIDITY_DATA = 0xFD
 
 BME280_OBJ = None
+# Fast mode setup: [I2C freq Hz, oversampling mode]
+BME280_CFG = [10000, BME280_OSAMPLE_1]
 
 
 class Device:
@@ -162,6 +165,9 @@ class BME280:
         self._load_calibration()
         self._device.write8(BME280_REGISTER_CONTROL, 0x3F)
         self.t_fine = 0
+        # Burst read buffers (reused): 0xF7-0xFE data, status
+        self._burst = bytearray(8)
+        self._status = bytearray(1)
 
     def _load_calibration(self):
 
@@ -228,10 +234,32 @@ class BME280:
         raw = (msb << 8) | lsb
         return raw
 
+    def read_burst(self, timeout_ms=100):
+        """Forced mode measurement: status poll instead of fixed delay, one 8 byte burst read.
+        Returns temperature (0.01 ºC), pressure (Pa, Q24.8), humidity (%, Q22.10)"""
+        self._device.write8(BME280_REGISTER_CONTROL_HUM, self._mode)
+        self._device.write8(BME280_REGISTER_CONTROL, self._mode << 5 | self._mode << 2 | 1)
+        address, i2c = self._device._address, self._device._i2c
+        for _ in range(0, timeout_ms):
+            time.sleep_ms(1)
+            i2c.readfrom_mem_into(address, BME280_REGISTER_STATUS, self._status)
+            # Status bit 3: measuring
+            if not self._status[0] & 0x08:
+                break
+        i2c.readfrom_mem_into(address, BME280_REGISTER_PRESSURE_DATA, self._burst)
+        data = self._burst
+        # Single compensation pass: temperature first (t_fine)
+        temp = self.compensate_temperature((data[3] << 12) | (data[4] << 4) | (data[5] >> 4))
+        press = self.compensate_pressure((data[0] << 12) | (data[1] << 4) | (data[2] >> 4))
+        return temp, press, self.compensate_humidity((data[6] << 8) | data[7])
+
     def read_temperature(self):
         """Get the compensated temperature in 0.01 of a degree celsius."""
-        adc = self.read_raw_temp()
-        var1 = ((adc >> 3) - (self.dig_T1 << 1)) * (self.dig_T2 >> 11)
+        return self.compensate_temperature(self.read_raw_temp())
+
+    def compensate_temperature(self, adc):
+        """Integer temperature compensation, sets t_fine"""
+        var1 = (((adc >> 3) - (self.dig_T1 << 1)) * self.dig_T2) >> 11
         var2 = ((
                 (((adc >> 4) - self.dig_T1) * ((adc >> 4) - self.dig_T1)) >> 12) *
                 self.dig_T3) >> 14
@@ -240,13 +268,16 @@ class BME280:
 
     def read_pressure(self):
         """Gets the compensated pressure in Pascals."""
-        adc = self.read_raw_pressure()
+        return self.compensate_pressure(self.read_raw_pressure())
+
+    def compensate_pressure(self, adc):
+        """Integer pressure compensation (Q24.8 Pa), t_fine required"""
         var1 = self.t_fine - 128000
         var2 = var1 * var1 * self.dig_P6
         var2 = var2 + ((var1 * self.dig_P5) << 17)
         var2 = var2 + (self.dig_P4 << 35)
         var1 = (((var1 * var1 * self.dig_P3) >> 8) +
-                        ((var1 * self.dig_P2) >> 12))
+                        ((var1 * self.dig_P2) << 12))
         var1 = (((1 << 47) + var1) * self.dig_P1) >> 33
         if var1 == 0:
             return 0
@@ -257,8 +288,10 @@ class BME280:
         return ((p + var1 + var2) >> 8) + (self.dig_P7 << 4)
 
     def read_humidity(self):
-        adc = self.read_raw_humidity()
-        # print 'Raw humidity = {0:d}'.format (adc)
+        return self.compensate_humidity(self.read_raw_humidity())
+
+    def compensate_humidity(self, adc):
+        """Integer humidity compensation (Q22.10 %), t_fine required"""
         h = self.t_fine - 76800
         h = (((((adc << 14) - (self.dig_H4 << 20) - (self.dig_H5 * h)) +
                  16384) >> 15) * (((((((h * self.dig_H6) >> 10) * (((h *
@@ -273,9 +306,9 @@ class BME280:
     def temperature(self):
         """Return the temperature in degrees."""
         t = self.read_temperature()
-        ti = t // 100
-        td = t - ti * 100
-        return "{}.{:02d} ºC".format(ti, td)
+        ti = abs(t) // 100
+        td = abs(t) - ti * 100
+        return "{}{}.{:02d} ºC".format('-' if t < 0 else '', ti, td)
 
     @property
     def pressure(self):
@@ -297,15 +330,45 @@ class BME280:
 def __init_bme280_i2c():
     global BME280_OBJ
     if BME280_OBJ is None:
-        i2c = I2C(scl=Pin(get_pin_on_platform_by_key('i2c_scl')), sda=Pin(get_pin_on_platform_by_key('i2c_sda')), freq=10000)
-        BME280_OBJ = BME280(i2c=i2c)
+        i2c = I2C(scl=Pin(get_pin_on_platform_by_key('i2c_scl')), sda=Pin(get_pin_on_platform_by_key('i2c_sda')), freq=BME280_CFG[0])
+        BME280_OBJ = BME280(mode=BME280_CFG[1], i2c=i2c)
     return BME280_OBJ
 
 
 def measure():
-    bme = __init_bme280_i2c()
-    return {'Temperature': bme.temperature, 'Humidity': bme.humidity, 'Pressure': bme.pressure}
+    temp, press, hum = __init_bme280_i2c().read_burst()
+    press = press // 256
+    # Sign and abs value: floor division / modulo of negative values (-505 -> -6.95)
+    return {'Temperature': "{}{}.{:02d} ºC".format('-' if temp < 0 else '', abs(temp) // 100, abs(temp) % 100),
+            'Humidity': "{}.{:02d} %".format(hum // 1024, hum * 100 // 1024 % 100),
+            'Pressure': "{}.{:02d} hPa".format(press // 100, press % 100)}
+
+
+def measure_fast(freq=None, osample=None):
+    """
+    Numeric measurement (json mode): forced mode, one burst read
+        freq: I2C bus frequency in Hz (e.g. 400000), osample: oversampling 1, 2, 4, 8, 16
+        bus / oversampling change re-initialize the sensor object
+    """
+    global BME280_OBJ
+    if freq is not None or osample is not None:
+        cfg = [BME280_CFG[0] if freq is None else int(freq),
+               BME280_CFG[1] if osample is None else (1, 2, 4, 8, 16).index(int(osample)) + 1]
+        if cfg != BME280_CFG:
+            BME280_CFG[0], BME280_CFG[1] = cfg
+            BME280_OBJ = None
+    temp, press, hum = __init_bme280_i2c().read_burst()
+    return {'temp': temp / 100, 'hum': hum * 100 // 1024 / 100, 'press': press // 256 / 100}
+
+
+# Sampler channels: ºC, %, hPa (x100 integer values)
+SAMPLE_CHANNELS = ('temp', 'hum', 'press')
+
+
+def sample():
+    temp, press, hum = __init_bme280_i2c().read_burst()
+    return temp, hum * 100 // 1024, press // 256
 
 
 def help():
-    return 'measure'
\ No newline at end of file
+    return 'measure', 'measure_fast(freq=400000, osample=1) >json', 'sample'
\ No newline at end of file
@@ -90,6 +90,17 @@ def measure_mq135(temperature=None, humidity=None):
         return "measure_mq135 ERROR: {}".format(e)
 
 
+# Sampler channels: ppm (x100 integer value)
+SAMPLE_CHANNELS = ('co2',)
+
+
+def sample(temperature=20, humidity=33):
+    """
+    CO2 ppm with fixed (default: calibration) temperature and humidity
+    """
+    return min(int(__get_corrected_ppm(temperature, humidity) * 100), 0x7FFFFFFF),
+
+
 def help():
-    return 'measure_mq135(temp, hum)'
+    return 'measure_mq135(temp, hum)', 'sample'
 
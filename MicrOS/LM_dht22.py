@@ -31,6 +31,15 @@ def measure_w_co2():
     return {'temp [ºC]': _temp, 'hum [%]': _hum, 'co2 [ppm]': measure_mq135(_temp, _hum)}
 
 
+# Sampler channels: ºC, % (x100 integer values)
+SAMPLE_CHANNELS = ('temp', 'hum')
+
+
+def sample():
+    _temp, _hum = __temp_hum()
+    return int(_temp * 100), int(_hum * 100)
+
+
 def help():
-    return 'measure', 'measure_w_co2'
+    return 'measure', 'measure_w_co2', 'sample'
 
@@ -5,6 +5,7 @@ __DIMMER_OBJ = None
 # DATA: state:ON/OFF, value:0-1000
 __DIMMER_CACHE = [0, 500]
 __PERSISTENT_CACHE = False
+__DIMMER_TRANSITION = None
 
 
 #########################################
@@ -30,21 +31,19 @@ def __persistent_cache_manager(mode='r'):
     if not __PERSISTENT_CACHE:
         return
     global __DIMMER_CACHE
+    from StateStore import pds_save, pds_load
     if mode == 's':
         # SAVE CACHE
-        with open('dimmer.pds', 'w') as f:
-            f.write(','.join([str(k) for k in __DIMMER_CACHE]))
+        pds_save('dimmer', __DIMMER_CACHE)
         return
-    try:
-        # RESTORE CACHE
-        with open('dimmer.pds', 'r') as f:
-            __DIMMER_CACHE = [int(data) for data in f.read().strip().split(',')]
-    except:
-        pass
+    # RESTORE CACHE
+    __DIMMER_CACHE = pds_load('dimmer', __DIMMER_CACHE)
 
 
 def set_value(value=None):
     global __DIMMER_CACHE
+    if __DIMMER_TRANSITION is not None:
+        __DIMMER_TRANSITION.cancel()     # New target cancels the running transition
     # restore data from cache if was not provided
     value = int(__DIMMER_CACHE[1] if value is None else value)
     if 0 <= value <= 1000:
@@ -84,6 +83,33 @@ def toggle(state=None):
         return set_value(0)         # Set value to 0 - OFF
     return set_value()              # Set value to the cached - ON
 
+
+def __transition_done():
+    """
+    Transition final step: cache and save the final state only
+    """
+    value = __DIMMER_OBJ.duty()
+    __DIMMER_CACHE[0] = 0 if value == 0 else 1
+    if value > 0:
+        __DIMMER_CACHE[1] = value
+    __persistent_cache_manager('s')
+
+
+def transition(value=None, ms=1000, ease='inout'):
+    """
+    Fade to the target value on device
+        ms: transition time, ease: linear, in, out, inout
+    """
+    global __DIMMER_TRANSITION
+    value = int(__DIMMER_CACHE[1] if value is None else value)
+    if not 0 <= value <= 1000:
+        return "DIMMER ERROR, VALUE 0-1000 ONLY, GIVEN: {}".format(value)
+    if __DIMMER_TRANSITION is None:
+        from Transition import Transition
+        __DIMMER_TRANSITION = Transition((__dimmer_init(),), on_done=__transition_done)
+    __DIMMER_TRANSITION.start((value,), duration_ms=ms, easing=ease)
+    return "FADE DIMMER: {} in {} ms".format(value, ms)
+
 #########################################
 #                   HELP                #
 #########################################
@@ -91,5 +117,6 @@ def toggle(state=None):
 
 def help():
     return 'set_value(value=<0-1000>)', 'toggle(state=None)',\
+           'transition(value=<0-1000>, ms=1000, ease=<linear/in/out/inout>)', \
            'dimmer_cache_load_n_init(cache=True)', \
            '[!]PersistentStateCacheDisabledOn:esp8266'
@@ -4,6 +4,7 @@
 __RGB_OBJS = (None, None, None)
 __RGB_CACHE = [600, 600, 600, 0]           # R, G, B, RGB state
 __PERSISTENT_CACHE = False
+__RGB_TRANSITION = None
 
 
 #########################################
@@ -33,17 +34,13 @@ def __persistent_cache_manager(mode):
     if not __PERSISTENT_CACHE:
         return
     global __RGB_CACHE
+    from StateStore import pds_save, pds_load
     if mode == 's':
         # SAVE CACHE
-        with open('rgb.pds', 'w') as f:
-            f.write(','.join([str(k) for k in __RGB_CACHE]))
+        pds_save('rgb', __RGB_CACHE)
         return
-    try:
-        # RESTORE CACHE
-        with open('rgb.pds', 'r') as f:
-            __RGB_CACHE = [int(data) for data in f.read().strip().split(',')]
-    except:
-        pass
+    # RESTORE CACHE
+    __RGB_CACHE = pds_load('rgb', __RGB_CACHE)
 
 
 def rgb_cache_load_n_init(cache=None):
@@ -62,6 +59,8 @@ def rgb_cache_load_n_init(cache=None):
 
 def rgb(r=None, g=None, b=None):
     global __RGB_CACHE
+    if __RGB_TRANSITION is not None:
+        __RGB_TRANSITION.cancel()          # New target cancels the running transition
     r = __RGB_CACHE[0] if r is None else r
     g = __RGB_CACHE[1] if g is None else g
     b = __RGB_CACHE[2] if b is None else b
@@ -96,6 +95,35 @@ def toggle(state=None):
     return "ON"
 
 
+def __transition_done():
+    """
+    Transition final step: cache and save the final state only
+    """
+    global __RGB_CACHE
+    duties = [__RGB_OBJS[0].duty(), __RGB_OBJS[1].duty(), __RGB_OBJS[2].duty()]
+    if max(duties) > 0:
+        __RGB_CACHE = duties + [1]       # Cache channel duties if ON
+    else:
+        __RGB_CACHE[3] = 0
+    __persistent_cache_manager('s')
+
+
+def transition(r=None, g=None, b=None, ms=1000, ease='inout'):
+    """
+    Fade to the target color on device
+        ms: transition time, ease: linear, in, out, inout
+    """
+    global __RGB_TRANSITION
+    r = __RGB_CACHE[0] if r is None else r
+    g = __RGB_CACHE[1] if g is None else g
+    b = __RGB_CACHE[2] if b is None else b
+    if __RGB_TRANSITION is None:
+        from Transition import Transition
+        __RGB_TRANSITION = Transition(__RGB_init(), on_done=__transition_done)
+    __RGB_TRANSITION.start((r, g, b), duration_ms=ms, easing=ease)
+    return "FADE rgb: R{}G{}B{} in {} ms".format(r, g, b, ms)
+
+
 #########################################
 #                   HELP                #
 #########################################
@@ -103,5 +131,6 @@ def toggle(state=None):
 def help():
     return 'rgb(r=<0-1000>, g=<0-1000>, b=<0,1000>)',\
            'toggle(state=None)', \
+           'transition(r, g, b, ms=1000, ease=<linear/in/out/inout>)', \
            'rgb_cache_load_n_init(cache=None<True/False>)',\
            '[!]PersistentStateCacheDisabledOn:esp8266'
@@ -43,6 +43,14 @@ def illuminance():
     return {'illuminance [lux]': lux}
 
 
+# Sampler channels: % (x100 integer value)
+SAMPLE_CHANNELS = ('intensity',)
+
+
+def sample():
+    return __init_tempt6000().read_u16() * 10000 // 65535,
+
+
 def help():
-    return 'intensity', 'illuminance', 'INFO sensor:TEMP600'
+    return 'intensity', 'illuminance', 'sample', 'INFO sensor:TEMP600'
 
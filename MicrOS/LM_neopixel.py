@@ -1,4 +1,9 @@
 from sys import platform
+from micropython import schedule
+try:
+    from time import ticks_ms, ticks_diff
+except ImportError:
+    from simtime import ticks_ms, ticks_diff    # simulator mode
 #########################################
 #       DIGITAL CONTROLLER PARAMS       #
 #########################################
@@ -9,6 +14,18 @@ __PERSISTENT_CACHE = None
 if __PERSISTENT_CACHE is None:
     __PERSISTENT_CACHE = True if platform == 'esp32' else False
 
+#########################################
+#        ANIMATION ENGINE PARAMS        #
+#########################################
+# Effects: effect id is the index
+__ANIM_EFFECTS = ('fade', 'chase', 'rainbow', 'breathe')
+# Values: IS_RUNNING, EFFECT_ID, FRAME, TARGET_FPS, FRAME_CNT, FPS_WINDOW_START_MS, MEASURED_FPS
+__ANIM = [0, 0, 0, 0, 0, 0, 0]
+# Gamma + brightness lookup table (bytearray(256)) - computed on start
+__ANIM_LUT = None
+# Frame driver: machine.Timer object (or asyncio task in aioserv mode)
+__ANIM_DRIVER = None
+
 
 #########################################
 #        DIGITAL rgb WITH 1 "PWM"       #
@@ -41,17 +58,13 @@ def __persistent_cache_manager(mode):
     if not __PERSISTENT_CACHE:
         return
     global __DCACHE
+    from StateStore import pds_save, pds_load
     if mode == 's':
         # SAVE CACHE
-        with open('neopixel.pds', 'w') as f:
-            f.write(','.join([str(k) for k in __DCACHE]))
+        pds_save('neopixel', __DCACHE)
         return
-    try:
-        # RESTORE CACHE
-        with open('neopixel.pds', 'r') as f:
-            __DCACHE = [int(data) for data in f.read().strip().split(',')]
-    except:
-        pass
+    # RESTORE CACHE
+    __DCACHE = pds_load('neopixel', __DCACHE)
 
 
 def neopixel_cache_load_n_init(cache=None):
@@ -71,6 +84,8 @@ def neopixel(r=None, g=None, b=None):
     - Default and cached color scheme
     """
     global __DCACHE
+    if __ANIM[0]:
+        __anim_driver_stop()                            # Static color overrides animation
     r = __DCACHE[0] if r is None else r
     g = __DCACHE[1] if g is None else g
     b = __DCACHE[2] if b is None else b
@@ -110,6 +125,161 @@ def toggle(state=None):
     neopixel(__DCACHE[0], __DCACHE[1], __DCACHE[2])
     return "ON"
 
+#########################################
+#           ANIMATION ENGINE            #
+#########################################
+
+
+def __anim_render(_=None):
+    """
+    Render one animation frame into the NeoPixel buffer (in place)
+    - integer only, no per frame allocation
+    - colors mapped through the gamma/brightness lookup table
+    """
+    if not __ANIM[0]:
+        return
+    buf = __NEOPIXEL_OBJ.buf
+    n = __NEOPIXEL_OBJ.n
+    bpp = __NEOPIXEL_OBJ.bpp
+    o_r, o_g, o_b = __NEOPIXEL_OBJ.ORDER[0], __NEOPIXEL_OBJ.ORDER[1], __NEOPIXEL_OBJ.ORDER[2]
+    lut = __ANIM_LUT
+    effect = __ANIM[1]
+    frame = __ANIM[2]
+    r, g, b = __DCACHE[0], __DCACHE[1], __DCACHE[2]
+    if effect == 3:
+        # breathe: triangle wave intensity of the cached color
+        level = frame & 0x7F
+        level = level * 2 if level < 64 else (127 - level) * 2
+        r, g, b = r * level // 127, g * level // 127, b * level // 127
+    for pixel in range(0, n):
+        if effect == 0 or effect == 2:
+            # fade: whole strip walks the color wheel, rainbow: wheel spread over the strip
+            pos = (frame + pixel * 256 // n) & 0xFF if effect == 2 else frame & 0xFF
+            if pos < 85:
+                r, g, b = 255 - pos * 3, pos * 3, 0
+            elif pos < 170:
+                pos -= 85
+                r, g, b = 0, 255 - pos * 3, pos * 3
+            else:
+                pos -= 170
+                r, g, b = pos * 3, 0, 255 - pos * 3
+        elif effect == 1:
+            # chase: every 4th pixel lit with the cached color, shifted per frame
+            if (pixel + frame) & 0x3:
+                offset = pixel * bpp
+                buf[offset + o_r] = buf[offset + o_g] = buf[offset + o_b] = 0
+                continue
+            r, g, b = __DCACHE[0], __DCACHE[1], __DCACHE[2]
+        offset = pixel * bpp
+        buf[offset + o_r] = lut[r]
+        buf[offset + o_g] = lut[g]
+        buf[offset + o_b] = lut[b]
+    __NEOPIXEL_OBJ.write()
+    __ANIM[2] = (frame + 1) & 0xFFFF
+    # Measured FPS in 1 sec windows
+    __ANIM[4] += 1
+    now = ticks_ms()
+    delta = ticks_diff(now, __ANIM[5])
+    if delta >= 1000:
+        __ANIM[6] = __ANIM[4] * 1000 // delta
+        __ANIM[4] = 0
+        __ANIM[5] = now
+
+
+def __anim_timer_cb(timer=None):
+    """
+    Timer IRQ: defer frame rendering (skip frame if schedule queue is full)
+    """
+    try:
+        schedule(__anim_render, None)
+    except Exception:
+        pass
+
+
+async def __anim_task(period_ms):
+    """
+    asyncio (aioserv) frame driver
+    """
+    try:
+        import uasyncio as asyncio
+    except:
+        import asyncio      # simulator mode
+    period_sec = period_ms / 1000
+    while __ANIM[0]:
+        __anim_render()
+        await asyncio.sleep(period_sec)
+
+
+def __anim_driver_stop():
+    global __ANIM_DRIVER
+    if __ANIM[0]:
+        from InterpreterCore import lm_pin
+        lm_pin('neopixel', False)       # Allow LM unload
+    __ANIM[0] = 0
+    if __ANIM_DRIVER is not None and hasattr(__ANIM_DRIVER, 'deinit'):
+        __ANIM_DRIVER.deinit()
+    # asyncio task exits on __ANIM[0] == 0
+    __ANIM_DRIVER = None
+
+
+def anim_start(effect='rainbow', fps=25, br=50):
+    """
+    Start on device animation
+        effect: fade, chase, rainbow, breathe
+        fps: target frame per sec
+        br: brightness 0-100 %
+    """
+    global __ANIM_LUT, __ANIM_DRIVER
+    if effect not in __ANIM_EFFECTS:
+        return "Invalid effect: {}, select: {}".format(effect, __ANIM_EFFECTS)
+    __anim_driver_stop()
+    __init_NEOPIXEL()
+    # Precompute gamma (2.2) + brightness lookup table - once per start
+    br = max(0, min(100, br))
+    if __ANIM_LUT is None:
+        __ANIM_LUT = bytearray(256)
+    for index in range(0, 256):
+        __ANIM_LUT[index] = int(pow(index / 255, 2.2) * 255 * br / 100 + 0.5)
+    period_ms = 1000 // max(1, min(fps, 100))
+    for index, value in enumerate((1, __ANIM_EFFECTS.index(effect), 0, 1000 // period_ms, 0, ticks_ms(), 0)):
+        __ANIM[index] = value
+    from ConfigHandler import cfgget
+    from InterpreterCore import lm_pin
+    lm_pin('neopixel')                  # Running animation - never unload LM
+    if cfgget('aioserv'):
+        # Running event loop (multi client socket server)
+        try:
+            import uasyncio as asyncio
+        except:
+            import asyncio      # simulator mode
+        __ANIM_DRIVER = asyncio.create_task(__anim_task(period_ms))
+    else:
+        from machine import Timer
+        # Timer(0) is reserved for timirq, esp8266: virtual timer
+        __ANIM_DRIVER = Timer(1 if platform == 'esp32' else -1)
+        __ANIM_DRIVER.init(period=period_ms, mode=Timer.PERIODIC, callback=__anim_timer_cb)
+    return "ANIMATION {} STARTED: {} FPS BR: {}%".format(effect, __ANIM[3], br)
+
+
+def anim_stop():
+    """
+    Stop animation and restore the cached static color
+    """
+    if not __ANIM[0]:
+        return "ANIMATION NOT RUNNING"
+    __anim_driver_stop()
+    if __DCACHE[3] == 1:
+        neopixel()
+    else:
+        __NEOPIXEL_OBJ.fill((0, 0, 0))
+        __NEOPIXEL_OBJ.write()
+    return "ANIMATION STOPPED"
+
+
+def anim_status():
+    return {'running': bool(__ANIM[0]), 'effect': __ANIM_EFFECTS[__ANIM[1]], 'frame': __ANIM[2],
+            'target_fps': __ANIM[3], 'fps': __ANIM[6]}
+
 #########################################
 #                   HELP                #
 #########################################
@@ -118,4 +288,5 @@ def toggle(state=None):
 def help():
     return 'neopixel(r=<0-255>, g, b, n=8', 'toggle(state=None)', \
            'neopixel_cache_load_n_init(cache=None<True/False>', \
-           'segment(s=<0-n>, r, g, b', '[!]PersistentStateCacheDisabledOn:esp8266'
+           'segment(s=<0-n>, r, g, b', 'anim_start(effect=<fade/chase/rainbow/breathe>, fps=25, br=<0-100>)', \
+           'anim_stop', 'anim_status', '[!]PersistentStateCacheDisabledOn:esp8266'
@@ -1,63 +1,97 @@
-from time import localtime, sleep
+from Display import display, flush, batch, display_stat
+import Display
 
-__OLED = None
 __INVERT = False
-
-def __init():
-    global __OLED
-    if __OLED is None:
-        from machine import Pin, I2C
-        from ssd1306 import SSD1306_I2C
-        from LogicalPins import get_pin_on_platform_by_key
-        i2c = I2C(-1, Pin(get_pin_on_platform_by_key('i2c_scl')), Pin(get_pin_on_platform_by_key('i2c_sda')))
-        __OLED = SSD1306_I2C(128, 64, i2c)
-    return __OLED
+# draw operations: (min, max) number of integer parameters - text: x y + <text>
+__DRAW_ARGS = {'text': (2, 2), 'line': (4, 5), 'rect': (4, 5), 'fill_rect': (4, 5), 'pixel': (2, 3), 'fill': (0, 1)}
 
 
 def text(intext="<text>", posx=0, posy=0, show=True):
-    __init().text(intext, posx, posy)
-    if show: __OLED.show()
+    Display.text(intext, posx, posy)
+    if show: flush()
     return True
 
 
 def invert(state=None):
     global __INVERT
-    __init()
     if state is not None:
-        __OLED.invert(state)
+        display().invert(state)
     else:
         __INVERT = not __INVERT
-        __OLED.invert(__INVERT)
+        display().invert(__INVERT)
     return True
 
 
 def clean(state=0, show=True):
-    __init().fill(state)
-    if show: __OLED.show()
+    Display.fill(state)
+    if show: flush()
     return True
 
 
 def draw_line(sx, sy, ex, ey, state=1, show=True):
-    __init().line(sx, sy, ex, ey, state)
-    if show: __OLED.show()
+    Display.line(sx, sy, ex, ey, state)
+    if show: flush()
     return True
 
 
 def draw_rect(sx, sy, ex, ey, state=1, show=True):
-    __init().rect(sx, sy, ex, ey, state)
-    if show: __OLED.show()
+    Display.rect(sx, sy, ex, ey, state)
+    if show: flush()
     return True
 
 
+def draw(operations):
+    """
+    Batch draw - one flush (dirty pages only)
+        operations: separator ; - text x y <text> | line sx sy ex ey | rect x y w h | fill_rect x y w h | pixel x y | fill c
+        e.g.: "fill 0;text 0 0 hello world;line 0 10 127 10"
+        every operation is validated before drawing
+    """
+    op_list = []
+    for operation in operations.split(';'):
+        operation = operation.strip()
+        if len(operation) == 0:
+            # Trailing or doubled separator
+            continue
+        # text x y <text with spaces>
+        params = operation.split(' ', 3) if operation.startswith('text ') else operation.split()
+        if params[0] not in __DRAW_ARGS:
+            return "Invalid draw operation: {}".format(operation)
+        intext = params.pop() if params[0] == 'text' and len(params) > 3 else ''
+        min_args, max_args = __DRAW_ARGS[params[0]]
+        try:
+            if not min_args <= len(params) - 1 <= max_args:
+                raise ValueError()
+            args = [int(param) for param in params[1:]]
+        except ValueError:
+            return "Invalid draw parameters: {} (help: draw)".format(operation)
+        if params[0] == 'text':
+            args.insert(0, intext)
+        op_list.append([params[0]] + args)
+    return "{} byte sent".format(batch(op_list))
+
+
+def show():
+    """
+    Send the dirty regions (after show=False draws)
+    """
+    return "{} byte sent".format(flush())
+
+
+def stat():
+    return display_stat()
+
+
 def poweron():
-    __init().poweron()
+    display().poweron()
     return True
 
 
 def poweroff():
-    __init().poweroff()
+    display().poweroff()
     return True
 
 
 def help():
-    return 'text', 'invert', 'clean', 'draw_line', 'draw_rect', 'poweron', 'poweroff'
+    return 'text', 'invert', 'clean', 'draw_line', 'draw_rect', 'draw "fill 0;text 0 0 hello;line 0 10 127 10"', \
+           'show', 'stat', 'poweron', 'poweroff'
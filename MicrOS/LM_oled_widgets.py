@@ -1,27 +1,50 @@
-from ConfigHandler import cfgget
-from gc import mem_free
+from ConfigHandler import cfgfast
+try:
+    from gc import mem_free
+except:
+    from simgc import mem_free    # simulator mode
 from time import localtime
+from Display import display, flush, fill, fill_rect, text, FILLS
 
-__OLED = None
 __INVERT = False
+# Widget cache: [active page name, {(x, y): last value text}, display fill counter]
+__WIDGETS = [None, {}, 0]
+
+
+def __page(name):
+    """
+    Page switch: clean screen and widget cache
+    return True if static content has to be drawn
+    """
+    if __WIDGETS[0] == name and __WIDGETS[2] == FILLS[0]:
+        return False
+    __WIDGETS[0] = name
+    __WIDGETS[1].clear()
+    fill(0)
+    __WIDGETS[2] = FILLS[0]
+    return True
+
+
+def __widget(x, y, value):
+    """
+    Value widget: redraw only on change (clean the old text area)
+    """
+    value = str(value)
+    last = __WIDGETS[1].get((x, y), None)
+    if value == last:
+        return
+    if last is not None:
+        fill_rect(x, y, max(len(last), len(value)) * 8, 8, 0)
+    text(value, x, y)
+    __WIDGETS[1][(x, y)] = value
 
-def __init():
-    global __OLED
-    if __OLED is None:
-        from machine import Pin, I2C
-        from ssd1306 import SSD1306_I2C
-        from LogicalPins import get_pin_on_platform_by_key
-        i2c = I2C(-1, Pin(get_pin_on_platform_by_key('i2c_scl')), Pin(get_pin_on_platform_by_key('i2c_sda')))
-        __OLED = SSD1306_I2C(128, 64, i2c)
-    return __OLED
 
 def simple_page():
     try:
-        # Clean screen
-        __init().fill(0)
-        # Draw time
-        __OLED.text("{}:{}:{}".format(localtime()[-5], localtime()[-4], localtime()[-3]), 30, 10)
-        __OLED.show()
+        __page('simple')
+        ltime = localtime()
+        __widget(30, 10, "{}:{}:{}".format(ltime[-5], ltime[-4], ltime[-3]))
+        flush()
     except Exception as e:
         return str(e)
     return True
@@ -29,30 +52,31 @@ def simple_page():
 
 def show_debug_page():
     try:
-        # Clean screen
-        __init().fill(0)
-        __OLED.show()
-        # Print info
+        if __page('debug'):
+            # Static labels and config values - drawn once
+            cfg = cfgfast()
+            text("NW_MODE: {}".format(cfg.nwmd), 0, 10)
+            text("IP: {}".format(cfg.devip), 0, 20)
+            text("FreeMem:", 0, 30)
+            text("PORT: {}".format(cfg.socport), 0, 40)
+            text("NAME: {}".format(cfg.devfid), 0, 50)
+        # Changing values
         ltime = localtime()
-        __OLED.text("{}:{}:{}".format(ltime[-5], ltime[-4], ltime[-3]), 30, 0)
-        __OLED.text("NW_MODE: {}".format(cfgget("nwmd")), 0, 10)
-        __OLED.text("IP: {}".format(cfgget("devip")), 0, 20)
-        __OLED.text("FreeMem: {}".format(mem_free()), 0, 30)
-        __OLED.text("PORT: {}".format(cfgget("socport")), 0, 40)
-        __OLED.text("NAME: {}".format(cfgget("devfid")), 0, 50)
-        # Show page buffer - send to display
-        __OLED.show()
+        __widget(30, 0, "{}:{}:{}".format(ltime[-5], ltime[-4], ltime[-3]))
+        __widget(72, 30, mem_free())
+        # Send dirty regions only - to display
+        flush()
     except Exception as e:
         return str(e)
     return True
 
+
 def toggle_invert():
     global __INVERT
     __INVERT = not __INVERT
-    __init().invert(__INVERT)
+    display().invert(__INVERT)
     return 'INVERT:{}'.format(__INVERT)
 
 
 def help():
     return 'simple_page', 'show_debug_page', 'toggle_invert'
-
@@ -0,0 +1,43 @@
+from Sampler import sampler_start, sampler_stop, sampler_latest, sampler_stats, sampler_status
+
+#########################################
+#     BACKGROUND SENSOR SAMPLER (RING)  #
+#########################################
+
+
+def start(sensors=None, period_ms=None, size=None):
+    """
+    Start background sampling
+        sensors: sensor LMs with sample function, separator: ; (default: sampler config)
+    """
+    if sampler_start(sensors, period_ms, size):
+        return sampler_status()
+    return "No sensor to sample: {}".format(sensors)
+
+
+def stop():
+    sampler_stop()
+    return sampler_status()
+
+
+def latest(sensor=None):
+    """
+    Latest buffered values - no sensor read
+    """
+    return sampler_latest(sensor)
+
+
+def stats(window=10, sensor=None):
+    """
+    min/max/mean over the last window samples
+    """
+    return sampler_stats(int(window), sensor)
+
+
+def status():
+    return sampler_status()
+
+
+def help():
+    return 'start(sensors="bme280;dht22", period_ms=10000, size=32)', 'stop', 'latest(sensor=None)', \
+           'stats(window=10, sensor=None)', 'status'
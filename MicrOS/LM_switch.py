@@ -28,17 +28,13 @@ def __persistent_cache_manager(mode):
     if not __PERSISTENT_CACHE:
         return
     global __SWITCH_STATE
+    from StateStore import pds_save, pds_load
     if mode == 's':
         # SAVE CACHE
-        with open('switch.pds', 'w') as f:
-            f.write(','.join([str(k) for k in __SWITCH_STATE]))
+        pds_save('switch', __SWITCH_STATE)
         return
-    try:
-        # RESTORE CACHE
-        with open('switch.pds', 'r') as f:
-            __SWITCH_STATE = [int(data) for data in f.read().strip().split(',')]
-    except:
-        pass
+    # RESTORE CACHE
+    __SWITCH_STATE = pds_load('switch', __SWITCH_STATE)
 
 
 def switch_cache_load_n_init(cache=None):
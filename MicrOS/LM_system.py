@@ -57,21 +57,30 @@ def ntp():
 def module(unload=None):
     from sys import modules
     if unload is None:
-        return modules.keys()
+        from InterpreterCore import lm_residency
+        residency = lm_residency()
+        residency['modules'] = list(modules.keys())
+        return residency
     try:
-        del modules[unload]
+        from InterpreterCore import lm_unload
+        if unload not in modules:
+            raise Exception("{} not loaded".format(unload))
+        lm_unload(unload)
         return "Module unload {} done.".format(unload)
     except Exception as e:
         return "Module unload failed: {}".format(e)
 
 
 def cachedump():
-    from os import listdir
-    cache = {}
-    for pds in (_pds for _pds in listdir() if _pds.endswith('.pds')):
-        with open(pds, 'r') as f:
-            cache[pds] = f.read()
-    return cache
+    from StateStore import pds_dump
+    return pds_dump()
+
+
+def irqqueue():
+    from sys import modules
+    if 'InterruptHandler' not in modules:
+        return "IRQ queue not active"
+    return modules['InterruptHandler'].irq_queue_stat()
 
 
 def ifmode():
@@ -82,5 +91,58 @@ def ifmode():
         return {'if_mode': 'micros'}
 
 
+def nwtiming():
+    """
+    Network setup phase timings in ms (STA connect, scan, NTP)
+    """
+    from Network import nw_timing
+    return nw_timing()
+
+
+def watchdog():
+    """
+    Network supervisor: reconnects, NTP syncs, RTC drift
+    """
+    from Supervisor import supervisor_stat
+    return supervisor_stat()
+
+
+def profile(reset=False):
+    """
+    LM function call profiling: calls, errors, min/avg/max us, max heap delta
+        reset: clear the profiling table
+    """
+    from InterpreterCore import lm_profile
+    return lm_profile(reset=reset)
+
+
+def manifest():
+    """
+    File hash manifest for delta OTA update (json)
+        {file: sha256 first 8 bytes hex}
+    """
+    from os import listdir
+    from json import dumps
+    try:
+        from uhashlib import sha256
+        from ubinascii import hexlify
+    except:
+        from hashlib import sha256      # simulator mode
+        from binascii import hexlify
+    hashes = {}
+    buff = bytearray(256)
+    for source in (_src for _src in listdir() if _src.endswith('.py') or _src.endswith('.mpy') or _src == 'sfuncman.idx'):
+        digest = sha256()
+        with open(source, 'rb') as f:
+            while True:
+                size = f.readinto(buff)
+                if not size:
+                    break
+                digest.update(buff if size == len(buff) else buff[:size])
+        hashes[source] = hexlify(digest.digest()[:8]).decode()
+    return dumps(hashes)
+
+
 def help():
-    return 'info', 'gcollect', 'heartbeat', 'clock', 'ntp', 'module', 'cachedump', 'ifmode'
+    return 'info', 'gcollect', 'heartbeat', 'clock', 'ntp', 'module', 'cachedump', 'irqqueue', 'ifmode', 'manifest', 'nwtiming', 'watchdog', \
+           'profile(reset=False) >json'
@@ -6,6 +6,9 @@ dedicated to micrOS framework.
 - NTP clock setup in case of STA
 - generate UID based on mac address
 - network status expose to config
+- fast connect: cached BSSID / channel / IP settings (nwcache)
+    - static IP before connect, scan only if direct connect fails
+    - per phase connection timings
 
 Designed by Marcell Ban aka BxNxM
 """
@@ -16,7 +19,27 @@ from time import sleep, localtime, time
 from network import AP_IF, STA_IF, WLAN
 from ntptime import settime
 from machine import RTC
+try:
+    from ubinascii import hexlify, unhexlify
+except ImportError:
+    from binascii import hexlify, unhexlify
 from ConfigHandler import console_write, cfgget, cfgput
+try:
+    from time import ticks_ms, ticks_diff
+except ImportError:
+    from simtime import ticks_ms, ticks_diff    # simulator mode
+
+# Network setup phase timings in ms: {phase: ms}
+NW_TIMING = {}
+
+
+def __timing(phase, start_ms):
+    NW_TIMING[phase] = ticks_diff(ticks_ms(), start_ms)
+    return ticks_ms()
+
+
+def nw_timing():
+    return NW_TIMING
 
 #################################################################
 #                      NTP & RTC TIME SETUP                     #
@@ -25,6 +48,7 @@ from ConfigHandler import console_write, cfgget, cfgput
 
 def setNTP_RTC():
     if WLAN(STA_IF).isconnected():
+        start_ms = ticks_ms()
         for _ in range(4):
             try:
                 # Sync with NTP server
@@ -35,6 +59,7 @@ def setNTP_RTC():
                 RTC().datetime((year, month, mday, 0, hour, minute, second, 0))
                 # Print time
                 console_write("NTP setup DONE: {}".format(localtime()))
+                __timing('ntp', start_ms)
                 return True
             except Exception as e:
                 console_write("NTP setup errer.:{}".format(e))
@@ -62,7 +87,8 @@ def set_uid_macaddr_hex(interface=None):
 
 def set_wifi(essid, pwd, timeout=60):
     console_write('[NW: STA] SET WIFI: {}'.format(essid))
-    essid_found = False
+    NW_TIMING.clear()
+    start_ms = phase_ms = ticks_ms()
 
     # Disable AP mode
     ap_if = WLAN(AP_IF)
@@ -73,41 +99,128 @@ def set_wifi(essid, pwd, timeout=60):
     # Set STA and Connect
     sta_if = WLAN(STA_IF)
     sta_if.active(True)
+    phase_ms = __timing('sta_on', phase_ms)
     if not sta_if.isconnected():
         console_write('\t| [NW: STA] CONNECT TO NETWORK {}'.format(essid))
-        # Scan wifi network - retry workaround
-        for _ in range(0, 2):
-            if essid in (wifispot[0].decode('utf-8') for wifispot in sta_if.scan()):
-                essid_found = True
-                console_write('\t| - [NW: STA] ESSID WAS FOUND {}'.format(essid_found))
-                break
-            sleep(1)
-        # Connect to the located wifi network
-        if essid_found:
+        # Fast connect: cached BSSID and IP settings - without scan
+        nw_cache = __load_nw_cache(essid) if cfgget('nwfast') else None
+        if nw_cache is not None:
+            __fast_connect(sta_if, essid, pwd, nw_cache)
+            phase_ms = __timing('fast_connect', phase_ms)
+        if not sta_if.isconnected():
+            # Fallback: scan (once) and connect
+            if nw_cache is not None:
+                console_write('\t| - [NW: STA] FAST CONNECT FAILED, SCAN')
+                sta_if.disconnect()
+                __drop_nw_cache(sta_if)
+            spot = __scan(sta_if, essid)
+            phase_ms = __timing('scan', phase_ms)
+            if spot is None:
+                console_write("\t| [NW: STA] Wifi network was NOT found: {}".format(essid))
+                return False
+            console_write('\t| - [NW: STA] ESSID WAS FOUND {} channel: {}'.format(essid, spot[2]))
             # connect to network
             sta_if.connect(essid, pwd)
             # wait for connection, with timeout set
-            while not sta_if.isconnected() and timeout > 0:
-                console_write("\t| [NW: STA] Waiting for connection... " + str(timeout) + "/60")
-                timeout -= 1
-                sleep(0.5)
-            # Set static IP - here because some data comes from connection.
-            if sta_if.isconnected() and __set_wifi_dev_static_ip(sta_if):
-                sta_if.disconnect()
-                del sta_if
-                return set_wifi(essid, pwd)
-        else:
-            console_write("\t| [NW: STA] Wifi network was NOT found: {}".format(essid))
-            return False
+            __wait_for_connection(sta_if, timeout)
+            phase_ms = __timing('connect', phase_ms)
+            # Set static IP - on the live connection (no reconnect)
+            if sta_if.isconnected():
+                __set_wifi_dev_static_ip(sta_if)
+                phase_ms = __timing('static_ip', phase_ms)
+            nw_cache = (spot[1], spot[2])
+        if sta_if.isconnected():
+            __store_nw_cache(sta_if, essid, nw_cache[0], nw_cache[1])
         console_write("\t|\t| [NW: STA] network config: " + str(sta_if.ifconfig()))
         console_write("\t|\t| [NW: STA] CONNECTED: " + str(sta_if.isconnected()))
     else:
         console_write("\t| [NW: STA] ALREADY CONNECTED TO {}".format(essid))
     cfgput("devip", str(sta_if.ifconfig()[0]))
     set_uid_macaddr_hex(sta_if)
+    __timing('sta_total', start_ms)
     return sta_if.isconnected()
 
 
+def __wait_for_connection(sta_if, timeout):
+    """
+    Wait for connection: timeout in 0.5 sec steps, 50 ms polling
+    """
+    for cnt in range(0, timeout * 10):
+        if sta_if.isconnected():
+            return True
+        if cnt % 10 == 0:
+            console_write("\t| [NW: STA] Waiting for connection... {}/{}".format(timeout - cnt // 10, timeout))
+        sleep(0.05)
+    return sta_if.isconnected()
+
+
+def __scan(sta_if, essid):
+    """
+    Single scan pass - strongest access point of the essid: (essid, bssid, channel, rssi, ...)
+    """
+    spots = [spot for spot in sta_if.scan() if spot[0].decode('utf-8') == essid]
+    if len(spots) == 0:
+        return None
+    return max(spots, key=lambda spot: spot[3])
+
+
+def __fast_connect(sta_if, essid, pwd, nw_cache):
+    """
+    Direct connect to the cached access point, static IP configured before connect
+        nw_cache: bssid (bytes), channel, ifconfig tuple
+    """
+    console_write('\t| - [NW: STA] FAST CONNECT: {} channel: {}'.format(hexlify(nw_cache[0]).decode(), nw_cache[1]))
+    try:
+        sta_if.ifconfig(nw_cache[2])
+        sta_if.connect(essid, pwd, bssid=nw_cache[0])
+    except Exception as e:
+        console_write('\t| - [NW: STA] FAST CONNECT ERROR: {}'.format(e))
+        return False
+    return __wait_for_connection(sta_if, 10)
+
+
+def __drop_nw_cache(sta_if):
+    """
+    Fast connect failed: clear nwcache and restore DHCP (cached static IP settings are stale)
+    """
+    cfgput('nwcache', 'n/a')
+    try:
+        sta_if.ifconfig('dhcp')
+    except Exception:
+        # No ifconfig('dhcp') support on the port: STA restart
+        sta_if.active(False)
+        sta_if.active(True)
+
+
+def __load_nw_cache(essid):
+    """
+    nwcache format: essid;bssid hex;channel;ip,mask,gateway,dns
+    """
+    try:
+        cache = cfgget('nwcache').rsplit(';', 3)
+        if len(cache) != 4 or cache[0] != essid:
+            return None
+        ifconfig = cache[3].split(',')
+        # Manually set device static IP overrides the cached IP
+        stored_ip = cfgget('devip')
+        if 'n/a' not in stored_ip.lower() and '.' in stored_ip:
+            ifconfig[0] = stored_ip
+        return unhexlify(cache[1]), int(cache[2]), tuple(ifconfig)
+    except Exception as e:
+        console_write("[NW: STA] nwcache error: {}".format(e))
+    return None
+
+
+def __store_nw_cache(sta_if, essid, bssid, channel):
+    """
+    Store the last good connection parameters (config write only on change)
+    """
+    try:
+        cfgput('nwcache', "{};{};{};{}".format(essid, hexlify(bssid).decode(), channel, ','.join(sta_if.ifconfig())))
+    except Exception as e:
+        console_write("[NW: STA] nwcache store error: {}".format(e))
+
+
 def __set_wifi_dev_static_ip(sta_if):
     console_write("[NW: STA] Set device static IP.")
     stored_ip = cfgget('devip')
@@ -0,0 +1,303 @@
+"""
+Module is responsible for background sensor sampling
+dedicated to micrOS framework.
+- Periodic sensor LM sampling (sample function) into ring buffers
+    - fixed size array backed ring buffer per sensor
+    - values: int, 0.01 resolution (x100)
+- Instant latest value and min/max/mean over a window
+- Optional ring buffer persistence in RTC memory (survives soft reset)
+- Sampling driver: machine.Timer + micropython.schedule, asyncio task in aioserv mode
+
+Designed by Marcell Ban aka BxNxM
+"""
+#################################################################
+#                           IMPORTS                             #
+#################################################################
+from sys import platform, modules
+from array import array
+from struct import pack, unpack
+from micropython import schedule
+from ConfigHandler import cfgget, console_write
+try:
+    from time import ticks_ms
+except ImportError:
+    from simtime import ticks_ms    # simulator mode
+
+#################################################################
+#                     SAMPLER PARAMETERS                        #
+#################################################################
+# Sensors: [[name, sample function, channel names, RingBuffer], ...]
+SENSORS = []
+# [period ms, sample counter, error counter, last sample ms, RTC persistence]
+SAMPLER_STATE = [0, 0, 0, 0, False]
+# Sampling driver: machine.Timer object or asyncio task (True: task pending - no running event loop)
+__DRIVER = [None]
+__RTC_MAGIC = b'SMPL'
+# RTC user memory size (byte)
+__RTC_SIZE = 492 if platform == 'esp8266' else 2048
+
+#################################################################
+#                       RING BUFFER CLASS                       #
+#################################################################
+
+
+class RingBuffer:
+    """
+    Fixed size multi channel ring buffer (array('l'))
+    """
+
+    def __init__(self, channels, size):
+        self.channels = channels
+        self.size = size
+        self.data = array('l', [0] * (channels * size))
+        # [head - next write index, stored sample count]
+        self.state = [0, 0]
+
+    def push(self, values):
+        offset = self.state[0] * self.channels
+        for channel in range(0, self.channels):
+            self.data[offset + channel] = values[channel]
+        self.state[0] = (self.state[0] + 1) % self.size
+        if self.state[1] < self.size:
+            self.state[1] += 1
+
+    def latest(self, channel):
+        if self.state[1] == 0:
+            return None
+        return self.data[((self.state[0] - 1) % self.size) * self.channels + channel]
+
+    def stats(self, channel, window):
+        """
+        min, max, mean over the last window samples
+        """
+        window = min(window, self.state[1])
+        if window == 0:
+            return None, None, None
+        min_val, max_val, sum_val = 0x7FFFFFFF, -0x7FFFFFFF, 0
+        for index in range(1, window + 1):
+            value = self.data[((self.state[0] - index) % self.size) * self.channels + channel]
+            sum_val += value
+            if value < min_val:
+                min_val = value
+            if value > max_val:
+                max_val = value
+        return min_val, max_val, sum_val // window
+
+#################################################################
+#                         SAMPLER API                           #
+#################################################################
+
+
+def sampler_start(sensors=None, period_ms=None, size=None):
+    """
+    Start background sampling
+        sensors: sensor LM names, separator: ; (default: sampler config)
+        period_ms: sampling period (default: samplerms config)
+        size: ring buffer size in samples (default: samplerbuf config)
+    """
+    sensors = cfgget('sampler') if sensors is None else sensors
+    SAMPLER_STATE[0] = int(cfgget('samplerms') if period_ms is None else period_ms)
+    size = int(cfgget('samplerbuf') if size is None else size)
+    sampler_stop()
+    SENSORS.clear()
+    from InterpreterCore import lm_pin
+    for name in (sensor.strip() for sensor in sensors.split(';') if len(sensor.strip()) > 0):
+        try:
+            lm_name = "LM_{}".format(name)
+            __import__(lm_name)
+            channels = getattr(modules[lm_name], 'SAMPLE_CHANNELS')
+            SENSORS.append([name, getattr(modules[lm_name], 'sample'), channels, RingBuffer(len(channels), size)])
+            # Sampled LMs are never unloaded
+            lm_pin(lm_name)
+        except Exception as e:
+            console_write("[SAMPLER] {} sensor init error: {}".format(name, e))
+    if len(SENSORS) == 0:
+        return False
+    SAMPLER_STATE[4] = cfgget('samplerrtc') and __rtc_fits()
+    if SAMPLER_STATE[4]:
+        __rtc_restore()
+    __driver_start()
+    return True
+
+
+def sampler_stop():
+    if __DRIVER[0] is not None and hasattr(__DRIVER[0], 'deinit'):
+        __DRIVER[0].deinit()
+    # asyncio task exits on __DRIVER[0] is None
+    __DRIVER[0] = None
+
+
+def sampler_latest(sensor=None):
+    """
+    Latest sample per sensor channel (no hardware access)
+    """
+    return {name: {channels[ch]: __value(buffer.latest(ch)) for ch in range(0, len(channels))}
+            for name, _, channels, buffer in SENSORS if sensor is None or sensor == name}
+
+
+def sampler_stats(window=10, sensor=None):
+    """
+    min/max/mean per sensor channel over the last window samples
+    """
+    stats = {}
+    for name, _, channels, buffer in SENSORS:
+        if sensor is not None and sensor != name:
+            continue
+        stats[name] = {}
+        for ch in range(0, len(channels)):
+            min_val, max_val, mean_val = buffer.stats(ch, window)
+            stats[name][channels[ch]] = {'min': __value(min_val), 'max': __value(max_val), 'mean': __value(mean_val)}
+    return stats
+
+
+def sampler_status():
+    return {'running': __DRIVER[0] is not None, 'sensors': [sensor[0] for sensor in SENSORS],
+            'period_ms': SAMPLER_STATE[0], 'samples': SAMPLER_STATE[1], 'errors': SAMPLER_STATE[2],
+            'buffered': [sensor[3].state[1] for sensor in SENSORS], 'rtc': SAMPLER_STATE[4]}
+
+
+def sampler_task():
+    """
+    aioserv mode: create the pending sampling task on the running event loop
+    - sampler started at boot (no running event loop): called by the async socket server startup
+    """
+    if __DRIVER[0] is not True:
+        return False
+    try:
+        import uasyncio as asyncio
+    except:
+        import asyncio      # simulator mode
+    task = __sample_task()
+    try:
+        __DRIVER[0] = asyncio.create_task(task)
+    except RuntimeError:
+        # No running event loop (simulator mode) - keep pending
+        task.close()
+        return False
+    return True
+
+#################################################################
+#                       SAMPLER INTERNALS                       #
+#################################################################
+
+
+def __value(value):
+    return None if value is None else value / 100
+
+
+def __sample(_=None):
+    """
+    Read every sensor into its ring buffer
+    """
+    for sensor in SENSORS:
+        try:
+            sensor[3].push(sensor[1]())
+        except Exception as e:
+            SAMPLER_STATE[2] += 1
+            console_write("[SAMPLER] {} sample error: {}".format(sensor[0], e))
+    SAMPLER_STATE[1] += 1
+    SAMPLER_STATE[3] = ticks_ms()
+    if SAMPLER_STATE[4]:
+        __rtc_save()
+
+
+def __timer_cb(timer=None):
+    """
+    Timer IRQ: defer sampling (skip if schedule queue is full)
+    """
+    try:
+        schedule(__sample, None)
+    except Exception:
+        pass
+
+
+async def __sample_task():
+    """
+    asyncio (aioserv) sampling driver
+    """
+    try:
+        import uasyncio as asyncio
+    except:
+        import asyncio      # simulator mode
+    period_sec = SAMPLER_STATE[0] / 1000
+    while __DRIVER[0] is not None:
+        __sample()
+        await asyncio.sleep(period_sec)
+
+
+def __driver_start():
+    if cfgget('aioserv'):
+        # Event loop of the multi client socket server
+        __DRIVER[0] = True
+        sampler_task()
+        return
+    from machine import Timer
+    # Timer(0): timirq, Timer(1): neopixel animation, Timer(2): transition, esp8266: virtual timer
+    __DRIVER[0] = Timer(3 if platform == 'esp32' else -1)
+    __DRIVER[0].init(period=SAMPLER_STATE[0], mode=Timer.PERIODIC, callback=__timer_cb)
+
+
+def __rtc_header():
+    """
+    RTC memory layout: magic, sensor count, per sensor: channels, size, head, count + data
+    """
+    header = bytearray(__RTC_MAGIC)
+    header.append(len(SENSORS))
+    for sensor in SENSORS:
+        header.extend(pack('<BHHH', sensor[3].channels, sensor[3].size, sensor[3].state[0], sensor[3].state[1]))
+    return header
+
+
+def __rtc_fits():
+    """
+    Check ring buffers vs RTC memory size (once, at start) - too large: RTC persistence disabled
+    """
+    size = 5 + sum(7 + len(sensor[3].data) * 4 for sensor in SENSORS)
+    if size > __RTC_SIZE:
+        console_write("[SAMPLER] RTC persistence disabled: {} byte > RTC memory {} byte (reduce samplerbuf)"
+                      .format(size, __RTC_SIZE))
+        return False
+    return True
+
+
+def __rtc_save():
+    try:
+        from machine import RTC
+        data = __rtc_header()
+        for sensor in SENSORS:
+            data.extend(pack('<{}l'.format(len(sensor[3].data)), *sensor[3].data))
+        RTC().memory(data)
+    except Exception as e:
+        console_write("[SAMPLER] RTC memory save error: {}".format(e))
+
+
+def __rtc_restore():
+    """
+    Restore ring buffers from RTC memory - only with the same sensor layout
+    """
+    try:
+        from machine import RTC
+        data = RTC().memory()
+        if data[0:4] != __RTC_MAGIC or data[4] != len(SENSORS):
+            return False
+        # Validate every sensor header before the ring buffers are touched
+        headers, index = [], 5
+        for sensor in SENSORS:
+            channels, size, head, count = unpack('<BHHH', data[index:index+7])
+            if channels != sensor[3].channels or size != sensor[3].size or head >= size or count > size:
+                return False
+            headers.append((head, count))
+            index += 7
+        if len(data) < index + sum(len(sensor[3].data) * 4 for sensor in SENSORS):
+            return False
+        for sensor, header in zip(SENSORS, headers):
+            sensor[3].state[0], sensor[3].state[1] = header
+            length = len(sensor[3].data)
+            for position, value in enumerate(unpack('<{}l'.format(length), data[index:index+length*4])):
+                sensor[3].data[position] = value
+            index += length * 4
+        console_write("[SAMPLER] ring buffers restored from RTC memory")
+        return True
+    except Exception as e:
+        console_write("[SAMPLER] RTC memory restore error: {}".format(e))
+        return False
@@ -1,17 +1,27 @@
-from time import localtime
+from time import localtime, time
+from array import array
+from sys import modules
 from InterpreterCore import execute_LM_function_Core
 
 '''
 # SYSTEM TIME FORMAT:    Y, M, D, H, M, S, WD, YD
 # SCHEDULER TIME FORMAT: WD, H, M, S
-WD: 1-7
+WD: 0-6
 H: 0-23
 M: 0-59
 S: 0-59
 * - means in every place - every time
 '''
 
-LAST_CRON_TASKS = []
+# PRECOMPILED CRON TABLE - compile_crontab()
+#   CRON_TABLE:     (times, deadlines, commands) - replaced with a single store on recompile
+#       times:      bytearray - WD, H, M, S per task (4 byte / task), 255 means *
+#       deadlines:  array - next fire time per task in sec (epoch)
+#       commands:   tuple - LM command per task (pre-split argument list)
+#   CRON_STATE:     [earliest deadline, last tick time]
+__WILDCARD = 255
+CRON_TABLE = (bytearray(), array('l'), ())
+CRON_STATE = [0, 0]
 
 '''
 #############################
@@ -19,28 +29,12 @@ LAST_CRON_TASKS = []
 #############################
 
 
-def systime(sec):
-    h = int(sec / 60 / 60) % 24
-    m = int(sec / 60 % 60)
-    s = sec % 60
-    wd = int(sec / 60 / 60 / 24) % 7
-    day = int(sec / 60 / 60 / 24) % 30
-    return 2020, 9, day, h, m, s, wd, 0
-
-
-def system_time_generator(max=100000000):
-    generator = (systime(sec) for sec in range(0, max, 3))
-    return generator
-
-
 def dummyirq_sec(raw_cron_input, irqperiod):
     from time import sleep
+    compile_crontab(raw_cron_input)
     while True:
-        scheduler(raw_cron_input, irqperiod)
-        sleep(0.00001)
-
-
-GEN = system_time_generator()
+        scheduler(irqperiod)
+        sleep(irqperiod)
 '''
 
 
@@ -49,6 +43,13 @@ GEN = system_time_generator()
 #############################
 
 
+def __now():
+    """RTC time in sec - with drift correction between NTP syncs (Supervisor)"""
+    if 'Supervisor' in modules:
+        return modules['Supervisor'].corrected_time()
+    return int(time())
+
+
 def __convert_sec_to_time(seconds):
     """Convert sec to time format"""
     seconds = seconds % (24 * 3600)
@@ -59,61 +60,53 @@ def __convert_sec_to_time(seconds):
     return hour, minutes, seconds
 
 
-def __cron_task_cache_manager(now_in_sec, sec_tolarent):
+def __next_sec_of_day(h, m, s, from_sec):
     """
-    Cron tasks execution cache by task id
-        - to avoid unwanted re-executions
+    Earliest second of the day >= from_sec matches with H, M, S (255: *)
+    return None if no match on this day
     """
-    # Iterate on already executed tasks cache
-    for index, taskid in enumerate(LAST_CRON_TASKS):
-        # Get H,M,S in sec from task id
-        tasktime_in_sec = int(str(taskid.split('|')[0]).split(':')[1])
-        sec_diff = tasktime_in_sec - (now_in_sec - sec_tolarent)
-        # Remove outdated cache registration
-        if sec_diff < 0 or sec_diff > 20:
-            LAST_CRON_TASKS.remove(LAST_CRON_TASKS[index])
-
-
-def __scheduler_trigger(cron_time_now, check_time_now_sec_tuple, scheduler_fragment, sec_tolerance=2):
+    fh, fm, fs = __convert_sec_to_time(from_sec)
+    for hh in (range(fh, 24) if h == __WILDCARD else (h,)):
+        if hh < fh:
+            continue
+        for mm in (range(0, 60) if m == __WILDCARD else (m,)):
+            if hh == fh and mm < fm:
+                continue
+            for ss in (range(0, 60) if s == __WILDCARD else (s,)):
+                if hh == fh and mm == fm and ss < fs:
+                    continue
+                return hh * 3600 + mm * 60 + ss
+    return None
+
+
+def __next_fire_time(times, index, from_time):
     """
-    SchedulerCore logic
-        cron time now format: WD, H, M, S
+    Calculate the next fire time (epoch sec) of a task >= from_time
+        - integer only calculation, max. 8 days lookahead
     """
-    check_time = tuple(int(t.strip()) if t.strip() != '*' else t.strip() for t in scheduler_fragment[0].split(':'))
-    # Cron actual time (now) parts summary in sec
-    check_time_now_sec = check_time_now_sec_tuple[0] + check_time_now_sec_tuple[1] + check_time_now_sec_tuple[2]
-    # Cron overall requested time in sec - hour in sec, minute in sec, sec
-    check_time_scheduler_sec = int(check_time_now_sec_tuple[0] if check_time[1] == '*' else check_time[1] * 3600) \
-                               + int(check_time_now_sec_tuple[1] if check_time[2] == '*' else check_time[2] * 60) \
-                               + int(check_time_now_sec_tuple[2] if check_time[3] == '*' else check_time[3])
-
-    # Time frame +/- corrections
-    tolerance_min_sec = 0 if check_time_now_sec - sec_tolerance < 0 else check_time_now_sec - sec_tolerance
-    tolerance_max_sec = check_time_now_sec + sec_tolerance
-
-    task_id = "{}:{}|{}".format(check_time[0], check_time_scheduler_sec, scheduler_fragment[1].replace(' ', ''))
-
-    # Check WD - WEEK DAY
-    if check_time[0] == '*' or check_time[0] == cron_time_now[0]:
-        # Check H, M, S in sec format between tolerance range
-        if tolerance_min_sec <= check_time_scheduler_sec <= tolerance_max_sec:
-            __cron_task_cache_manager(check_time_now_sec, sec_tolerance)
-            if check_time[3] == '*' or task_id not in LAST_CRON_TASKS:
-                lm_state = execute_LM_function_Core(scheduler_fragment[1].split())
-                if not lm_state:
-                    print("[CRON ERROR]NOW[{}]  {} <-> {}  CONF[{}] EXECUTE[{}] LM: {}".format(cron_time_now,
-                                                                                               __convert_sec_to_time(tolerance_min_sec),
-                                                                                               __convert_sec_to_time(tolerance_max_sec),
-                                                                                               scheduler_fragment[0],
-                                                                                               lm_state,
-                                                                                               scheduler_fragment[1]))
-
-                # SAVE TASK TO CACHE
-                if check_time[3] != '*':
-                    # SAVE WHEN SEC not *
-                    LAST_CRON_TASKS.append(task_id)
-                return True
-    return False
+    offset = index * 4
+    wd, h, m, s = times[offset], times[offset+1], times[offset+2], times[offset+3]
+    ltime = localtime(from_time)
+    sec_of_day = ltime[3] * 3600 + ltime[4] * 60 + ltime[5]
+    day_start = from_time - sec_of_day
+    for day in range(0, 8):
+        if wd == __WILDCARD or wd == (ltime[6] + day) % 7:
+            fire_sec = __next_sec_of_day(h, m, s, sec_of_day if day == 0 else 0)
+            if fire_sec is not None:
+                return day_start + day * 86400 + fire_sec
+    # Invalid time pattern - never fire
+    return 0x7FFFFFFF
+
+
+def __schedule_all(table, now):
+    """Calculate every task deadline of the table"""
+    times, deadlines, cmds = table
+    for index in range(0, len(cmds)):
+        deadlines[index] = __next_fire_time(times, index, now)
+
+
+def __earliest_deadline(deadlines):
+    CRON_STATE[0] = min(deadlines) if len(deadlines) > 0 else 0x7FFFFFFF
 
 
 def deserialize_raw_input(raw_cron_input):
@@ -125,27 +118,76 @@ def deserialize_raw_input(raw_cron_input):
     return datastruct
 
 
-def scheduler(raw_cron_input, irqperiod):
+def compile_crontab(raw_cron_input):
     """
-    irqperiod - in sec
+    Compile raw cron input to the integer cron table (once, not in every timer tick)
     RAW INPUT SYNTAX:
         '{cron time}!COMD;{cron time2}!COMD2;...'
     ! - execute
     ; - cron task separator
+    return number of compiled tasks
     """
-    scheduler_input = deserialize_raw_input(raw_cron_input)
-    return_state = False
-    time_now = localtime()[0:8]
-    # time_now = GEN.__next__()   # TODO: remove after test
-
-    # Actual time - WD, H, M, S
-    cron_time_now = (time_now[-2], time_now[-5], time_now[-4], time_now[-3])
-    # Cron overall time now in sec - hour in sec, minute in sec, sec
-    check_time_now_sec_tuple = (cron_time_now[1] * 3600, cron_time_now[2] * 60, cron_time_now[3])
+    global CRON_TABLE
+    times = bytearray()
+    cmds = []
+    for cron in deserialize_raw_input(raw_cron_input):
+        try:
+            check_time = tuple(__WILDCARD if t.strip() == '*' else int(t.strip()) for t in cron[0].split(':'))
+            if len(check_time) != 4 or len(cron[1].split()) < 2:
+                raise Exception("invalid task format")
+            times.extend(bytearray(check_time))
+            cmds.append(tuple(cron[1].split()))
+        except Exception as e:
+            print("[CRON] compile_crontab skip {}: {}".format(cron, e))
+    table = (times, array('l', [0x7FFFFFFF] * len(cmds)), tuple(cmds))
+    now = __now()
+    __schedule_all(table, now)
+    # Runtime recompile (crontasks change): scheduled timer tick can run between any two bytecodes,
+    # complete table is replaced with one global store - a tick uses either the old or the new table
+    CRON_TABLE = table
+    CRON_STATE[1] = now
+    __earliest_deadline(table[1])
+    return len(cmds)
+
+
+def scheduler(irqperiod):
+    """
+    irqperiod - in sec (time tolerance)
+    Timer tick: compare now with the earliest pending deadline,
+    execute due tasks and calculate their next fire time
+    """
+    # One table per tick - consistent with a concurrent recompile
+    table = CRON_TABLE
+    times, deadlines, cmds = table
+    now = __now()
+    # Clock was set (NTP/RTC) - time jump - recalculate deadlines
+    if now < CRON_STATE[1] or now - CRON_STATE[1] > irqperiod + 60:
+        __schedule_all(table, now - irqperiod)
+        __earliest_deadline(deadlines)
+    CRON_STATE[1] = now
+    # Fast path - nothing to do until the earliest deadline
+    if now + irqperiod < CRON_STATE[0]:
+        return False
 
-    for cron in scheduler_input:
-        state = __scheduler_trigger(cron_time_now, check_time_now_sec_tuple, cron, sec_tolerance=irqperiod)
-        return_state |= state
+    return_state = False
+    for index in range(0, len(cmds)):
+        if deadlines[index] < now - irqperiod:
+            # Missed task (outdated deadline) - reschedule
+            deadlines[index] = __next_fire_time(times, index, now - irqperiod)
+        if deadlines[index] > now + irqperiod:
+            continue
+        # Execute task in [now - irqperiod, now + irqperiod] time frame
+        lm_state = execute_LM_function_Core(list(cmds[index]), origin=2)
+        if not lm_state:
+            print("[CRON ERROR]NOW[{}] CONF[{}] EXECUTE[{}] LM: {}".format(__convert_sec_to_time(now),
+                                                                        __convert_sec_to_time(deadlines[index]),
+                                                                        lm_state,
+                                                                        ' '.join(cmds[index])))
+        return_state = True
+        # Next fire time after the actual time frame - no re-execution
+        deadlines[index] = __next_fire_time(times, index, now + irqperiod + 1)
+    if table is CRON_TABLE:
+        __earliest_deadline(deadlines)
     return return_state
 
 
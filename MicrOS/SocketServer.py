@@ -9,8 +9,26 @@ dedicated to micrOS framework.
     - version
     - exit
     - reboot
+    - webrepl
+    - frame (framed protocol negotiation)
+    - subscribe / unsubscribe (server push of LM results)
 - server recovery handling
 - providing server console instance
+- asyncio multi client server mode (aioserv)
+    - per connection session state
+- persist config and LM state changes (write-back)
+- network supervisor (nwwd) in idle time: accept timeout / async housekeeping
+- framed mode (opt-in per connection, for machine clients):
+    - request: id (uint16), length (uint16), command
+    - reply: id (uint16), status (uint8), length (uint16), reply lines - no prompt
+    - pipelined requests are buffered and served in order
+- subscriptions (per connection): the server runs the LM periodically and pushes the result
+    - text mode: [lm func] result line, framed mode: reply frame with the subscribe request id
+    - runs in the wait for input time (sync: poll, aioserv: task) until unsubscribe or disconnect
+    - coalescing: periods missed by a slow client (blocking send / drain) are skipped
+- reply output buffer (per connection): preallocated bytearray
+    - replies of a command and the prompt are sent together (one flush per command)
+    - flush on the size threshold (REPLY_BUF_SIZE), oversized messages are sent directly
 
 Designed by Marcell Ban aka BxNxM
 """
@@ -20,7 +38,9 @@ Designed by Marcell Ban aka BxNxM
 
 from socket import socket, AF_INET, SOCK_STREAM, SOL_SOCKET, SO_REUSEADDR
 from time import sleep
-from ConfigHandler import console_write, cfgget, cfgput
+from struct import pack, unpack
+from sys import modules
+from ConfigHandler import console_write, cfgget, cfgput, cfgflush, cfgfast
 from InterpreterShell import shell as InterpreterShell_shell
 
 try:
@@ -28,6 +48,181 @@ try:
 except:
     console_write("[SIMULATOR MODE GC IMPORT]")
     from simgc import collect, mem_free
+try:
+    from time import ticks_ms, ticks_diff, ticks_add
+except ImportError:
+    from simtime import ticks_ms, ticks_diff, ticks_add    # simulator mode
+
+# Loaded on demand - aioserv mode only (memory)
+asyncio = None
+
+# FRAMED MODE - header formats (big endian), status codes: index of FRAME_STATUS
+FRAME_VERSION = 1
+FRAME_REQ = '>HH'
+FRAME_REP = '>HBH'
+FRAME_STATUS = ('ok', 'error', 'syntax', 'bad request')
+FRAME_MAX_REQ = 512
+
+# REPLY OUTPUT BUFFER - size: flush threshold (byte)
+REPLY_BUF_SIZE = 1024
+
+# SUBSCRIPTIONS - max per connection, min period ms
+SUB_MAX = 3
+SUB_MIN_MS = 200
+
+# IDLE WRITE-BACK - wait for client input (ms) before flushing pending changes
+IDLE_FLUSH_MS = 1000
+
+
+def state_flush(idle_ms=None):
+    """
+    Persist LM state changes - only if StateStore was loaded by an LM
+        idle_ms: None: debounce (PDS_DEBOUNCE_MS), 0: flush now
+    """
+    if 'StateStore' in modules:
+        modules['StateStore'].pds_flush(idle_ms)
+
+
+def write_back(cfg_idle_ms=0, state_idle_ms=None):
+    """
+    Persist config and LM state changes (write-back)
+    - flush error is logged, server keeps running (changes stay dirty - retry on next flush)
+    """
+    try:
+        cfgflush(idle_ms=cfg_idle_ms)
+        state_flush(state_idle_ms)
+    except Exception as e:
+        console_write("[EXEC-ERROR] write-back flush error: {}".format(e))
+
+
+def reply_buffer(out, data):
+    """
+    Copy data into the reply output buffer: [preallocated bytearray, length, prompt is sent]
+    return False if data does not fit (flush first)
+    """
+    end = out[1] + len(data)
+    if end > len(out[0]):
+        return False
+    out[0][out[1]:end] = data
+    out[1] = end
+    return True
+
+
+def frame_parse(frame_rx):
+    """
+    Framed mode: parse one request from the receive buffer (bytearray)
+    return None (incomplete), (id, command) or (id, None) in case of bad request
+    """
+    if len(frame_rx) < 4:
+        return None
+    req_id, length = unpack(FRAME_REQ, frame_rx[0:4])
+    if length > FRAME_MAX_REQ:
+        # Invalid length - drop buffer (no resync)
+        frame_rx[:] = b''
+        return req_id, None
+    if len(frame_rx) < 4 + length:
+        return None
+    try:
+        command = bytes(frame_rx[4:4 + length]).decode('utf-8').strip()
+    except Exception:
+        command = None
+    frame_rx[:] = frame_rx[4 + length:]
+    return req_id, command
+
+
+def frame_pack(req_id, status, lines):
+    """
+    Framed mode: reply frame from the collected reply lines
+    """
+    data = '\n'.join(lines).encode('utf-8')
+    return pack(FRAME_REP, req_id, status, len(data)) + data
+
+
+class SubscriptionOutput:
+    """
+    Subscription LM output collector - reply_message interface for InterpreterCore
+    """
+
+    def __init__(self):
+        self.lines = []
+        # Framed mode status slot: frame[3]
+        self.frame = [False, None, None, 0, None]
+
+    def reply_message(self, msg):
+        self.lines.append(msg.decode('utf-8') if isinstance(msg, bytes) else str(msg))
+
+
+def subscription_cmd(session, data_str):
+    """
+    Subscription built-ins (per connection)
+        subscribe                                   - list subscriptions
+        subscribe <lm> <func> [params] <period sec> - push LM result periodically
+        unsubscribe [<lm> <func>]                   - stop one LM function or all
+    """
+    params = data_str.split()
+    if params[0] == 'unsubscribe':
+        sub_cnt = len(session.subs)
+        session.subs[:] = [sub for sub in session.subs if len(params) > 1 and sub[0][0:2] != params[1:3]]
+        session.reply_message("unsubscribed: {}".format(sub_cnt - len(session.subs)))
+        return
+    if len(params) == 1:
+        for sub in session.subs:
+            session.reply_message("{}: {} ms, pushed: {}, coalesced: {}".format(' '.join(sub[0]), sub[1], sub[4], sub[5]))
+        session.reply_message("subscriptions: {}/{}".format(len(session.subs), SUB_MAX))
+        return
+    try:
+        period_ms = max(SUB_MIN_MS, int(float(params[-1]) * 1000))
+    except ValueError:
+        period_ms = None
+    if len(params) < 4 or period_ms is None:
+        session.frame[3] = 2
+        session.reply_message("subscribe <lm> <func> [params] <period sec>")
+        return
+    if len(session.subs) >= SUB_MAX:
+        session.frame[3] = 1
+        session.reply_message("subscribe: max {} subscriptions".format(SUB_MAX))
+        return
+    # [command, period ms, next run ms, push frame id (None: text mode), pushed, coalesced]
+    session.subs.append([params[1:-1], period_ms, ticks_ms(), session.frame[2], 0, 0])
+    session.reply_message("subscribed: {} {} ms".format(' '.join(params[1:-1]), period_ms))
+
+
+def subscription_tick(session):
+    """
+    Run the due subscriptions and push the results (session.push - flush by the caller)
+    Coalescing: periods missed by a slow client (blocking push) or a slow LM are skipped
+    return ms until the next run
+    """
+    from InterpreterCore import execute_LM_function_Core
+    wait_ms = 60000
+    for sub in session.subs:
+        if ticks_diff(ticks_ms(), sub[2]) >= 0:
+            output = SubscriptionOutput()
+            execute_LM_function_Core(list(sub[0]), SocketServerObj=output, origin=5)
+            if sub[3] is None:
+                # One tagged line per push - multi line (dict) output: | separator
+                session.push("[{}] {}\n".format(' '.join(sub[0][0:2]), ' | '.join(output.lines).replace('\n', ' | '))
+                             .encode('utf-8'))
+            else:
+                session.push(frame_pack(sub[3], output.frame[3], output.lines))
+            sub[4] += 1
+            missed = ticks_diff(ticks_ms(), sub[2]) // sub[1]
+            sub[5] += missed
+            sub[2] = ticks_add(sub[2], (missed + 1) * sub[1])
+        wait_ms = min(wait_ms, ticks_diff(sub[2], ticks_ms()))
+    return max(0, wait_ms)
+
+
+def network_watchdog():
+    """
+    Network supervisor tick (STA reconnect, NTP resync) - server idle time
+    """
+    if cfgfast().nwwd:
+        try:
+            from Supervisor import watchdog
+            watchdog()
+        except Exception as e:
+            console_write("[ socket server ] network watchdog error: {}".format(e))
 
 #########################################################
 #                    SOCKET SERVER CLASS                #
@@ -42,6 +237,8 @@ class SocketServer:
     - version
     - exit
     - reboot
+    - frame
+    - subscribe / unsubscribe
     InterpreterShell invocation with msg data
     """
     __instance = None
@@ -68,11 +265,18 @@ class SocketServer:
         self.s = None
         self.conn = None
         self.addr = None
+        # Framed mode: [is framed, receive buffer, request id (None: no pending), status, reply lines]
+        self.frame = [False, bytearray(), None, 0, []]
+        # Subscriptions: [[command, period ms, next run ms, push frame id, pushed, coalesced], ...]
+        self.subs = []
+        # Reply output buffer: [preallocated bytearray, length, prompt is sent]
+        self.out = [bytearray(REPLY_BUF_SIZE), 0, False]
         # ---- Config ---
         self.prompt = "{} $ ".format(cfgget('devfid'))
         self.port = port if port is not None else cfgget("socport")
         self.timeout_user = user_timeout_sec if user_timeout_sec is not None else int(cfgget("soctout"))
         self.uid = uid if uid is not None else str(cfgget("hwuid"))
+        self.max_clients = int(cfgget("socmaxc"))
         # ---         ----
         self.server_console("[ socket server ] <<constructor>>")
 
@@ -86,6 +290,9 @@ class SocketServer:
         """
         self.s = socket(AF_INET, SOCK_STREAM)
         self.s.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
+        if cfgget('nwwd'):
+            # Accept timeout - network watchdog in idle time
+            self.s.settimeout(int(cfgget('nwwdsec')))
 
     def __deinit_socket(self):
         """
@@ -116,15 +323,25 @@ class SocketServer:
 
     def __accept(self):
         self.server_console("[ socket server ] wait to accept a connection - blocking call...")
-        self.conn, self.addr = self.s.accept()
+        while True:
+            try:
+                self.conn, self.addr = self.s.accept()
+                break
+            except OSError:
+                # Accept timeout: idle - write-back, network watchdog
+                write_back()
+                network_watchdog()
         self.server_console('[ socket server ] Connected with {}:{}'.format(self.addr[0], self.addr[1]))
 
     def __wait_for_message(self):
-        prompt = "{}{} ".format(self.pre_prompt, self.prompt).encode('utf-8')
-        self.reply_message(prompt)
+        if self.frame[0]:
+            return self.__wait_for_frame()
+        self.reply_prompt()
+        self.__wait_for_input()
         self.conn.settimeout(self.timeout_user)
         try:
             data_byte = self.conn.recv(512)
+            self.out[2] = False
         except Exception as e:
             data_byte = b''
             if 'timoeout' in str(e).lower():
@@ -142,6 +359,71 @@ class SocketServer:
         # CALL LOW LEVEL COMMANDS -  server built-ins
         return self.__server_level_cmds(data_str)
 
+    def __wait_for_frame(self):
+        """
+        Framed mode: next request from the buffer or the connection (no prompt)
+        """
+        self.conn.settimeout(self.timeout_user)
+        self.reply_flush()
+        request = frame_parse(self.frame[1])
+        while request is None:
+            self.__wait_for_input()
+            data_byte = self.conn.recv(512)
+            if not data_byte:
+                # Connection closed by client
+                self.__reconnect()
+                return ""
+            self.frame[1].extend(data_byte)
+            request = frame_parse(self.frame[1])
+        self.frame[2], self.frame[3] = request[0], 0
+        if request[1] is None:
+            self.frame[3] = 3
+            self.reply_message("Bad request, max length: {}".format(FRAME_MAX_REQ))
+            return ""
+        self.server_console("[ socket server ] FRAME INPUT {} |{}|".format(request[0], request[1]))
+        return self.__server_level_cmds(request[1])
+
+    def __wait_for_input(self):
+        """
+        Wait for client input
+        - idle write-back: no input in IDLE_FLUSH_MS - flush pending config and LM state changes
+        - subscriptions: push LM results until client input is available (no session timeout)
+        """
+        try:
+            from uselect import poll, POLLIN
+        except ImportError:
+            from select import poll, POLLIN     # simulator mode
+        poller = poll()
+        poller.register(self.conn, POLLIN)
+        if len(self.subs) == 0:
+            if not poller.poll(IDLE_FLUSH_MS):
+                write_back()
+            return
+        while len(self.subs) > 0:
+            wait_ms = subscription_tick(self)
+            # Blocking send (slow client): missed periods are coalesced on the next tick
+            self.reply_flush()
+            if poller.poll(wait_ms):
+                break
+            write_back()
+
+    def push(self, data):
+        self.__write(data)
+
+    def frame_flush(self):
+        """
+        Framed mode: send the collected replies of the actual request
+        """
+        if self.frame[2] is None:
+            return
+        data = frame_pack(self.frame[2], self.frame[3], self.frame[4])
+        self.frame[2] = None
+        self.frame[4].clear()
+        try:
+            self.__write(data)
+        except Exception as e:
+            self.server_console("[ socket server ] FRAME REPLY ERROR: {}".format(e))
+
     def __server_level_cmds(self, data_str):
         if data_str == 'exit':
             # For low level exit handling
@@ -151,7 +433,7 @@ class SocketServer:
         if data_str == 'hello':
             # For low level device identification - hello msg
             data_str = ""
-            self.reply_message("hello:{}:{}".format(cfgget('devfid'), self.uid))
+            self.reply_message("hello:{}:{}".format(cfgfast().devfid, self.uid))
         if data_str == 'version':
             # For micrOS system version info
             data_str = ""
@@ -163,11 +445,25 @@ class SocketServer:
         if data_str == 'webrepl':
             data_str = ""
             self.start_micropython_webrepl()
+        if data_str == 'frame':
+            # Switch connection to framed mode
+            data_str = ""
+            self.reply_message("frame:{}".format(FRAME_VERSION))
+            self.frame[0] = True
+        if data_str.split(' ')[0] in ('subscribe', 'unsubscribe'):
+            subscription_cmd(self, data_str)
+            data_str = ""
         return str(data_str)
 
     def __safe_reboot_system(self):
         self.server_console("Execute safe reboot: __safe_reboot_system()")
+        write_back(state_idle_ms=0)
         self.reply_message("Bye!")
+        self.frame_flush()
+        try:
+            self.reply_flush()
+        except Exception:
+            pass
         self.conn.close()
         sleep(1)
         from machine import reset
@@ -175,16 +471,54 @@ class SocketServer:
         self.__reconnect()          # In case of simulator - dummy reset
 
     def reply_message(self, msg):
-        if isinstance(msg, bytes):
-            self.conn.sendall(msg)  # conn sendall
+        if self.frame[2] is not None:
+            # Framed mode: collect reply lines of the request
+            self.frame[4].append(msg.decode('utf-8') if isinstance(msg, bytes) else str(msg))
             return
         try:
-            self.conn.sendall("{}\n".format(msg).encode("utf-8"))  # conn sendall
+            if isinstance(msg, bytes):
+                self.__write(msg)
+                return
+            self.__write(str(msg).encode("utf-8"))
+            self.__write(b"\n")
         except Exception as e:
             self.server_console("[ socket server ] REPLY ERROR: {}".format(e))
-        return
+
+    def reply_prompt(self):
+        """
+        Send the buffered replies of the command - with the prompt in text mode (once per command)
+        """
+        if not (self.frame[0] or self.out[2]):
+            self.__write("{}{} ".format(self.pre_prompt, self.prompt).encode('utf-8'))
+            self.out[2] = True
+        self.reply_flush()
+
+    def reply_flush(self):
+        """
+        Send the reply output buffer - one sendall
+        """
+        if self.out[1] > 0:
+            data, self.out[1] = memoryview(self.out[0])[0:self.out[1]], 0
+            self.conn.sendall(data)
+
+    def __write(self, data):
+        if not reply_buffer(self.out, data):
+            self.reply_flush()
+            if not reply_buffer(self.out, data):
+                # Oversized message - send directly
+                self.conn.sendall(data)
 
     def __reconnect(self):
+        # Send pending frame and replies, reset framed mode
+        self.frame_flush()
+        try:
+            self.reply_flush()
+        except Exception:
+            pass
+        self.out[1], self.out[2] = 0, False
+        self.frame[0] = False
+        self.frame[1] = bytearray()
+        self.subs.clear()
         # Reset Shell & prompt
         self.CONFIGURE_MODE = False
         self.pre_prompt = ""
@@ -192,6 +526,7 @@ class SocketServer:
         # Close session
         self.server_console("[ socket server ] exit and close connection from " + str(self.addr))
         self.conn.close()
+        write_back(state_idle_ms=0)
         collect()
         # Accept new connection
         self.__accept()
@@ -202,6 +537,11 @@ class SocketServer:
             cfgput('version', self.__socket_interpreter_version)
         except Exception as e:
             console_write("Export system version to config failed: {}".format(e))
+        cfgflush()
+        if cfgget('aioserv'):
+            # Multi client mode - asyncio event loop
+            self.run_async()
+            return
         self.__init_socket()
         self.__bind_and_accept()
         while True:
@@ -210,13 +550,21 @@ class SocketServer:
                 is_healthy = InterpreterShell_shell(self.__wait_for_message(), SocketServerObj=self)
                 if not is_healthy:
                     console_write("[EXEC-WARNING] InterpreterShell internal error.")
+                    self.frame[3] = 1
                     self.__recovery(is_critic=False)
+                # Framed mode: reply frame, send replies (+prompt)
+                self.frame_flush()
+                self.reply_prompt()
             except OSError:
                 # BrokenPipeError
                 self.__reconnect()
             except Exception as e:
                 console_write("[EXEC-ERROR] InterpreterShell error: {}".format(e))
+                self.frame[3] = 1
                 self.__recovery(is_critic=True)
+                self.frame_flush()
+            # Persist config and LM state changes (write-back) - debounced: idle flush in __wait_for_input
+            write_back()
             # Memory dimensioning dump
             self.server_console('[X] AFTER INTERPRETER EXECUTION FREE MEM [byte]: {}'.format(mem_free()))
 
@@ -240,20 +588,320 @@ class SocketServer:
             # if less then max indent
             self.server_console_indent += 1
 
-    def start_micropython_webrepl(self):
-        self.reply_message(" Start micropython WEBREPL for interpreter web access and file transferring.")
-        self.reply_message("  [!] micrOS socket shell will be available again after reboot.")
-        self.reply_message("  \trestart machine shortcut: import reset")
-        self.reply_message("  Connect over http://micropython.org/webrepl/#{}:8266/".format(cfgget("devip")))
-        self.reply_message("  \t[!] webrepl password: {}".format(cfgget('appwd')))
-        self.reply_message(" Bye!")
+    def start_micropython_webrepl(self, session=None):
+        """
+        session: AsyncSession in aioserv mode, else self (single client)
+        """
+        session = self if session is None else session
+        session.reply_message(" Start micropython WEBREPL for interpreter web access and file transferring.")
+        session.reply_message("  [!] micrOS socket shell will be available again after reboot.")
+        session.reply_message("  \trestart machine shortcut: import reset")
+        session.reply_message("  Connect over http://micropython.org/webrepl/#{}:8266/".format(cfgget("devip")))
+        session.reply_message("  \t[!] webrepl password: {}".format(cfgget('appwd')))
+        session.reply_message(" Bye!")
         try:
             import webrepl
-            self.reply_message(webrepl.start(password=cfgget('appwd')))
-            self.__del__()
+            session.reply_message(webrepl.start(password=cfgget('appwd')))
+            session.reply_flush()
+            if self.s is not None:
+                self.__del__()
         except Exception as e:
-            self.reply_message("Error while starting webrepl: {}".format(e))
+            session.reply_message("Error while starting webrepl: {}".format(e))
+
+    def version(self):
+        return self.__socket_interpreter_version
 
     def __del__(self):
         console_write("[ socket server ] <<destructor>>")
         self.__deinit_socket()
+
+    #####################################
+    #     Async (multi client) Methods  #
+    #####################################
+    def run_async(self):
+        """
+        Asyncio socket server - multiplex max socmaxc clients on one event loop
+        """
+        global asyncio
+        try:
+            import uasyncio as asyncio
+        except:
+            import asyncio      # simulator mode
+        self.server_console("[ socket server ] ASYNC MODE - max clients: {}".format(self.max_clients))
+        asyncio.run(self.__async_server())
+
+    async def __async_server(self):
+        await asyncio.start_server(self.__async_session, self.host if self.host else '0.0.0.0', self.port,
+                                   backlog=self.max_clients)
+        self.server_console('[ socket server ] Socket now listening (async)')
+        if cfgget('timirq') or cfgget('extirq'):
+            # Execute deferred IRQ jobs on the event loop
+            from InterruptHandler import irq_job_worker_async
+            asyncio.create_task(irq_job_worker_async())
+        if 'Sampler' in modules:
+            # Sampler started at boot (before the event loop): create its pending sampling task
+            modules['Sampler'].sampler_task()
+        while True:
+            # Housekeeping: persist config and LM state changes after idle window (write-back)
+            write_back(cfg_idle_ms=500)
+            network_watchdog()
+            await asyncio.sleep(1)
+
+    async def __async_session(self, reader, writer):
+        session = AsyncSession(self, reader, writer)
+        if AsyncSession.ACTIVE >= self.max_clients:
+            self.server_console("[ socket server ] max clients {} reached, reject: {}".format(self.max_clients, session.addr))
+            session.reply_message("Server busy, max clients: {}".format(self.max_clients))
+            await session.close()
+            return
+        AsyncSession.ACTIVE += 1
+        self.server_console('[ socket server ] Connected with {} [{}/{}]'.format(session.addr, AsyncSession.ACTIVE,
+                                                                                 self.max_clients))
+        try:
+            while True:
+                msg = await session.wait_for_message()
+                if msg is None:
+                    break
+                is_healthy = InterpreterShell_shell(msg, SocketServerObj=session)
+                if not is_healthy:
+                    console_write("[EXEC-WARNING] InterpreterShell internal error.")
+                    session.frame[3] = 1
+                    session.reply_message("[HA] system recovery ...")
+                    collect()
+                    session.reply_message("[HA] gc-collect-memfree: {}".format(mem_free()))
+                # Framed mode: reply frame, send replies (+prompt)
+                session.frame_flush()
+                session.reply_prompt()
+                await session.drain()
+                write_back()
+                self.server_console('[X] AFTER INTERPRETER EXECUTION FREE MEM [byte]: {}'.format(mem_free()))
+        except Exception as e:
+            console_write("[EXEC-ERROR] async session {} error: {}".format(session.addr, e))
+        finally:
+            # Release the client slot - also on task cancel (CancelledError)
+            AsyncSession.ACTIVE -= 1
+            self.server_console("[ socket server ] exit and close connection from {}".format(session.addr))
+            await session.close()
+        del session
+        collect()
+
+
+#########################################################
+#            ASYNC SOCKET SERVER SESSION CLASS          #
+#########################################################
+
+
+class AsyncSession:
+    """
+    Connection level state for the asyncio server mode
+    - CONFIGURE_MODE and pre_prompt per connection (InterpreterShell)
+    - reply_message interface (InterpreterShell, InterpreterCore)
+    - built-in commands: hello, version, exit, reboot, webrepl, frame, subscribe, unsubscribe
+    - framed mode state per connection
+    - subscriptions per connection: push task
+    """
+    ACTIVE = 0
+
+    def __init__(self, server, reader, writer):
+        self.server = server
+        self.reader = reader
+        self.writer = writer
+        self.CONFIGURE_MODE = False
+        self.pre_prompt = ""
+        # Framed mode: [is framed, receive buffer, request id (None: no pending), status, reply lines]
+        self.frame = [False, bytearray(), None, 0, []]
+        # Subscriptions: [[command, period ms, next run ms, push frame id, pushed, coalesced], ...], push task
+        self.subs = []
+        self.sub_task = None
+        # Reply output buffer: [preallocated bytearray, length, prompt is sent]
+        self.out = [bytearray(REPLY_BUF_SIZE), 0, False]
+        try:
+            self.addr = writer.get_extra_info('peername')
+        except Exception:
+            self.addr = None
+
+    async def wait_for_message(self):
+        """
+        Send prompt and read the next message
+        return None in case of session close
+        """
+        if self.frame[0]:
+            return await self.__wait_for_frame()
+        self.reply_prompt()
+        try:
+            await self.drain()
+            data_byte = await asyncio.wait_for(self.reader.read(512), self.__timeout())
+            self.out[2] = False
+        except asyncio.TimeoutError:
+            self.server.server_console("[ socket server ] session {} timeout {} sec"
+                                       .format(self.addr, self.server.timeout_user))
+            self.reply_message("Session timeout {} sec".format(self.server.timeout_user))
+            return None
+        if not data_byte:
+            # Connection closed by client
+            return None
+        try:
+            data_str = data_byte.decode("utf-8").strip()
+        except Exception:
+            data_str = "ctrl-c"
+        self.server.server_console("[ socket server ] RAW INPUT {} |{}|".format(self.addr, data_str))
+        return self.__server_level_cmds(data_str)
+
+    async def __wait_for_frame(self):
+        """
+        Framed mode: next request from the buffer or the connection (no prompt)
+        """
+        request = frame_parse(self.frame[1])
+        while request is None:
+            await self.drain()
+            try:
+                data_byte = await asyncio.wait_for(self.reader.read(512), self.__timeout())
+            except asyncio.TimeoutError:
+                self.server.server_console("[ socket server ] session {} timeout {} sec"
+                                           .format(self.addr, self.server.timeout_user))
+                return None
+            if not data_byte:
+                return None
+            self.frame[1].extend(data_byte)
+            request = frame_parse(self.frame[1])
+        self.frame[2], self.frame[3] = request[0], 0
+        if request[1] is None:
+            self.frame[3] = 3
+            self.reply_message("Bad request, max length: {}".format(FRAME_MAX_REQ))
+            return ""
+        self.server.server_console("[ socket server ] FRAME INPUT {} {} |{}|".format(self.addr, request[0], request[1]))
+        return self.__server_level_cmds(request[1])
+
+    def __timeout(self):
+        """
+        Session timeout - disabled while subscribed (listening client)
+        """
+        return None if len(self.subs) > 0 else self.server.timeout_user
+
+    async def __subscriptions(self):
+        """
+        Subscription push task - until unsubscribe or disconnect
+        """
+        try:
+            while len(self.subs) > 0:
+                wait_ms = subscription_tick(self)
+                # Slow client: drain blocks - missed periods are coalesced on the next tick
+                await self.drain()
+                await asyncio.sleep(wait_ms / 1000)
+        except Exception as e:
+            self.server.server_console("[ socket server ] subscription {} stopped: {}".format(self.addr, e))
+            self.subs.clear()
+        self.sub_task = None
+
+    def push(self, data):
+        self.__write(data)
+
+    def frame_flush(self):
+        """
+        Framed mode: send the collected replies of the actual request
+        """
+        if self.frame[2] is None:
+            return
+        data = frame_pack(self.frame[2], self.frame[3], self.frame[4])
+        self.frame[2] = None
+        self.frame[4].clear()
+        try:
+            self.__write(data)
+        except Exception as e:
+            self.server.server_console("[ socket server ] FRAME REPLY ERROR {}: {}".format(self.addr, e))
+
+    def __server_level_cmds(self, data_str):
+        if data_str == 'exit':
+            self.reply_message("Bye!")
+            return None
+        if data_str == 'hello':
+            data_str = ""
+            self.reply_message("hello:{}:{}".format(cfgfast().devfid, self.server.uid))
+        if data_str == 'version':
+            data_str = ""
+            self.reply_message("{}".format(self.server.version()))
+        if data_str == 'reboot':
+            self.reply_message("Reboot micrOS system.")
+            self.reply_message("Bye!")
+            self.__safe_reboot_system()
+            return None
+        if data_str == 'webrepl':
+            data_str = ""
+            self.server.start_micropython_webrepl(self)
+        if data_str == 'frame':
+            # Switch connection to framed mode
+            data_str = ""
+            self.reply_message("frame:{}".format(FRAME_VERSION))
+            self.frame[0] = True
+        if data_str.split(' ')[0] in ('subscribe', 'unsubscribe'):
+            subscription_cmd(self, data_str)
+            data_str = ""
+            if len(self.subs) > 0 and self.sub_task is None:
+                self.sub_task = asyncio.create_task(self.__subscriptions())
+        return str(data_str)
+
+    def __safe_reboot_system(self):
+        self.server.server_console("Execute safe reboot: __safe_reboot_system() from {}".format(self.addr))
+        write_back(state_idle_ms=0)
+        self.frame_flush()
+        try:
+            self.reply_flush()
+            self.writer.close()
+        except Exception:
+            pass
+        sleep(1)
+        from machine import reset
+        reset()
+
+    def reply_message(self, msg):
+        if self.frame[2] is not None:
+            # Framed mode: collect reply lines of the request
+            self.frame[4].append(msg.decode('utf-8') if isinstance(msg, bytes) else str(msg))
+            return
+        try:
+            if isinstance(msg, bytes):
+                self.__write(msg)
+                return
+            self.__write(str(msg).encode("utf-8"))
+            self.__write(b"\n")
+        except Exception as e:
+            self.server.server_console("[ socket server ] REPLY ERROR {}: {}".format(self.addr, e))
+
+    def reply_prompt(self):
+        """
+        Send the buffered replies of the command - with the prompt in text mode (once per command)
+        """
+        if not (self.frame[0] or self.out[2]):
+            self.__write("{}{} ".format(self.pre_prompt, self.server.prompt).encode('utf-8'))
+            self.out[2] = True
+        self.reply_flush()
+
+    def reply_flush(self):
+        """
+        Send the reply output buffer - one write (copied into the stream buffer)
+        """
+        if self.out[1] > 0:
+            data, self.out[1] = memoryview(self.out[0])[0:self.out[1]], 0
+            self.writer.write(data)
+
+    def __write(self, data):
+        if not reply_buffer(self.out, data):
+            self.reply_flush()
+            if not reply_buffer(self.out, data):
+                # Oversized message - send directly
+                self.writer.write(data)
+
+    async def drain(self):
+        self.reply_flush()
+        await self.writer.drain()
+
+    async def close(self):
+        # Stop subscriptions, send pending frame (e.g. Bye!)
+        self.subs.clear()
+        self.frame_flush()
+        try:
+            await self.drain()
+            self.writer.close()
+            await self.writer.wait_closed()
+        except Exception:
+            pass
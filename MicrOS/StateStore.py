@@ -0,0 +1,139 @@
+"""
+Module is responsible for LM persistent state handling
+dedicated to micrOS framework.
+- pds - persistent data structure - shared store for LMs
+- fixed layout binary record per LM (int16 values)
+- RAM first: save updates the cache, flush writes the file
+    - debounce: flush only after PDS_DEBOUNCE_MS idle time
+    - single flush path, one file: state.pds (atomic write)
+- legacy <lm>.pds text file import
+
+Designed by Marcell Ban aka BxNxM
+"""
+#################################################################
+#                           IMPORTS                             #
+#################################################################
+from array import array
+from struct import pack, unpack
+from os import rename, remove
+try:
+    from time import ticks_ms, ticks_diff
+except ImportError:
+    from simtime import ticks_ms, ticks_diff    # simulator mode
+
+#################################################################
+#                     STATE STORE PARAMETERS                    #
+#################################################################
+# RECORD FORMAT: name length (1 byte), name, value count (1 byte), values (int16 little endian)
+__PDS_PATH = 'state.pds'
+# LM STATE CACHE: {'lm name': array('h')}
+__PDS_CACHE = {}
+# [is loaded, is dirty, last save time ms]
+__PDS_STATE = [False, False, 0]
+PDS_DEBOUNCE_MS = 1000
+
+#################################################################
+#                       STATE STORE API                         #
+#################################################################
+
+
+def pds_load(name, default):
+    """
+    Get LM state values (list) from the store
+        name: LM name (record id)
+        default: default value list - in case of missing record
+    """
+    record = __load().get(name, None)
+    if record is None:
+        record = __legacy_import(name)
+    if record is None:
+        return default
+    return list(record)
+
+
+def pds_save(name, values):
+    """
+    Update LM state values in RAM, file write by pds_flush
+    """
+    record = __load().get(name, None)
+    if record is None or len(record) != len(values):
+        record = array('h', [0] * len(values))
+        __PDS_CACHE[name] = record
+    for index, value in enumerate(values):
+        if record[index] != int(value):
+            record[index] = int(value)
+            __PDS_STATE[1] = True
+    __PDS_STATE[2] = ticks_ms()
+    return True
+
+
+def pds_flush(idle_ms=None):
+    """
+    Single flush path - write all LM records to the state file
+        idle_ms: debounce - write only if there was no save since idle_ms
+                 None: PDS_DEBOUNCE_MS, 0: flush now
+    """
+    if not __PDS_STATE[1]:
+        return True
+    idle_ms = PDS_DEBOUNCE_MS if idle_ms is None else idle_ms
+    if idle_ms > 0 and ticks_diff(ticks_ms(), __PDS_STATE[2]) < idle_ms:
+        return False
+    data = bytearray()
+    for name, record in __PDS_CACHE.items():
+        data.append(len(name))
+        data.extend(name.encode())
+        data.append(len(record))
+        data.extend(pack('<{}h'.format(len(record)), *record))
+    with open(__PDS_PATH + '.tmp', 'wb') as f:
+        f.write(data)
+    rename(__PDS_PATH + '.tmp', __PDS_PATH)
+    __PDS_STATE[1] = False
+    return True
+
+
+def pds_dump():
+    """
+    In-memory dump of the LM states
+    """
+    return {name: list(record) for name, record in __load().items()}
+
+#################################################################
+#                    STATE STORE INTERNALS                      #
+#################################################################
+
+
+def __load():
+    """
+    Load state file to cache - once
+    """
+    if __PDS_STATE[0]:
+        return __PDS_CACHE
+    __PDS_STATE[0] = True
+    try:
+        with open(__PDS_PATH, 'rb') as f:
+            data = f.read()
+        index = 0
+        while index < len(data):
+            name = data[index+1:index+1+data[index]].decode()
+            index += 1 + data[index]
+            length = data[index]
+            __PDS_CACHE[name] = array('h', unpack('<{}h'.format(length), data[index+1:index+1+length*2]))
+            index += 1 + length*2
+    except Exception as e:
+        print("[PDS] load {}: {}".format(__PDS_PATH, e))
+    return __PDS_CACHE
+
+
+def __legacy_import(name):
+    """
+    Import legacy <name>.pds text file (comma separated values) to the store
+    """
+    try:
+        with open('{}.pds'.format(name), 'r') as f:
+            values = [int(data) for data in f.read().strip().split(',')]
+        pds_save(name, values)
+        pds_flush(0)
+        remove('{}.pds'.format(name))
+        return __PDS_CACHE[name]
+    except Exception:
+        return None
@@ -0,0 +1,111 @@
+"""
+Module is responsible for network supervision
+dedicated to micrOS framework.
+- Periodic STA connection check (nwwdsec) - from socket server idle time
+    - non blocking reconnect: connect + poll on the next checks
+- Periodic NTP resync (ntpsec)
+    - RTC drift measurement per sync (RTC time - NTP time)
+    - drift correction (ppm) between syncs for the Scheduler
+
+Designed by Marcell Ban aka BxNxM
+"""
+#################################################################
+#                           IMPORTS                             #
+#################################################################
+from time import time
+from network import STA_IF, WLAN
+from ConfigHandler import cfgget, cfgput, cfgfast, console_write
+try:
+    from time import ticks_ms, ticks_diff
+except ImportError:
+    from simtime import ticks_ms, ticks_diff    # simulator mode
+
+#################################################################
+#                    SUPERVISOR PARAMETERS                      #
+#################################################################
+# [last check ms, reconnect start ms (None: connected), reconnect counter, connection lost counter]
+WD_STATE = [None, None, 0, 0]
+# [last NTP sync epoch (0: never), sync counter, drift ppm (RTC fast: +), last drift sec]
+NTP_STATE = [0, 0, 0, 0]
+RECONNECT_TIMEOUT_MS = 30000
+# Min. time between NTP syncs for drift measurement (sec resolution)
+__DRIFT_MIN_SEC = 600
+
+#################################################################
+#                        SUPERVISOR API                         #
+#################################################################
+
+
+def watchdog():
+    """
+    Network supervisor tick - rate limited (nwwdsec), STA mode only
+    """
+    now, cfg = ticks_ms(), cfgfast()
+    if WD_STATE[0] is not None and ticks_diff(now, WD_STATE[0]) < int(cfg.nwwdsec) * 1000:
+        return False
+    WD_STATE[0] = now
+    if cfg.nwmd != 'STA':
+        return False
+    sta_if = WLAN(STA_IF)
+    if sta_if.isconnected():
+        if WD_STATE[1] is not None:
+            console_write("[SUPERVISOR] STA reconnected: {}".format(sta_if.ifconfig()[0]))
+            WD_STATE[1] = None
+            cfgput("devip", str(sta_if.ifconfig()[0]))
+            # Clock was not synced while disconnected
+            return ntp_sync()
+        if NTP_STATE[0] == 0 or time() - NTP_STATE[0] >= int(cfg.ntpsec):
+            return ntp_sync()
+        return True
+    # Disconnected: (re)start non blocking connect - check result on the next tick
+    if WD_STATE[1] is None:
+        console_write("[SUPERVISOR] STA connection lost")
+        WD_STATE[3] += 1
+    if WD_STATE[1] is None or ticks_diff(now, WD_STATE[1]) > RECONNECT_TIMEOUT_MS:
+        console_write("[SUPERVISOR] STA reconnect: {}".format(cfgget('staessid')))
+        try:
+            sta_if.active(True)
+            sta_if.connect(cfgget('staessid'), cfgget('stapwd'))
+        except Exception as e:
+            console_write("[SUPERVISOR] STA reconnect error: {}".format(e))
+        WD_STATE[1] = now
+        WD_STATE[2] += 1
+    return False
+
+
+def ntp_sync():
+    """
+    NTP resync with RTC drift measurement
+    """
+    from Network import setNTP_RTC, NW_TIMING
+    if NTP_STATE[0] == 0 and 'ntp' in NW_TIMING:
+        # Boot time sync (auto_network_configuration) - drift measurement base
+        NTP_STATE[0] = time()
+        return True
+    rtc_before = time()
+    if not setNTP_RTC():
+        return False
+    ntp_now = time()
+    if NTP_STATE[0] != 0 and ntp_now - NTP_STATE[0] >= __DRIFT_MIN_SEC:
+        NTP_STATE[3] = rtc_before - ntp_now
+        NTP_STATE[2] = NTP_STATE[3] * 1000000 // (ntp_now - NTP_STATE[0])
+        console_write("[SUPERVISOR] RTC drift: {} sec, {} ppm".format(NTP_STATE[3], NTP_STATE[2]))
+    NTP_STATE[0] = ntp_now
+    NTP_STATE[1] += 1
+    return True
+
+
+def corrected_time():
+    """
+    RTC time (epoch sec) with drift correction since the last NTP sync
+    """
+    now = time()
+    if NTP_STATE[0] == 0 or NTP_STATE[2] == 0:
+        return int(now)
+    return int(now - (now - NTP_STATE[0]) * NTP_STATE[2] // 1000000)
+
+
+def supervisor_stat():
+    return {'connected': WLAN(STA_IF).isconnected(), 'reconnects': WD_STATE[2], 'lost': WD_STATE[3],
+            'ntp_syncs': NTP_STATE[1], 'last_sync_sec_ago': time() - NTP_STATE[0] if NTP_STATE[0] else None,
+            'drift_ppm': NTP_STATE[2], 'last_drift_sec': NTP_STATE[3]}
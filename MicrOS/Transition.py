@@ -0,0 +1,176 @@
+"""
+Module is responsible for PWM duty transitions (fade)
+dedicated to micrOS framework.
+- On device duty interpolation from a periodic tick
+    - integer easing curves: linear, in, out, inout
+    - preallocated channel buffers, no per step allocation
+- New target cancels the running transition (continue from the actual duty)
+- Done callback on the final step (LM persists the final state only)
+- Tick driver: machine.Timer + micropython.schedule, asyncio task in aioserv mode
+
+Designed by Marcell Ban aka BxNxM
+"""
+#################################################################
+#                           IMPORTS                             #
+#################################################################
+from sys import platform
+from array import array
+from micropython import schedule
+try:
+    from time import ticks_ms, ticks_diff
+except ImportError:
+    from simtime import ticks_ms, ticks_diff    # simulator mode
+
+#################################################################
+#                    TRANSITION PARAMETERS                      #
+#################################################################
+# Easing curves: easing id is the index
+EASING = ('linear', 'in', 'out', 'inout')
+TICK_MS = 20
+# Active transitions - ticked by the driver
+TRANSITIONS = []
+# Tick driver: machine.Timer object or asyncio task
+__DRIVER = [None]
+
+#################################################################
+#                        TRANSITION CLASS                       #
+#################################################################
+
+
+class Transition:
+    """
+    Duty transition of a PWM channel group (channels change together)
+        pwms: PWM objects
+        on_done: called on the final step - LM state save
+    """
+
+    def __init__(self, pwms, on_done=None):
+        self.pwms = pwms
+        self.on_done = on_done
+        self.duty_from = array('h', [0] * len(pwms))
+        self.duty_to = array('h', [0] * len(pwms))
+        # [is active, start ms, duration ms, easing id]
+        self.state = [False, 0, 0, 0]
+
+    def start(self, targets, duration_ms=1000, easing='inout'):
+        """
+        Start (or restart) transition from the actual duties to targets
+        """
+        if easing not in EASING:
+            raise Exception("Invalid easing: {}, select: {}".format(easing, EASING))
+        for index in range(0, len(self.pwms)):
+            self.duty_from[index] = self.pwms[index].duty()
+            self.duty_to[index] = targets[index]
+        self.state[1] = ticks_ms()
+        self.state[2] = max(1, int(duration_ms))
+        self.state[3] = EASING.index(easing)
+        self.state[0] = True
+        if self not in TRANSITIONS:
+            TRANSITIONS.append(self)
+        tick_driver_start()
+
+    def cancel(self):
+        """
+        Stop transition at the actual duty - no done callback
+        """
+        self.state[0] = False
+
+    def is_active(self):
+        return self.state[0]
+
+    def step(self, now):
+        """
+        Set channel duties for the actual time - integer easing (0-1024 scale)
+        return False when transition is over
+        """
+        if not self.state[0]:
+            return False
+        progress = ticks_diff(now, self.state[1]) * 1024 // self.state[2]
+        if progress >= 1024:
+            progress = 1024
+        elif self.state[3] == 1:
+            # in: quadratic
+            progress = progress * progress >> 10
+        elif self.state[3] == 2:
+            # out: inverse quadratic
+            progress = progress * (2048 - progress) >> 10
+        elif self.state[3] == 3:
+            # inout: quadratic in first half, out second half
+            if progress < 512:
+                progress = progress * progress >> 9
+            else:
+                progress = 1024 - ((1024 - progress) * (1024 - progress) >> 9)
+        for index in range(0, len(self.pwms)):
+            duty_from = self.duty_from[index]
+            self.pwms[index].duty(duty_from + (self.duty_to[index] - duty_from) * progress // 1024)
+        if progress < 1024:
+            return True
+        self.state[0] = False
+        if self.on_done is not None:
+            self.on_done()
+        return False
+
+#################################################################
+#                         TICK DRIVER                           #
+#################################################################
+
+
+def __tick(_=None):
+    """
+    Step every active transition, stop the driver when all done
+    """
+    now = ticks_ms()
+    for index in range(len(TRANSITIONS) - 1, -1, -1):
+        if not TRANSITIONS[index].step(now):
+            TRANSITIONS.pop(index)
+    if len(TRANSITIONS) == 0:
+        tick_driver_stop()
+
+
+def __timer_cb(timer=None):
+    """
+    Timer IRQ: defer step (skip tick if schedule queue is full)
+    """
+    try:
+        schedule(__tick, None)
+    except Exception:
+        pass
+
+
+async def __tick_task():
+    """
+    asyncio (aioserv) tick driver
+    """
+    try:
+        import uasyncio as asyncio
+    except:
+        import asyncio      # simulator mode
+    period_sec = TICK_MS / 1000
+    while __DRIVER[0] is not None:
+        __tick()
+        await asyncio.sleep(period_sec)
+
+
+def tick_driver_start():
+    if __DRIVER[0] is not None:
+        return
+    from ConfigHandler import cfgget
+    if cfgget('aioserv'):
+        # Running event loop (multi client socket server)
+        try:
+            import uasyncio as asyncio
+        except:
+            import asyncio      # simulator mode
+        __DRIVER[0] = asyncio.create_task(__tick_task())
+        return
+    from machine import Timer
+    # Timer(0): timirq, Timer(1): neopixel animation, esp8266: virtual timer
+    __DRIVER[0] = Timer(2 if platform == 'esp32' else -1)
+    __DRIVER[0].init(period=TICK_MS, mode=Timer.PERIODIC, callback=__timer_cb)
+
+
+def tick_driver_stop():
+    if __DRIVER[0] is not None and hasattr(__DRIVER[0], 'deinit'):
+        __DRIVER[0].deinit()
+    # asyncio task exits on __DRIVER[0] is None
+    __DRIVER[0] = None
@@ -10,6 +10,7 @@ Designed by Marcell Ban aka BxNxM
 from Network import auto_network_configuration
 from SocketServer import SocketServer
 from Hooks import bootup_hook, profiling_info
+from ConfigHandler import cfgwriteback, cfgflush
 
 #################################################################
 #            INTERRUPT HANDLER INTERFACES / WRAPPERS            #
@@ -39,6 +40,16 @@ def external_interrupt_handler():
         print("=> [MAIN DEBUG] InterruptHandler.init_eventPIN error: {}".format(e))
 
 
+def sampler_service():
+    try:
+        from ConfigHandler import cfgget
+        if cfgget('sampler').lower() != 'n/a':
+            from Sampler import sampler_start
+            sampler_start()
+    except Exception as e:
+        print("=> [MAIN DEBUG] Sampler.sampler_start error: {}".format(e))
+
+
 #################################################################
 #                      MAIN FUNCTION CALLS                      #
 #################################################################
@@ -46,12 +57,16 @@ def external_interrupt_handler():
 def micrOS():
     profiling_info(label='[1] MAIN BASELOAD')
 
+    # CONFIG write-back mode - batch config writes (cfgflush)
+    cfgwriteback(True)
+
     # BOOT HOOKs execution
     safe_boot_hook()
     profiling_info(label='[2] AFTER SAFE BOOT HOOK')
 
     # NETWORK setup
     auto_network_configuration()
+    cfgflush()
     profiling_info(label='[3] AFTER NETWORK CONFIGURATION')
 
     # LOAD Singleton SocketServer [1]
@@ -66,6 +81,10 @@ def micrOS():
     external_interrupt_handler()
     profiling_info(label='[6] AFTER EXTERNAL INTERRUPT SETUP')
 
+    # START background sensor sampling (sampler from nodeconfig)
+    sampler_service()
+    profiling_info(label='[7] AFTER SAMPLER SETUP')
+
     # RUN Singleton SocketServer - main loop [2]
     SocketServer().run()
 
@@ -2,7 +2,6 @@
 
 import os
 import sys
-import time
 MYPATH = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(os.path.join(MYPATH, '../tools'))
 import socketClient
@@ -19,18 +18,15 @@ def app(devfid=None):
     global DEVICE
     if devfid is not None:
         DEVICE = devfid
-    for k in range(0, 20):
-        args = base_cmd() + ['bme280 measure']
+    # One connection, the device pushes the measurements (subscribe)
+    with socketClient.session(dev=DEVICE) as session:
         try:
-            status, answer = socketClient.run(args)
-            if status:
-                print("|- [{}/20] OK".format(k+1))
-            else:
-                print("|- [{}/20] ERR".format(k+1))
-            time.sleep(3)
+            for k, answer in enumerate(session.subscribe('bme280 measure', period=3, count=20)):
+                print("|- [{}/20] OK {}".format(k+1, answer))
         except KeyboardInterrupt:
-            break
-
+            pass
+        except Exception as e:
+            print("|- ERR {}".format(e))
 
 if __name__ == "__main__":
     app()
@@ -17,28 +17,16 @@ def base_cmd():
     return ['--dev', DEVICE]
 
 def play_game(iteration=30, devfid=None):
-    global CMD_PIPE_SEP
-    for _ in range(iteration):
-        piped_commands = []
-
-        args = base_cmd() + ['servo', 'Servo {} '.format(SERVO_CENTER_VAL)]
-        print("CMD: {}".format(args))
-        args.append(CMD_PIPE_SEP)
-        piped_commands += args
-
-        for _ in range(randint(1, 6)):
-            duty = randint(55, 100)
-            args = ['servo', 'Servo {duty} '.format(duty=duty)]
-            print("\tCMD: {}".format(args))
-            args.append(CMD_PIPE_SEP)
-            piped_commands += args
-
-        args += ['servo', 'Servo {}'.format(SERVO_CENTER_VAL)]
-        print("CMD: {}".format(args))
-        piped_commands += args
-
-        print("CMD PIPE: {}".format(piped_commands))
-        socketClient.run(piped_commands)
+    # One connection for the whole game - commands pipelined
+    with socketClient.session(dev=DEVICE) as session:
+        for _ in range(iteration):
+            piped_commands = ['servo Servo {}'.format(SERVO_CENTER_VAL)]
+            for _ in range(randint(1, 6)):
+                piped_commands.append('servo Servo {duty}'.format(duty=randint(55, 100)))
+            piped_commands.append('servo Servo {}'.format(SERVO_CENTER_VAL))
+            print("CMD PIPE: {}".format(piped_commands))
+            for cmd, reply, rtt in session.pipeline(piped_commands):
+                print("\tCMD: {} -> {} ({:.3f} sec)".format(cmd, reply, rtt))
 
 
 def deinit_servo():
@@ -110,6 +110,8 @@ def arg_parse():
     base_group = parser.add_argument_group("Base commands")
     base_group.add_argument("-m", "--make", action="store_true", help="Erase & Deploy & Precompile (MicrOS) & Install (MicrOS)")
     base_group.add_argument("-o", "--OTA", action="store_true", help="OTA (OverTheArir update with webrepl)")
+    base_group.add_argument("--delta", action="store_true", help="Delta mode for -o/--OTA: upload changed files only (file hash manifest)")
+    base_group.add_argument("--fleet", action="store_true", help="Fleet mode for -o/--OTA: delta update on every known device in parallel")
     base_group.add_argument("-r", "--update", action="store_true", help="Update/redeploy connected (usb) MicrOS. \
                                                                     - node config will be restored")
     base_group.add_argument("-c", "--connect", action="store_true", help="Connect via socketclinet")
@@ -130,6 +132,7 @@ def arg_parse():
     dev_group.add_argument("-f", "--force_update", action="store_true", help="Force mode for -r/--update and -o/--OTA")
     dev_group.add_argument("-s", "--search_devices", action="store_true", help="Search devices on connected wifi network.")
     dev_group.add_argument("-sim", "--simulate", action="store_true", help="start micrOS on your computer in simulated mode")
+    dev_group.add_argument("--dry-run", action="store_true", help="Show precompile diff for -cc/--cross_compile_micros without execution")
 
 
     toolkit_group = parser.add_argument_group("Toolkit development")
@@ -172,8 +175,13 @@ def connect(args=None):
         socketClient.run(arg_list=[])
 
 
-def ota_update(api_obj, force=False):
-    api_obj.update_with_webrepl(force=force)
+def ota_update(api_obj, force=False, delta=False, fleet=False):
+    if fleet:
+        api_obj.update_fleet_with_webrepl(force=force)
+    elif delta:
+        api_obj.update_with_webrepl_delta(force=force)
+    else:
+        api_obj.update_with_webrepl(force=force)
 
 
 def node_status():
@@ -184,8 +192,8 @@ def search_devices():
     socketClient.ConnectionData.filter_MicrOS_devices()
 
 
-def precompile_micrOS(api_obj):
-    api_obj.precompile_micros()
+def precompile_micrOS(api_obj, dry_run=False):
+    api_obj.precompile_micros(dry_run=dry_run)
 
 
 def connect_via_usb(api_obj):
@@ -290,7 +298,7 @@ if __name__ == "__main__":
 
     # Commands
     if cmd_args.OTA:
-        ota_update(api_obj, force=cmd_args.force_update)
+        ota_update(api_obj, force=cmd_args.force_update, delta=cmd_args.delta, fleet=cmd_args.fleet)
 
     if cmd_args.list_devs_n_bins:
         list_devs_n_bins(api_obj)
@@ -308,7 +316,7 @@ if __name__ == "__main__":
         install(api_obj)
 
     if cmd_args.cross_compile_micros:
-        precompile_micrOS(api_obj)
+        precompile_micrOS(api_obj, dry_run=cmd_args.dry_run)
 
     if cmd_args.version:
         get_MicrOS_version(api_obj)
@@ -3,17 +3,64 @@
 import os
 import sys
 import re
+import ast
 import json
 import pprint
 import time
+import hashlib
+import socket
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import serial.tools.list_ports as serial_port_list
 MYPATH = os.path.dirname(os.path.abspath(__file__))
+# Static LM function index for the device (help) - [!] name dependency with InterpreterShell
+LM_STATIC_INDEX = 'sfuncman.idx'
 import LocalMachine
 from TerminalColors import Colors
 sys.path.append(os.path.join(MYPATH, '../'))
 import socketClient
 
 
+def mpy_cross_worker(mpy_cross, to_compile, target_path):
+    """
+    Precompile one module - process pool worker
+    return: source, exitcode, stdout, stderr, elapsed sec
+    """
+    start_time = time.time()
+    command = "{mpy_cross} {to_compile} -o {target_path} -v".format(mpy_cross=mpy_cross, to_compile=to_compile,
+                                                                    target_path=target_path)
+    exitcode, stdout, stderr = LocalMachine.CommandHandler.run_command(command, shell=True)
+    return to_compile, exitcode, stdout, stderr, time.time() - start_time
+
+
+def LM_function_signatures(lm_path):
+    """
+    Public LM functions with signatures - static (AST) parse of the LM source
+    return: ['function(param, param=default)', ...]
+    """
+    with open(lm_path, 'r') as f:
+        source = f.read()
+    signatures = []
+    for node in ast.parse(source).body:
+        if not isinstance(node, ast.FunctionDef) or node.name.startswith('__'):
+            continue
+        args = node.args
+        positional = [arg.arg for arg in args.posonlyargs + args.args]
+        defaults = [ast.get_source_segment(source, default) for default in args.defaults]
+        params = positional[:len(positional) - len(defaults)] + \
+                 ['{}={}'.format(arg, default) for arg, default in zip(positional[len(positional) - len(defaults):], defaults)]
+        if args.vararg is not None:
+            params.append('*{}'.format(args.vararg.arg))
+        elif len(args.kwonlyargs) > 0:
+            params.append('*')
+        params += [arg.arg if default is None else '{}={}'.format(arg.arg, ast.get_source_segment(source, default))
+                   for arg, default in zip(args.kwonlyargs, args.kw_defaults)]
+        if args.kwarg is not None:
+            params.append('**{}'.format(args.kwarg.arg))
+        signatures.append('{}({})'.format(node.name, ', '.join(params)))
+    return signatures
+
+
 class MicrOSDevTool:
 
     def __init__(self, dummy_exec=False, gui_console=None, cmdgui=True):
@@ -39,6 +86,7 @@ class MicrOSDevTool:
         self.MicrOS_dir_path = os.path.join(MYPATH, "../../MicrOS")
         self.MicrOS_node_config_archive = os.path.join(MYPATH, "../../user_data/node_config_archive")
         self.precompiled_MicrOS_dir_path = os.path.join(MYPATH, "../../mpy-MicrOS")
+        self.precompile_manifest_path = os.path.join(MYPATH, "../../user_data/precompile_manifest.json")
         self.micropython_bin_dir_path = os.path.join(MYPATH, "../../framework")
         self.micropython_repo_path = os.path.join(MYPATH, '../../micropython_repo/micropython')
         self.webreplcli_repo_path = os.path.join(MYPATH, '../../micropython_repo/webrepl/webrepl_cli.py')
@@ -49,6 +97,8 @@ class MicrOSDevTool:
                                          "LM_bme280.py", "LM_co2.py", "LM_dht11.py", "LM_light_sensor.py"]
         self.node_config_profiles_path = os.path.join(MYPATH, "../../release_info/node_config_profiles/")
         self.micropython_git_repo_url = 'https://github.com/micropython/micropython.git'
+        # Skip the following modules in OTA update (safe mode) to have recovery mode
+        self.safe_mode_file_exception_list = ['boot.py', 'micrOSloader.mpy', 'Network.mpy']
 
         # Filled by methods
         self.selected_device_type = None
@@ -292,14 +342,38 @@ class MicrOSDevTool:
                 return False
         return True
 
-    def __cleanup_precompiled_dir(self):
-        for source in [ pysource for pysource in LocalMachine.FileHandler.list_dir(self.precompiled_MicrOS_dir_path) \
-                        if pysource.endswith('.py') or pysource.endswith('.mpy') ]:
-            to_remove_path = os.path.join(self.precompiled_MicrOS_dir_path, source)
-            self.console("Cleanup dir - remove: {}".format(to_remove_path), state='imp')
-            LocalMachine.FileHandler.remove(to_remove_path)
+    def __mpy_cross_version(self):
+        exitcode, stdout, stderr = LocalMachine.CommandHandler.run_command("{} --version".format(self.mpy_cross_compiler_path),
+                                                                           shell=True, raise_exception=False)
+        return stdout.strip() if exitcode == 0 else 'n/a'
+
+    def __read_precompile_manifest(self):
+        """
+        Manifest: {source: {'hash': sha256, 'mpy_cross': version, 'output': target name}}
+        """
+        if os.path.isfile(self.precompile_manifest_path):
+            try:
+                with open(self.precompile_manifest_path, 'r') as f:
+                    return json.load(f)
+            except Exception as e:
+                self.console("Precompile manifest read error: {}".format(e), state='warn')
+        return {}
+
+    def __write_precompile_manifest(self, manifest):
+        with open(self.precompile_manifest_path, 'w') as f:
+            json.dump(manifest, f, indent=4, sort_keys=True)
+
+    @staticmethod
+    def __source_hash(path):
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
 
-    def precompile_micros(self):
+    def precompile_micros(self, dry_run=False, workers=None):
+        """
+        Incremental precompile: rebuild (mpy-cross) or copy changed modules only
+            dry_run: show the diff without execution
+            workers: process pool size (default: cpu count)
+        """
         self.console("------------------------------------------")
         self.console("-             PRECOMPILE MICROS          -", state='imp')
         self.console("------------------------------------------")
@@ -309,16 +383,14 @@ class MicrOSDevTool:
             self.console("Precompile - missing dependences - skip")
             return
 
-        if not self.dummy_exec:
-            self.__cleanup_precompiled_dir()
-
         file_prefix_blacklist = ['LM_', 'boot.py']
         tmp_precompile_set = set()
         tmp_skip_compile_set = set()
         error_cnt = 0
-        # Filter source
-        for source in [ pysource for pysource in LocalMachine.FileHandler.list_dir(self.MicrOS_dir_path) if pysource.endswith('.py') ]:
-            is_blacklisted = False
+        # Filter source (+ static LM function index - copy)
+        for source in [ pysource for pysource in LocalMachine.FileHandler.list_dir(self.MicrOS_dir_path)
+                        if pysource.endswith('.py') or pysource == LM_STATIC_INDEX ]:
+            is_blacklisted = not source.endswith('.py')
             for black_prefix in file_prefix_blacklist:
                 if source.startswith(black_prefix) and source not in self.precompile_LM_wihitelist:
                     is_blacklisted = True
@@ -327,36 +399,74 @@ class MicrOSDevTool:
             else:
                 tmp_precompile_set.add(source)
 
+        # Diff sources with the manifest: source hash + mpy-cross version + output
+        manifest = self.__read_precompile_manifest()
+        mpy_cross_version = self.__mpy_cross_version()
+        new_manifest = {}
+        to_compile_list = []
+        to_copy_list = []
+        for source in sorted(tmp_precompile_set | tmp_skip_compile_set):
+            target_name = source.replace('.py', '.mpy') if source in tmp_precompile_set else source
+            entry = {'hash': self.__source_hash(os.path.join(self.MicrOS_dir_path, source)),
+                     'mpy_cross': mpy_cross_version if source in tmp_precompile_set else None,
+                     'output': target_name}
+            new_manifest[source] = entry
+            old_entry = manifest.get(source, {})
+            is_up_to_date = old_entry.get('hash') == entry['hash'] and old_entry.get('mpy_cross') == entry['mpy_cross'] \
+                            and old_entry.get('output') == target_name \
+                            and os.path.isfile(os.path.join(self.precompiled_MicrOS_dir_path, target_name))
+            if is_up_to_date:
+                self.console("[UP-TO-DATE] {}".format(source))
+                new_manifest[source]['sec'] = old_entry.get('sec', 0)
+            elif source in tmp_precompile_set:
+                to_compile_list.append(source)
+                self.console("[REBUILD] {}".format(source), state='imp')
+            else:
+                to_copy_list.append(source)
+                self.console("[COPY] {}".format(source), state='imp')
+        # Outputs of removed sources (or changed compile mode)
+        to_remove_list = [entry['output'] for source, entry in manifest.items()
+                          if entry.get('output') is not None and
+                          new_manifest.get(source, {}).get('output') != entry['output']]
+        for output in to_remove_list:
+            self.console("[REMOVE] {}".format(output), state='imp')
+        if dry_run:
+            self.console("Dry run: rebuild: {} copy: {} remove: {}".format(len(to_compile_list), len(to_copy_list),
+                                                                           len(to_remove_list)), state='ok')
+            return True
+
+        for output in to_remove_list:
+            if not self.dummy_exec:
+                LocalMachine.FileHandler.remove(os.path.join(self.precompiled_MicrOS_dir_path, output), ignore=True)
+
         # Change workdir
         workdir_handler = LocalMachine.SimplePopPushd()
         workdir_handler.pushd(self.MicrOS_dir_path)
 
         # Execute based on filetered sets
-        # |-> PRECOMPILE
-        for to_compile in tmp_precompile_set:
-            #source_path = os.path.join(self.MicrOS_dir_path, to_compile)
-            precompiled_target_name = to_compile.replace('.py', '.mpy')
-            command = "{mpy_cross} {to_compile} -o {target_path}/{target_name} -v".format(mpy_cross=self.mpy_cross_compiler_path,
-                                                                                          to_compile=to_compile,
-                                                                                          target_path=self.precompiled_MicrOS_dir_path,
-                                                                                          target_name=precompiled_target_name)
-            self.console("Precomile: {}\n|->CMD: {}".format(to_compile, command), state='imp')
-            if not self.dummy_exec:
-                exitcode, stdout, stderr = LocalMachine.CommandHandler.run_command(command, shell=True)
-            else:
-                exitcode = 0
-                stderr = ''
-            if exitcode == 0 and stderr == '':
-                self.console("|---> DONE", state='ok')
-            else:
-                self.console("|---> ERROR: {} - {}".format(stdout, stderr), state='err')
-                error_cnt+=1
+        # |-> PRECOMPILE (parallel)
+        start_time = time.time()
+        if not self.dummy_exec and len(to_compile_list) > 0:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(mpy_cross_worker, self.mpy_cross_compiler_path, to_compile,
+                                           os.path.join(self.precompiled_MicrOS_dir_path, to_compile.replace('.py', '.mpy')))
+                           for to_compile in to_compile_list]
+                for future in futures:
+                    to_compile, exitcode, stdout, stderr, elapsed = future.result()
+                    new_manifest[to_compile]['sec'] = round(elapsed, 3)
+                    if exitcode == 0 and stderr == '':
+                        self.console("Precomile: {} |---> DONE [{:.3f} sec]".format(to_compile, elapsed), state='ok')
+                    else:
+                        self.console("Precomile: {} |---> ERROR: {} - {}".format(to_compile, stdout, stderr), state='err')
+                        # Rebuild next time
+                        new_manifest.pop(to_compile)
+                        error_cnt += 1
 
         # Restore original workdir
         workdir_handler.popd()
 
         # |-> COPY
-        for skip_compile in tmp_skip_compile_set:
+        for skip_compile in to_copy_list:
             source_path = os.path.join(self.MicrOS_dir_path, skip_compile)
             self.console("SKIP precompile: {}".format(skip_compile), state='imp')
             if not self.dummy_exec:
@@ -365,7 +475,18 @@ class MicrOSDevTool:
                 state = True
             if not state:
                 self.console("Copy error", state='err')
+                new_manifest.pop(skip_compile)
                 error_cnt += 1
+
+        # Timing report
+        self.console("Precompile timing report (rebuilt: {}, up-to-date: {}):".format(
+            len(to_compile_list), len(new_manifest) - len(to_compile_list) - len(to_copy_list)), state='imp')
+        for source in sorted(to_compile_list, key=lambda src: new_manifest.get(src, {}).get('sec', 0), reverse=True):
+            self.console("\t{:.3f} sec\t{}".format(new_manifest.get(source, {}).get('sec', 0), source))
+        self.console("\tTOTAL: {:.3f} sec".format(time.time() - start_time))
+        if not self.dummy_exec:
+            self.__write_precompile_manifest(new_manifest)
+
         # Evaluation summary
         if error_cnt != 0:
             self.console("Some modules [{}] not compiled properly - please check the logs.".format(error_cnt))
@@ -743,32 +864,28 @@ class MicrOSDevTool:
 
     def LM_functions_static_dump_gen(self):
         """
-        Generate static module-function provider json description: sfuncman.json
+        Generate static module-function provider descriptions from the LM sources (AST):
+            sfuncman.json - manual
+            sfuncman.idx - device help index (precompiled LMs too), line per LM: name<tab>signature<tab>...
         [!] name dependency with micrOS internal manual provider
         """
         static_help_json_path = os.path.join(self.MicrOS_dir_path, 'sfuncman.json')
+        static_index_path = os.path.join(self.MicrOS_dir_path, LM_STATIC_INDEX)
         module_function_dict = {}
-        for LM in (i.split('.')[0] for i in LocalMachine.FileHandler.list_dir(self.MicrOS_dir_path) if
-                   i.startswith('LM_') and (i.endswith('.py'))):
+        for LM in sorted(i.split('.')[0] for i in LocalMachine.FileHandler.list_dir(self.MicrOS_dir_path) if
+                         i.startswith('LM_') and (i.endswith('.py'))):
             LMpath = '{}/{}.py'.format(self.MicrOS_dir_path, LM)
             try:
-                module_int_name = LM.replace('LM_', '')
-                module_function_dict[module_int_name] = []
-                with open(LMpath, 'r') as f:
-                    while True:
-                        line = f.readline()
-                        if not line:
-                            break
-                        if 'def ' in line and 'def __' not in line:
-                            if '(self' in line:
-                                continue
-                            function_name = '{})'.format(line.split(')')[0]).replace("def", '').strip()
-                            module_function_dict[module_int_name].append(function_name)
+                module_function_dict[LM.replace('LM_', '')] = LM_function_signatures(LMpath)
             except Exception as e:
                 self.console("STATIC micrOS HELP GEN: LM [{}] PARSER ERROR: {}".format(LM, e))
         self.console("Dump micrOS static manual: {}".format(static_help_json_path))
         with open(static_help_json_path, 'w') as f:
             json.dump(module_function_dict, f, indent=2)
+        self.console("Dump micrOS static LM index: {}".format(static_index_path))
+        with open(static_index_path, 'w') as f:
+            for module, functions in module_function_dict.items():
+                f.write('\t'.join([module] + functions) + '\n')
 
     def purge_node_config_from_workdir(self):
         path = os.path.join(self.precompiled_MicrOS_dir_path, 'node_config.json')
@@ -892,7 +1009,7 @@ class MicrOSDevTool:
 
         force_mode = False
         # Skip the following modules in OTA update (safe mode) to have recovery mode
-        safe_mode_file_exception_list = ['boot.py', 'micrOSloader.mpy', 'Network.mpy']
+        safe_mode_file_exception_list = self.safe_mode_file_exception_list
         # Get specific device from device list
         self.console("Select device to update ...", state='IMP')
         socketClient.ConnectionData.read_MicrOS_device_cache()
@@ -980,7 +1097,7 @@ class MicrOSDevTool:
 
         # Parse files and upload
         resource_list_to_upload = [pysource for pysource in LocalMachine.FileHandler.list_dir(self.precompiled_MicrOS_dir_path)
-                        if pysource.endswith('.py') or pysource.endswith('.mpy')]
+                        if pysource.endswith('.py') or pysource.endswith('.mpy') or pysource == LM_STATIC_INDEX]
 
         # Change workdir
         workdir_handler = LocalMachine.SimplePopPushd()
@@ -1056,6 +1173,10 @@ class MicrOSDevTool:
                 time.sleep(2)
 
         # Print manual steps if necessary
+        self.__ota_manual_reset_hint(up_again_status, device_ip)
+        self.execution_verdict.append("[OK] ota_update was successful")
+
+    def __ota_manual_reset_hint(self, up_again_status, device_ip):
         if not up_again_status:
             self.console("Auto restart timeout, please reboot device manually.", state='WARN')
             self.console("Please reset your device.", state='IMP')
@@ -1063,7 +1184,146 @@ class MicrOSDevTool:
             self.console("\t[2]HINT: log in and execute: import reset")
             self.console("\t[3]HINT: OR skip [2] point and reset manually")
             self.execution_verdict.append("[WARN] ota_update - device auto restart failed,\nplease reset the device manually.")
-        self.execution_verdict.append("[OK] ota_update was successful")
+
+    #####################################################
+    #               DELTA OTA (WEBREPL) METHODS         #
+    #####################################################
+    def __local_ota_manifest(self):
+        """
+        Precompiled resources hash manifest - same format as LM_system manifest on device
+            {file: sha256 first 8 bytes hex}
+        """
+        manifest = {}
+        for source in LocalMachine.FileHandler.list_dir(self.precompiled_MicrOS_dir_path):
+            if source.endswith('.py') or source.endswith('.mpy') or source == LM_STATIC_INDEX:
+                with open(os.path.join(self.precompiled_MicrOS_dir_path, source), 'rb') as f:
+                    manifest[source] = hashlib.sha256(f.read()).hexdigest()[:16]
+        return manifest
+
+    def __webrepl_connect(self, host, pwd, port=8266):
+        """
+        Open one persistent WebREPL websocket session (webrepl_cli API)
+        return: socket, websocket, webrepl_cli module
+        """
+        sys.path.append(os.path.dirname(self.webreplcli_repo_path))
+        import webrepl_cli
+        import websocket_helper
+        sock = socket.socket()
+        sock.settimeout(30)
+        sock.connect(socket.getaddrinfo(host, port)[0][-1])
+        websocket_helper.client_handshake(sock)
+        ws = webrepl_cli.websocket(sock)
+        webrepl_cli.login(ws, pwd)
+        # Send data marked as binary
+        ws.ioctl(9, 2)
+        return sock, ws, webrepl_cli
+
+    def update_with_webrepl_delta(self, device=None, force=False):
+        """
+        DELTA OTA UPDATE
+            [1] Get file hash manifest from device (micrOS shell: system manifest)
+            [2] Upload only the differing files over one WebREPL session (+ .if_mode lock/unlock)
+        device: (fuid, ip) - None: select device
+        force: update safe mode files too (boot.py, micrOSloader.mpy, Network.mpy)
+        """
+        if device is None:
+            if not self.__clone_webrepl_repo():
+                self.console("Webrepl repo not available...", state='ERR')
+                self.execution_verdict.append("[ERR] ota_update - clone webrepl repo")
+                return False
+            self.precompile_micros()
+            socketClient.ConnectionData.read_MicrOS_device_cache()
+            device_ip, fuid = socketClient.ConnectionData.select_device()
+            socketClient.ConnectionData.read_port_from_nodeconf()
+        else:
+            fuid, device_ip = device
+        port = socketClient.ConnectionData.PORT
+        start_time = time.time()
+
+        # [1] Device data over one micrOS shell session
+        try:
+            with socketClient.SocketSession(host=device_ip, port=port) as session:
+                session.send('conf')
+                webrepl_password = session.send('appwd').strip()
+                session.send('noconf')
+                device_manifest = json.loads(session.send('system manifest').strip())
+        except Exception as e:
+            self.console("[{}] Get device manifest failed: {}".format(fuid, e), state='ERR')
+            self.execution_verdict.append("[ERR] ota_update {} - device manifest: {}".format(fuid, e))
+            return False
+
+        local_manifest = self.__local_ota_manifest()
+        to_upload = sorted(source for source, source_hash in local_manifest.items()
+                           if device_manifest.get(source) != source_hash and
+                           (force or source not in self.safe_mode_file_exception_list))
+        self.console("[{}] Delta: {} of {} files: {}".format(fuid, len(to_upload), len(local_manifest), to_upload),
+                     state='IMP')
+        if len(to_upload) == 0:
+            self.execution_verdict.append("[OK] ota_update {} - device is up-to-date".format(fuid))
+            return True
+        if self.dummy_exec:
+            self.execution_verdict.append("[OK] ota_update {} - dummy exec".format(fuid))
+            return True
+
+        # [2] Start webrepl on device, upload over one websocket session
+        with socketClient.SocketSession(host=device_ip, port=port) as session:
+            self.console(session.send('webrepl'))
+        time.sleep(3)
+        lock_file = tempfile.NamedTemporaryFile('w', delete=False)
+        sock = None
+        try:
+            sock, ws, webrepl_cli = self.__webrepl_connect(device_ip, webrepl_password)
+            lock_file.write('webrepl')
+            lock_file.close()
+            webrepl_cli.put_file(ws, lock_file.name, '.if_mode')
+            for index, source in enumerate(to_upload):
+                self.console("[{}][{}/{}] {} upload".format(fuid, index+1, len(to_upload), source))
+                webrepl_cli.put_file(ws, os.path.join(self.precompiled_MicrOS_dir_path, source), source)
+            with open(lock_file.name, 'w') as f:
+                f.write('micros')
+            webrepl_cli.put_file(ws, lock_file.name, '.if_mode')
+        except Exception as e:
+            self.console("[{}] OTA UPDATE WAS FAILED, PLEASE TRY AGAIN: {}".format(fuid, e), state='ERR')
+            self.execution_verdict.append("[ERR] ota_update {} - upload failed: {}".format(fuid, e))
+            return False
+        finally:
+            if sock is not None:
+                sock.close()
+            os.remove(lock_file.name)
+        self.console("[{}] Upload done in {:.1f} sec, device will reboot automatically.".format(
+            fuid, time.time() - start_time), state='OK')
+
+        # Wait for micrOS interface
+        up_again_status = False
+        for is_up_again in range(0, 5):
+            time.sleep(2)
+            try:
+                with socketClient.SocketSession(host=device_ip, port=port) as session:
+                    if 'hello' in session.send('hello'):
+                        up_again_status = True
+                        break
+            except Exception:
+                self.console("[{}][{}/4] Try to connect ...".format(fuid, is_up_again))
+        self.__ota_manual_reset_hint(up_again_status, device_ip)
+        self.execution_verdict.append("[OK] ota_update {} was successful ({} files)".format(fuid, len(to_upload)))
+        return True
+
+    def update_fleet_with_webrepl(self, force=False, workers=4):
+        """
+        Delta OTA update on every device from device_conn_cache.json - parallel
+        """
+        if not self.__clone_webrepl_repo():
+            self.console("Webrepl repo not available...", state='ERR')
+            self.execution_verdict.append("[ERR] ota_update - clone webrepl repo")
+            return False
+        self.precompile_micros()
+        socketClient.ConnectionData.read_port_from_nodeconf()
+        devices = [(data[2], data[0]) for uid, data in socketClient.ConnectionData.read_MicrOS_device_cache().items()
+                   if uid not in socketClient.ConnectionData.DEFAULT_CONFIG_FRAGMNENT.keys()]
+        self.console("Fleet OTA update: {}".format(devices), state='IMP')
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(lambda dev: self.update_with_webrepl_delta(device=dev, force=force), devices))
+        return all(results)
 
 
 if __name__ == "__main__":
@@ -1,5 +1,6 @@
 import ipaddress
 import socket
+import asyncio
 import netifaces
 import netaddr
 import threading
@@ -96,6 +97,77 @@ def filter_threads(host_list, port, threads=50):
     return AVAILABLE_DEVICES_LIST
 
 
+async def __probe_micros_device(host, port, timeout, semaphore):
+    """
+    TCP connect to the micrOS socket server + hello in one pass
+    return [ip, fuid, uid, elapsed ms] or None
+    """
+    async with semaphore:
+        start_time = time.time()
+        writer = None
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+            # Wait for the prompt, then identify the device
+            await asyncio.wait_for(reader.read(256), timeout)
+            writer.write(b'hello')
+            await writer.drain()
+            reply = ""
+            while 'hello:' not in reply or not reply.split('hello:')[-1].count('\n'):
+                data = await asyncio.wait_for(reader.read(256), timeout)
+                if not data:
+                    break
+                reply += data.decode('utf-8', 'ignore')
+            writer.write(b'exit')
+            await writer.drain()
+            hello = [line for line in reply.split('\n') if line.startswith('hello:')]
+            if len(hello) > 0 and len(hello[0].split(':')) >= 3:
+                fuid, uid = hello[0].strip().split(':')[1:3]
+                return [host, fuid, uid, int((time.time() - start_time) * 1000)]
+        except (asyncio.TimeoutError, OSError):
+            pass
+        except Exception as e:
+            print("[{}] probe warning: {}".format(host, e))
+        finally:
+            if writer is not None:
+                writer.close()
+        return None
+
+
+async def async_device_scanner(service_port=9008, timeout=1.0, concurrency=64, on_device=None, hosts=None):
+    """
+    Asyncio micrOS device discovery - no ping/arp subprocesses
+        service_port: micrOS socket server port (socport)
+        timeout: connect/reply timeout per host in sec
+        concurrency: max parallel connections
+        on_device: callback(device) on every hit - incremental result handling
+        hosts: host list, default: local /24 network
+    return list of [ip, fuid, uid, elapsed ms]
+    """
+    if hosts is None:
+        hosts = get_all_hosts(guess_net_address(gateway_ip()))
+    semaphore = asyncio.Semaphore(concurrency)
+    devices = []
+    tasks = [asyncio.ensure_future(__probe_micros_device(str(host), service_port, timeout, semaphore))
+             for host in hosts]
+    for task in asyncio.as_completed(tasks):
+        device = await task
+        if device is None:
+            continue
+        print("[MicrOS] Device: {} fuid: {} uid: {} [{} ms]".format(*device))
+        devices.append(device)
+        if on_device is not None:
+            on_device(device)
+    return devices
+
+
+def micros_device_scanner(service_port=9008, timeout=1.0, concurrency=64, on_device=None, hosts=None):
+    start_time = time.time()
+    devices = asyncio.run(async_device_scanner(service_port=service_port, timeout=timeout,
+                                               concurrency=concurrency, on_device=on_device, hosts=hosts))
+    print("{} device was found, elapsed time: {:.3f} sec".format(len(devices), time.time() - start_time))
+    return devices
+
+
 def online_device_scanner(service_port=9008):
     start_time = time.time()
 
@@ -0,0 +1,25 @@
+import time
+
+
+def ticks_ms():
+    return int(time.time() * 1000)
+
+
+def ticks_us():
+    return int(time.time() * 1000000)
+
+
+def ticks_diff(ticks1, ticks2):
+    return ticks1 - ticks2
+
+
+def sleep_ms(ms):
+    time.sleep(ms / 1000)
+
+
+def sleep_us(us):
+    time.sleep(us / 1000000)
+
+
+def ticks_add(ticks, delta):
+    return ticks + delta
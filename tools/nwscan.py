@@ -23,6 +23,46 @@ def map_wlan_devices(service_port=9008):
     return devices
 
 
+def arp_table():
+    """
+    Local ARP table (one query for all devices): {ip: mac}
+    """
+    table = {}
+    try:
+        if os.path.isfile('/proc/net/arp'):
+            with open('/proc/net/arp', 'r') as f:
+                for line in f.read().splitlines()[1:]:
+                    fields = line.split()
+                    table[fields[0]] = fields[3]
+        else:
+            exitcode, stdout, stderr = LocalMachine.run_command('arp -an', shell=True)
+            for line in stdout.splitlines():
+                # ? (192.168.1.10) at a4:cf:12:00:00:01 on en0 ...
+                fields = line.split()
+                if len(fields) > 3:
+                    table[fields[1].strip('()')] = fields[3]
+    except Exception:
+        pass
+    return table
+
+
+def map_micros_devices(service_port=9008, on_device=None):
+    """
+    micrOS device discovery - asyncio TCP connect + hello
+        on_device: callback([ip, mac, fuid, uid, elapsed ms]) on every hit
+    """
+    arp_cache = {}
+
+    def __on_device(device):
+        if device[0] not in arp_cache:
+            arp_cache.update(arp_table())
+        device.insert(1, arp_cache.get(device[0], 'n/a'))
+        if on_device is not None:
+            on_device(device)
+
+    return SearchDevices.micros_device_scanner(service_port=service_port, on_device=__on_device)
+
+
 def filter_by_open_port(device_ip_list, port=9008):
     """Obsolete"""
     print("Filter devices by (MicrOS) open port...  [ping -c 2 -p {port} <ip>]".format(port=port))
@@ -11,8 +11,10 @@ import select
 import time
 import nwscan
 import json
+import struct
+import fnmatch
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from TerminalColors import Colors
-import threading
 
 #########################################################
 #                 Device data handling                  #
@@ -37,68 +39,42 @@ class ConnectionData:
 
 
     @staticmethod
-    def __worker_filter_MicrOS_device(device, thread_name):
-        socket_obj = None
-        if '.' in device[0]:
-            try:
-                if not (device[0].startswith('10.') or device[0].startswith('192.')):
-                    print("[{}]Invalid device IP:{} - skip".format(thread_name, device[0]))
-                    return
-                print("Device Query on {} ...".format(device[0]))
-                socket_obj = SocketDictClient(host=device[0], port=ConnectionData.PORT)
-                reply = socket_obj.non_interactive('hello')
-                if "hello" in reply:
-                    print("[{}][MicrOS] Device: {} reply: {}".format(thread_name, device[0], reply))
-                    fuid = reply.split(':')[1]
-                    uid = reply.split(':')[2]
-                    # Add device to known list
-                    ConnectionData.MICROS_DEV_IP_DICT[uid] = [device[0], device[1], fuid]
-                else:
-                    print("[{}][Non MicrOS] Device: {} reply: {}".format(thread_name, device[0], reply))
-            except Exception as e:
-                print("[{}] {} scan warning: {}".format(thread_name, device, e))
-            finally:
-                if socket_obj is not None and socket_obj.conn is not None:
-                    socket_obj.conn.close()
-                del socket_obj
+    def __merge_MicrOS_device(device):
+        """
+        Incremental cache update on every discovered device
+            device: [ip, mac, fuid, uid, elapsed ms]
+        """
+        devip, macaddr, fuid, uid, elapsed_ms = device
+        # Cache format: uid: [ip, mac, fuid, discovery time ms]
+        ConnectionData.write_MicrOS_device_cache({uid: [devip, macaddr, fuid, elapsed_ms]}, verbose=False)
 
     @staticmethod
     def filter_MicrOS_devices():
         start_time = time.time()
-        filtered_devices = nwscan.map_wlan_devices(service_port=9008)
-        thread_instance_list = []
-        for index, device in enumerate(filtered_devices):
-            thread_name = "thread-{} check: {}".format(index, device)
-            thread_instance_list.append(
-                threading.Thread(target=ConnectionData.__worker_filter_MicrOS_device, args=(device, thread_name,))
-            )
-
-        for mythread in thread_instance_list:
-            mythread.start()
-
-        for mythread in thread_instance_list:
-            mythread.join()
-
+        # asyncio TCP connect + hello discovery on socport (one pass)
+        nwscan.map_micros_devices(service_port=ConnectionData.PORT, on_device=ConnectionData.__merge_MicrOS_device)
         end_time = time.time()
         print("SEARCH TOTAL ELAPSED TIME: {} sec".format(end_time - start_time))
-        ConnectionData.write_MicrOS_device_cache(ConnectionData.MICROS_DEV_IP_DICT)
+        ConnectionData.write_MicrOS_device_cache({})
         print("AVAILABLE MICROS DEVICES:\n{}".format(json.dumps(ConnectionData.MICROS_DEV_IP_DICT, indent=4, sort_keys=True)))
 
     @staticmethod
-    def write_MicrOS_device_cache(device_dict):
-        ConnectionData.read_MicrOS_device_cache()
+    def write_MicrOS_device_cache(device_dict, verbose=True):
+        ConnectionData.read_MicrOS_device_cache(verbose=verbose)
         cache_path = ConnectionData.DEVICE_CACHE_PATH
-        print("Write MicrOS device cache: {}".format(cache_path))
+        if verbose:
+            print("Write MicrOS device cache: {}".format(cache_path))
         with open(cache_path, 'w') as f:
             ConnectionData.MICROS_DEV_IP_DICT.update(ConnectionData.DEFAULT_CONFIG_FRAGMNENT)
             ConnectionData.MICROS_DEV_IP_DICT.update(device_dict)
             json.dump(ConnectionData.MICROS_DEV_IP_DICT, f, indent=4)
 
     @staticmethod
-    def read_MicrOS_device_cache():
+    def read_MicrOS_device_cache(verbose=True):
         cache_path = ConnectionData.DEVICE_CACHE_PATH
         if os.path.isfile(cache_path):
-            print("Load MicrOS device cache: {}".format(cache_path))
+            if verbose:
+                print("Load MicrOS device cache: {}".format(cache_path))
             with open(cache_path, 'r') as f:
                 cache_content = json.load(f)
                 cache_content.update(ConnectionData.MICROS_DEV_IP_DICT)
@@ -181,40 +157,11 @@ class ConnectionData:
 
     @staticmethod
     def nodes_status():
-        spr_offset1 = 30
-        spr_offset2 = 57
-        nodes_dict = ConnectionData.read_MicrOS_device_cache()
-        spacer1 = " " * (spr_offset1-14)
-        print("{cols}       [ UID ]{spr1}[ FUID ]\t\t[ IP ]\t\t[ STATUS ]\t[ VERSION ]\t[COMM SEC]{cole}"
-              .format(spr1=spacer1, cols=Colors.OKBLUE+Colors.BOLD, cole=Colors.NC))
-        for uid, data in nodes_dict.items():
-            ip = data[0]
-            fuid = "{}{}{}".format(Colors.HEADER, data[2], Colors.NC)
-            if uid not in ['__devuid__']:
-                spacer1 = " "*(spr_offset1 - len(uid))
-
-                # print status msgs
-                is_online = "{}ONLINE{}".format(Colors.OK, Colors.NC) if nwscan.node_is_online(ip, port=ConnectionData.PORT) else "{}OFFLINE{}".format(Colors.WARN, Colors.NC)
-                version_data = '<n/a>'
-
-                # is online
-                if 'ONLINE' in is_online:
-                    # get version data
-                    try:
-                        start_comm = time.time()
-                        version_data = SocketDictClient(host=ip, port=ConnectionData.PORT, silent_mode=True).non_interactive(['version'])
-                        elapsed_time = "{:.3f}".format(time.time() - start_comm)
-                    except:
-                        elapsed_time = 'n/a'
-
-                # Generate line printout
-                base_info = "{uid}{spr1}{fuid}".format(uid=uid, spr1=spacer1, fuid=fuid)
-                spacer1 = " " * (spr_offset2 - len(base_info))
-                data_line_str = "{base}{spr2}{ip}\t{stat}\t\t{version}\t\t{elapt}" \
-                    .format(base=base_info, spr2=spacer1, ip=ip,
-                            stat=is_online, version=version_data, elapt=elapsed_time)
-                # Print line
-                print(data_line_str)
+        """
+        Parallel status sweep - version command on every cached device
+        """
+        ConnectionData.read_MicrOS_device_cache()
+        FleetExecutor(timeout=3).execute('version')
 
 #########################################################
 #               Socket Client Class                     #
@@ -252,7 +199,8 @@ class SocketDictClient:
         data_list = []
         if select.select([self.conn], [], [], 3)[0]:
             while True:
-                time.sleep(wait_before_msg)
+                # Wait for incoming data (max wait_before_msg) instead of fix sleep
+                select.select([self.conn], [], [], wait_before_msg)
                 last_data = self.conn.recv(self.bufsize).decode('utf-8')
                 data += last_data
                 # Msg reply wait criteria (get the prompt back or special cases)
@@ -324,13 +272,337 @@ class SocketDictClient:
                 print(str_msg.encode('ascii', 'ignore').decode('ascii'), end=end)
         return str_msg
 
+#########################################################
+#            Persistent Socket Session Class            #
+#########################################################
+
+
+class SocketSession:
+    """
+    Reusable device session - one connection for many commands
+    - message completion: prompt marker (no fixed sleeps)
+    - pipeline: commands sent back-to-back, replies matched in order
+    - per command round-trip time measurement (rtt)
+    - subscribe: server push stream of LM results
+    """
+    PROMPT_MARKER = ' $'
+
+    def __init__(self, host='localhost', port=9008, bufsize=4096, timeout=10):
+        self.bufsize = bufsize
+        self.timeout = timeout
+        self.host = host
+        self.port = port
+        self.rtt = []
+        self.conn = socket.create_connection((host, port), timeout=timeout)
+        # Wait for the first prompt
+        self.prompt = self.__receive_until_prompt().strip()
+
+    def __is_complete(self, data):
+        """
+        Reply is complete when the last (not new line terminated) line is the prompt
+        """
+        last_line = data.split('\n')[-1].rstrip()
+        if last_line.endswith(self.PROMPT_MARKER):
+            return True
+        return "Bye!" in data or "Server busy" in data
+
+    def __receive_until_prompt(self):
+        data = ""
+        while not self.__is_complete(data):
+            if not select.select([self.conn], [], [], self.timeout)[0]:
+                raise TimeoutError("{}:{} reply timeout {} sec".format(self.host, self.port, self.timeout))
+            last_data = self.conn.recv(self.bufsize).decode('utf-8')
+            if last_data == "":
+                raise ConnectionError("{}:{} connection closed".format(self.host, self.port))
+            data += last_data
+        return data
+
+    def send(self, cmd):
+        """
+        Execute one command, return reply without the prompt
+        """
+        start_time = time.time()
+        self.conn.sendall(str.encode(cmd.strip()))
+        data = self.__receive_until_prompt()
+        self.rtt.append(time.time() - start_time)
+        return '\n'.join(data.split('\n')[:-1]).strip()
+
+    def pipeline(self, cmd_list):
+        """
+        Execute command list on the open connection
+            cmd_list: list of commands or <a> separated str
+        return replies in command order: [(cmd, reply, rtt sec), ...]
+        """
+        if isinstance(cmd_list, str):
+            cmd_list = [cmd.strip() for cmd in cmd_list.split('<a>') if len(cmd.strip()) > 0]
+        results = []
+        # The device reads one command per receive - next command is sent right after the prompt
+        for cmd in cmd_list:
+            reply = self.send(cmd)
+            results.append((cmd, reply, self.rtt[-1]))
+        return results
+
+    def subscribe(self, cmd, period=1, count=None):
+        """
+        Server push stream on the open connection (subscribe built-in)
+            cmd: lm func [params], period: sec, count: number of pushes (None: until generator close)
+        yield pushed LM results - unsubscribe at the end
+        """
+        self.conn.sendall(str.encode("subscribe {} {}".format(cmd.strip(), period)))
+        tag = "[{}] ".format(' '.join(cmd.split()[0:2]))
+        data, cnt = "", 0
+        try:
+            while count is None or cnt < count:
+                while '\n' not in data:
+                    if not select.select([self.conn], [], [], self.timeout + period)[0]:
+                        raise TimeoutError("{}:{} push timeout {} sec".format(self.host, self.port, self.timeout + period))
+                    last_data = self.conn.recv(self.bufsize).decode('utf-8')
+                    if last_data == "":
+                        raise ConnectionError("{}:{} connection closed".format(self.host, self.port))
+                    data += last_data
+                line, data = data.split('\n', 1)
+                if line.startswith(('subscribe <', 'subscribe:')):
+                    # Rejected: usage / max subscriptions
+                    raise ValueError(line)
+                # Pushed lines can follow the prompt (not new line terminated)
+                index = line.find(tag)
+                if index >= 0:
+                    cnt += 1
+                    yield line[index + len(tag):]
+                elif len(line.strip()) > 0 and not line.startswith('subscribed:'):
+                    # Push is one tagged line - untagged line: incomplete (multi line) push
+                    raise ValueError("{}:{} incomplete push: {}".format(self.host, self.port, line))
+        finally:
+            self.conn.sendall(b'unsubscribe')
+            self.__receive_until_prompt()
+
+    def close(self):
+        try:
+            self.conn.sendall(b'exit')
+            self.__receive_until_prompt()
+        except Exception:
+            pass
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class FramedSession(SocketSession):
+    """
+    Framed protocol session (frame built-in) - for machine clients
+    - request: id (uint16), length (uint16), command
+    - reply: id (uint16), status (uint8), length (uint16), data - no prompt scraping
+    - pipeline: every request is sent at once, replies are matched by request id
+    - per command status (FRAME_STATUS) and round-trip time (rtt)
+    """
+    FRAME_STATUS = ('ok', 'error', 'syntax', 'bad request')
+
+    def __init__(self, host='localhost', port=9008, bufsize=4096, timeout=10):
+        super().__init__(host=host, port=port, bufsize=bufsize, timeout=timeout)
+        self.status = []
+        self.__req_id = 0
+        self.__rx = b''
+        # Negotiate framed mode
+        self.conn.sendall(b'frame')
+        while not self.__rx.endswith(b'\n'):
+            self.__recv()
+        if not self.__rx.startswith(b'frame:'):
+            raise ConnectionError("{}:{} framed mode not supported: {}".format(host, port, self.__rx))
+        self.__rx = b''
+
+    def __recv(self):
+        if not select.select([self.conn], [], [], self.timeout)[0]:
+            raise TimeoutError("{}:{} reply timeout {} sec".format(self.host, self.port, self.timeout))
+        data = self.conn.recv(self.bufsize)
+        if data == b"":
+            raise ConnectionError("{}:{} connection closed".format(self.host, self.port))
+        self.__rx += data
+
+    def __send_frame(self, cmd):
+        self.__req_id = (self.__req_id + 1) % 0x10000
+        data = cmd.strip().encode('utf-8')
+        self.conn.sendall(struct.pack('>HH', self.__req_id, len(data)) + data)
+        return self.__req_id
+
+    def __read_frame(self):
+        """
+        return request id, status, reply
+        """
+        while len(self.__rx) < 5 or len(self.__rx) < 5 + struct.unpack('>HBH', self.__rx[0:5])[2]:
+            self.__recv()
+        req_id, status, length = struct.unpack('>HBH', self.__rx[0:5])
+        reply = self.__rx[5:5+length].decode('utf-8')
+        self.__rx = self.__rx[5+length:]
+        return req_id, self.FRAME_STATUS[status] if status < len(self.FRAME_STATUS) else status, reply
+
+    def send(self, cmd):
+        """
+        Execute one command, return reply (status: self.status[-1])
+        """
+        return self.pipeline([cmd])[0][1]
+
+    def pipeline(self, cmd_list):
+        """
+        Send every command at once, collect replies by request id
+            cmd_list: list of commands or <a> separated str
+        return replies in command order: [(cmd, reply, rtt sec), ...]
+        """
+        if isinstance(cmd_list, str):
+            cmd_list = [cmd.strip() for cmd in cmd_list.split('<a>') if len(cmd.strip()) > 0]
+        start_time = time.time()
+        pending = {self.__send_frame(cmd): index for index, cmd in enumerate(cmd_list)}
+        results = [None] * len(cmd_list)
+        while len(pending) > 0:
+            req_id, status, reply = self.__read_frame()
+            index = pending.pop(req_id, None)
+            if index is not None:
+                results[index] = (cmd_list[index], reply, time.time() - start_time, status)
+        self.rtt += [res[2] for res in results]
+        self.status += [res[3] for res in results]
+        return [res[0:3] for res in results]
+
+    def close(self):
+        try:
+            self.pipeline(['exit'])
+        except Exception:
+            pass
+        self.conn.close()
+
+
+#########################################################
+#              Fleet (multi device) executor            #
+#########################################################
+
+
+class FleetExecutor:
+    """
+    Fan-out command execution on a device set - concurrent sessions
+    - device selection: uid, fuid, ip, fnmatch pattern (node*) or tag:<name> (device_tags.json)
+    - bounded worker pool, per device connect / reply timeout
+    - structured per device results with latency
+    - streaming result table (rows are printed as results arrive)
+    """
+    DEVICE_TAGS_PATH = os.path.join(MYDIR, "../user_data/device_tags.json")
+
+    def __init__(self, workers=16, timeout=5, stream=True):
+        self.workers = workers
+        self.timeout = timeout
+        self.stream = stream
+
+    @staticmethod
+    def read_device_tags():
+        """
+        Device tags: {"tag": ["fuid or uid or ip", ...]}
+        """
+        if os.path.isfile(FleetExecutor.DEVICE_TAGS_PATH):
+            with open(FleetExecutor.DEVICE_TAGS_PATH, 'r') as f:
+                return json.load(f)
+        return {}
+
+    @staticmethod
+    def select_devices(selectors=None):
+        """
+        Select devices from the device cache
+            selectors: list or comma separated str, None: every discovered device
+        return [(uid, fuid, ip), ...]
+        """
+        devices = [(uid, data[2], data[0]) for uid, data in ConnectionData.read_MicrOS_device_cache(verbose=False).items()]
+        if selectors is None:
+            return [dev for dev in devices if dev[0] not in ConnectionData.DEFAULT_CONFIG_FRAGMNENT.keys()]
+        if isinstance(selectors, str):
+            selectors = [sel.strip() for sel in selectors.split(',') if len(sel.strip()) > 0]
+        tags = FleetExecutor.read_device_tags()
+        patterns = []
+        for selector in selectors:
+            if selector.startswith('tag:'):
+                patterns += tags.get(selector[4:], [])
+            else:
+                patterns.append(selector)
+        return [dev for dev in devices if any(fnmatch.fnmatch(field, pattern) for pattern in patterns for field in dev)]
+
+    def execute(self, cmd, selectors=None):
+        """
+        Execute command or pipeline on the selected devices
+            cmd: command str, <a> separated pipeline str or command list
+        return {uid: {'fuid', 'ip', 'status', 'replies': [(cmd, reply, rtt sec)], 'latency', 'error'}, ...}
+        """
+        devices = self.select_devices(selectors)
+        cmd_list = [c.strip() for c in cmd.split('<a>') if len(c.strip()) > 0] if isinstance(cmd, str) else cmd
+        results = {}
+        self.__print_header(cmd_list, len(devices))
+        start_time = time.time()
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(devices)))) as executor:
+            futures = [executor.submit(self.__execute_on_device, device, cmd_list) for device in devices]
+            for future in as_completed(futures):
+                result = future.result()
+                results[result['uid']] = result
+                self.__print_row(result)
+        if self.stream:
+            online = len([res for res in results.values() if res['status'] == 'OK'])
+            print("{}[{}/{}] OK - TOTAL ELAPSED TIME: {:.3f} sec{}".format(Colors.OKBLUE, online, len(devices),
+                                                                         time.time() - start_time, Colors.NC))
+        return results
+
+    def __execute_on_device(self, device, cmd_list):
+        uid, fuid, ip = device
+        result = {'uid': uid, 'fuid': fuid, 'ip': ip, 'status': 'OFFLINE', 'replies': [], 'latency': None, 'error': None}
+        start_time = time.time()
+        try:
+            with SocketSession(host=ip, port=ConnectionData.PORT, timeout=self.timeout) as dev_session:
+                result['status'] = 'ERR'
+                result['replies'] = dev_session.pipeline(cmd_list)
+                result['status'] = 'OK'
+        except (socket.timeout, TimeoutError) as e:
+            result['status'] = 'TIMEOUT' if result['status'] == 'ERR' else 'OFFLINE'
+            result['error'] = str(e)
+        except Exception as e:
+            result['error'] = str(e)
+        result['latency'] = time.time() - start_time
+        return result
+
+    def __print_header(self, cmd_list, dev_cnt):
+        if self.stream:
+            print("{}FLEET EXEC [{} device]: {}{}".format(Colors.OKBLUE, dev_cnt, ' <a> '.join(cmd_list), Colors.NC))
+            print("{}{:<30}{:<20}{:<16}{:<10}{:<10}[ REPLY ]{}".format(Colors.OKBLUE+Colors.BOLD, '[ UID ]', '[ FUID ]',
+                                                                     '[ IP ]', '[STATUS]', '[ SEC ]', Colors.NC))
+
+    def __print_row(self, result):
+        if not self.stream:
+            return
+        color = Colors.OK if result['status'] == 'OK' else Colors.WARN
+        reply = ' | '.join(rep[1].replace('\n', ' ') for rep in result['replies']) if result['status'] == 'OK' \
+            else result['error']
+        print("{:<30}{}{:<20}{}{:<16}{}{:<10}{}{:<10.3f}{}".format(result['uid'], Colors.HEADER, result['fuid'],
+                                                                   Colors.NC, result['ip'], color, result['status'],
+                                                                   Colors.NC, result['latency'], reply))
+
+
+def fleet_execute(cmd, selectors=None, workers=16, timeout=5, stream=True):
+    """
+    Execute command / pipeline on a device set concurrently
+    """
+    ConnectionData.read_port_from_nodeconf()
+    return FleetExecutor(workers=workers, timeout=timeout, stream=stream).execute(cmd, selectors)
+
+
+def session(dev=None, search=False):
+    """
+    Create persistent session - device cache read and device selection only once
+    """
+    ConnectionData.auto_execute(search=search, dev=dev)
+    return SocketSession(host=ConnectionData.HOST, port=ConnectionData.PORT)
+
 #########################################################
 #                       MAIN                            #
 #########################################################
 
 
 def socket_commandline_args(arg_list):
-    return_action_dict = {'search': False, 'dev': None, 'status': False}
+    return_action_dict = {'search': False, 'dev': None, 'status': False, 'fleet': None}
     if "--scan" in arg_list:
         arg_list.remove("--scan")
         return_action_dict['search'] = True
@@ -344,10 +616,15 @@ def socket_commandline_args(arg_list):
                 arg_list.remove("--dev")
                 arg_list.remove(return_action_dict['dev'])
                 break
+    if "--fleet" in arg_list:
+        index = arg_list.index("--fleet")
+        return_action_dict['fleet'] = arg_list[index+1]
+        del arg_list[index:index+2]
     if "--help" in arg_list:
         print("--scan\t\t- scan devices")
         print("--dev\t\t- select device - value should be: fuid or uid or devip")
         print("--stat\t\t- show devides online/offline - and memory data")
+        print("--fleet\t\t- execute command on multiple devices in parallel - value: fuid/uid/ip/pattern*/tag:<name>, separator: ,")
         print("HINT\t\t- In non interactive mode you can pipe commands with <a> separator")
         sys.exit(0)
     return arg_list, return_action_dict
@@ -375,11 +652,16 @@ def main(args):
 
 def run(arg_list=[]):
     args, action = socket_commandline_args(arg_list)
+    if action['fleet'] is not None:
+        return True, fleet_execute(' '.join(args), selectors=None if action['fleet'] == '*' else action['fleet'])
     ConnectionData.auto_execute(search=action['search'], status=action['status'],  dev=action['dev'])
     return main(args)
 
 
 if __name__ == "__main__":
     args, action = socket_commandline_args(sys.argv[1:])
+    if action['fleet'] is not None:
+        fleet_execute(' '.join(args), selectors=None if action['fleet'] == '*' else action['fleet'])
+        sys.exit(0)
     ConnectionData.auto_execute(search=action['search'], status=action['status'], dev=action['dev'])
     main(args)